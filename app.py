@@ -5,6 +5,15 @@ from config.database import DatabaseConfig
 from config.database import db
 from routes import main_bp, auth_bp, categories_bp, brands_bp, products_bp, build_pc_bp, tags_bp, users_bp, orders_bp, admins_bp
 from utils.template_filters import register_filters
+from utils.cache import cache
+from utils.homepage_sections import homepage_sections
+from utils.image_pipeline import image_pipeline
+from utils.assets import assets
+from utils import bench, cart_store, idempotency, image_store, order_stats, query_plans, sales_counter, sales_rollup
+from utils.tag_index import tag_index
+from utils.query_budget import query_budget
+from utils.stock import reservations
+from utils.suggest_index import suggest_index
 
 def create_app():
     """Application factory pattern """
@@ -35,6 +44,48 @@ def create_app():
     # Register custom template filters
     register_filters(app)
     
+    # Read-through cache cho dữ liệu tham chiếu (CACHE_TYPE)
+    cache.init_app(app)
+    
+    # Homepage section store (background refresh)
+    homepage_sections.init_app(app)
+    
+    # CLI: flask sales rebuild, flask order-stats rebuild, flask rollup run, flask plans check
+    sales_counter.init_app(app)
+    order_stats.init_app(app)
+    sales_rollup.init_app(app)
+    query_plans.init_app(app)
+    
+    # Giữ chỗ tồn kho cho giỏ hàng (CLI: flask stock release-expired)
+    reservations.init_app(app)
+    
+    # CLI: flask bench checkout
+    bench.init_app(app)
+    
+    # Idempotency-Key cho các POST tạo đơn/giỏ hàng (CLI: flask idempotency purge)
+    idempotency.init_app(app)
+    
+    # Tổng giỏ hàng cho header (cart_summary() trong template)
+    cart_store.init_app(app)
+    
+    # Ảnh sản phẩm thu nhỏ ở thread nền (filter image_url, CLI: flask images process)
+    image_pipeline.init_app(app)
+    
+    # Image store theo SHA-256: đếm tham chiếu, URL immutable (CLI: flask images gc)
+    image_store.init_app(app)
+    
+    # Bundle CSS/JS đã build, ?v=hash và bản nén .br/.gz cho file tĩnh (CLI: flask assets build)
+    assets.init_app(app)
+    
+    # Inverted tag index cho trang tư vấn
+    tag_index.init_app(app)
+    
+    # Per-request SQL query budget
+    query_budget.init_app(app)
+    
+    # Typeahead index cho /api/suggest
+    suggest_index.init_app(app)
+    
     return app
 
 # Create app instance
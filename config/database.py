@@ -19,7 +19,8 @@ class DatabaseConfig:
         """Initialize database with Flask app"""
         # Configure SQLAlchemy
         db.init_app(app)
-        migrate.init_app(app, db)
+        # render_as_batch để ALTER TABLE hoạt động với SQLite
+        migrate.init_app(app, db, render_as_batch=True)
         # Ensure models are imported so SQLAlchemy can discover them
         try:
             import models  # noqa: F401
@@ -14,6 +14,16 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_RECORD_QUERIES = True
     
+    # Query budget (số truy vấn tối đa mỗi request, theo blueprint)
+    QUERY_BUDGET_DEFAULT = 50
+    QUERY_BUDGETS = {
+        'main': 30,
+        'orders': 20,
+        'products': 20,
+    }
+    QUERY_BUDGET_REPEAT_LIMIT = 10  # số lần lặp cùng một câu lệnh (N+1)
+    QUERY_BUDGET_ACTION = 'log'  # 'log' hoặc 'raise'
+    
     # Session settings
     PERMANENT_SESSION_LIFETIME = timedelta(hours=24)
     SESSION_COOKIE_SECURE = False
@@ -29,6 +39,7 @@ class Config:
     POSTS_PER_PAGE = 20
     USERS_PER_PAGE = 20
     PRODUCTS_PER_PAGE = 12
+    ORDERS_PER_PAGE = 20
     
     # Email settings (for future use)
     MAIL_SERVER = os.environ.get('MAIL_SERVER')
@@ -49,8 +60,37 @@ class Config:
     CORS_ORIGINS = ['http://localhost:3000', 'http://127.0.0.1:3000']
     
     # Cache settings
-    CACHE_TYPE = 'simple'
+    CACHE_TYPE = 'simple'  # 'simple' (LRU trong process), 'redis' hoặc 'null'
     CACHE_DEFAULT_TIMEOUT = 300
+    CACHE_MAX_ENTRIES = 1024
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+    CACHE_KEY_PREFIX = 'bmt:'
+    
+    # Stock reservation settings
+    CART_RESERVATION_TTL = timedelta(minutes=30)  # thời gian giữ hàng trong giỏ
+    STOCK_SWEEP_INTERVAL = 60  # giây giữa hai lần trả hàng của giỏ hết hạn
+    
+    # Idempotency settings
+    IDEMPOTENCY_TTL = timedelta(hours=24)  # thời gian lưu response theo Idempotency-Key
+    IDEMPOTENCY_LOCK_TIMEOUT = 60  # giây, sau đó key đang xử lý được coi là bị bỏ dở
+    IDEMPOTENCY_WAIT_TIMEOUT = 10  # giây request trùng key chờ request đầu tiên
+    
+    # Rollup settings
+    ROLLUP_OVERLAP = timedelta(minutes=5)  # xử lý lại đơn đổi gần watermark (transaction commit muộn)
+    
+    # Image pipeline settings (cần Pillow)
+    IMAGE_VARIANTS = {'thumb': 160, 'card': 480, 'detail': 1000}  # cạnh dài tối đa (px)
+    IMAGE_WORKERS = 2  # số thread xử lý ảnh nền
+    IMAGE_INDEX_TTL = 60  # giây, sau đó map ảnh -> variants được đọc lại từ DB
+    IMAGE_GC_GRACE = timedelta(days=1)  # blob không còn tham chiếu quá lâu mới bị flask images gc xóa
+    
+    # In-memory index settings: dựng lại sau TTL giây dù không thấy version đổi
+    # (backend cache LRU không chia sẻ version giữa các worker)
+    TAG_INDEX_TTL = 60  # chỉ dùng với backend LRU; backend redis dùng chung version
+    SUGGEST_INDEX_TTL = 60
+    
+    # Homepage settings
+    HOMEPAGE_REFRESH_INTERVAL = 300  # giây giữa hai lần làm mới trang chủ
     
     # Logging settings
     LOG_LEVEL = 'INFO'
@@ -124,6 +164,9 @@ class TestingConfig(Config):
     # Disable CSRF for testing
     WTF_CSRF_ENABLED = False
     
+    # Fail fast khi request vượt query budget
+    QUERY_BUDGET_ACTION = 'raise'
+    
     # Logging
     LOG_LEVEL = 'DEBUG'
     
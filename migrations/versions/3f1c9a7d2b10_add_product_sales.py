@@ -0,0 +1,45 @@
+"""add product_sales counter table
+
+Revision ID: 3f1c9a7d2b10
+Revises: 
+Create Date: 2026-10-17 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a7d2b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'product_sales',
+        sa.Column('ProductID', sa.Integer(), nullable=False),
+        sa.Column('QuantitySold', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('UpdatedAt', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['ProductID'], ['product.ProductID']),
+        sa.PrimaryKeyConstraint('ProductID'),
+    )
+    op.create_index('ix_product_sales_quantity', 'product_sales', ['QuantitySold'], unique=False)
+
+    # Backfill từ dữ liệu đơn hàng hiện có (bỏ qua đơn đã hủy)
+    op.execute(
+        """
+        INSERT INTO product_sales (ProductID, QuantitySold, UpdatedAt)
+        SELECT od.ProductID, SUM(od.Quantity), CURRENT_TIMESTAMP
+        FROM orderdetail od
+        JOIN "order" o ON o.OrderID = od.OrderID
+        WHERE o.Status IS NULL OR o.Status != 'cancelled'
+        GROUP BY od.ProductID
+        """
+    )
+
+
+def downgrade():
+    op.drop_index('ix_product_sales_quantity', table_name='product_sales')
+    op.drop_table('product_sales')
@@ -0,0 +1,55 @@
+"""add indexes for hot query shapes
+
+Revision ID: 5d7a3c9e1f42
+Revises: 8b4e2d61c0a3
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d7a3c9e1f42'
+down_revision = '8b4e2d61c0a3'
+branch_labels = None
+depends_on = None
+
+
+# (tên index, bảng, cột) - khớp với db.Index trong models/tables.py
+INDEXES = [
+    # auth login/ danh sách user, admin: filter_by(Name, Role, IsDelete) / (Role, IsDelete)
+    ('ix_user_name_role', 'user', ['Name', 'Role', 'IsDelete']),
+    ('ix_user_role', 'user', ['Role', 'IsDelete']),
+    # danh mục con của "PC"
+    ('ix_category_parent', 'category', ['ParentID']),
+    # trang chủ (mới nhất) và trang danh sách (IsPC + cột sắp xếp)
+    ('ix_product_ispc_created', 'product', ['IsPC', 'CreatedAt']),
+    ('ix_product_ispc_name', 'product', ['IsPC', 'Name']),
+    ('ix_product_ispc_price', 'product', ['IsPC', 'Price']),
+    ('ix_product_category', 'product', ['CategoryID']),
+    ('ix_product_brand', 'product', ['BrandID']),
+    # giỏ hàng
+    ('ix_cart_user', 'cart', ['UserID']),
+    ('ix_cartdetail_cart_product', 'cartdetail', ['CartID', 'ProductID']),
+    # lịch sử đơn của user, thống kê theo trạng thái, danh sách đơn admin
+    ('ix_order_user_created', 'order', ['UserID', 'CreatedAt']),
+    ('ix_order_status', 'order', ['Status']),
+    ('ix_order_created', 'order', ['CreatedAt']),
+    ('ix_orderdetail_order', 'orderdetail', ['OrderID']),
+    ('ix_orderdetail_product', 'orderdetail', ['ProductID']),
+    # build PC
+    ('ix_pc_option_item_group_product', 'pc_option_item', ['OptionGroupID', 'ProductID']),
+    ('ix_product_tag_product', 'product_tag', ['ProductID']),
+    ('ix_product_tag_tag', 'product_tag', ['TagID']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,100 @@
+"""add product_fts full-text index
+
+Revision ID: 8b4e2d61c0a3
+Revises: 3f1c9a7d2b10
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4e2d61c0a3'
+down_revision = '3f1c9a7d2b10'
+branch_labels = None
+depends_on = None
+
+
+def _fold(expr):
+    # unicode61 bỏ dấu được hầu hết chữ tiếng Việt nhưng không gộp đ/Đ -> d
+    return f"replace(replace(coalesce({expr}, ''), 'đ', 'd'), 'Đ', 'D')"
+
+
+def _row(prefix):
+    return (
+        f"{prefix}.ProductID, "
+        f"{_fold(prefix + '.Name')}, "
+        f"{_fold(prefix + '.Specs')}, "
+        f"{_fold(f'(SELECT Name FROM brand WHERE BrandID = {prefix}.BrandID)')}, "
+        f"{_fold(f'(SELECT Name FROM category WHERE CategoryID = {prefix}.CategoryID)')}"
+    )
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute(
+        """
+        CREATE VIRTUAL TABLE product_fts USING fts5(
+            Name, Specs, BrandName, CategoryName,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+        """
+    )
+    op.execute(
+        f"INSERT INTO product_fts (rowid, Name, Specs, BrandName, CategoryName) "
+        f"SELECT {_row('p')} FROM product p"
+    )
+
+    op.execute(
+        f"""
+        CREATE TRIGGER product_fts_ai AFTER INSERT ON product BEGIN
+            INSERT INTO product_fts (rowid, Name, Specs, BrandName, CategoryName)
+            VALUES ({_row('new')});
+        END
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER product_fts_ad AFTER DELETE ON product BEGIN
+            DELETE FROM product_fts WHERE rowid = old.ProductID;
+        END
+        """
+    )
+    op.execute(
+        f"""
+        CREATE TRIGGER product_fts_au AFTER UPDATE OF Name, Specs, BrandID, CategoryID ON product BEGIN
+            DELETE FROM product_fts WHERE rowid = old.ProductID;
+            INSERT INTO product_fts (rowid, Name, Specs, BrandName, CategoryName)
+            VALUES ({_row('new')});
+        END
+        """
+    )
+    op.execute(
+        f"""
+        CREATE TRIGGER brand_fts_au AFTER UPDATE OF Name ON brand BEGIN
+            UPDATE product_fts SET BrandName = {_fold('new.Name')}
+            WHERE rowid IN (SELECT ProductID FROM product WHERE BrandID = new.BrandID);
+        END
+        """
+    )
+    op.execute(
+        f"""
+        CREATE TRIGGER category_fts_au AFTER UPDATE OF Name ON category BEGIN
+            UPDATE product_fts SET CategoryName = {_fold('new.Name')}
+            WHERE rowid IN (SELECT ProductID FROM product WHERE CategoryID = new.CategoryID);
+        END
+        """
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    for trigger in ('category_fts_au', 'brand_fts_au', 'product_fts_au', 'product_fts_ad', 'product_fts_ai'):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS product_fts")
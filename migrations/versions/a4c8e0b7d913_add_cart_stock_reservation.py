@@ -0,0 +1,32 @@
+"""add stock reservation columns to cartdetail
+
+Revision ID: a4c8e0b7d913
+Revises: 5d7a3c9e1f42
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c8e0b7d913'
+down_revision = '5d7a3c9e1f42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('cartdetail') as batch_op:
+        batch_op.add_column(
+            sa.Column('ReservedQuantity', sa.Integer(), nullable=False, server_default='0')
+        )
+        batch_op.add_column(sa.Column('ReservedUntil', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_cartdetail_reserved_until', ['ReservedUntil'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('cartdetail') as batch_op:
+        batch_op.drop_index('ix_cartdetail_reserved_until')
+        batch_op.drop_column('ReservedUntil')
+        batch_op.drop_column('ReservedQuantity')
@@ -0,0 +1,52 @@
+"""add daily_sales rollup, rollup_state and order.UpdatedAt
+
+Revision ID: a9c3e5f7b204
+Revises: d4f7a2c9e816
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c3e5f7b204'
+down_revision = 'd4f7a2c9e816'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('order') as batch_op:
+        batch_op.add_column(sa.Column('UpdatedAt', sa.DateTime(), nullable=True))
+    op.execute('UPDATE "order" SET UpdatedAt = CreatedAt')
+    op.create_index('ix_order_updated', 'order', ['UpdatedAt'], unique=False)
+
+    op.create_table(
+        'daily_sales',
+        sa.Column('Day', sa.Date(), nullable=False),
+        sa.Column('ProductID', sa.Integer(), nullable=False),
+        sa.Column('CategoryID', sa.Integer(), nullable=False),
+        sa.Column('Status', sa.String(), nullable=False),
+        sa.Column('Quantity', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('Revenue', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('OrderCount', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['ProductID'], ['product.ProductID']),
+        sa.PrimaryKeyConstraint('Day', 'ProductID', 'CategoryID', 'Status'),
+    )
+    op.create_table(
+        'rollup_state',
+        sa.Column('Name', sa.String(), nullable=False),
+        sa.Column('Watermark', sa.DateTime(), nullable=True),
+        sa.Column('LastRunAt', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('Name'),
+    )
+    # daily_sales được điền bởi `flask rollup run` (lần đầu chạy full rebuild)
+
+
+def downgrade():
+    op.drop_table('rollup_state')
+    op.drop_table('daily_sales')
+    op.drop_index('ix_order_updated', table_name='order')
+    with op.batch_alter_table('order') as batch_op:
+        batch_op.drop_column('UpdatedAt')
@@ -0,0 +1,27 @@
+"""replace ix_order_status with (Status, CreatedAt) index
+
+Revision ID: b2d8e4a6c1f9
+Revises: f1a6c4e8d257
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d8e4a6c1f9'
+down_revision = 'f1a6c4e8d257'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Lọc theo trạng thái + sắp xếp theo ngày trong danh sách đơn admin
+    # không cần sắp xếp toàn bộ đơn của trạng thái đó
+    op.create_index('ix_order_status_created', 'order', ['Status', 'CreatedAt'], unique=False)
+    op.drop_index('ix_order_status', table_name='order')
+
+
+def downgrade():
+    op.create_index('ix_order_status', 'order', ['Status'], unique=False)
+    op.drop_index('ix_order_status_created', table_name='order')
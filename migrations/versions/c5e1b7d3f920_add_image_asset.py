@@ -0,0 +1,35 @@
+"""add image_asset table for resized product image variants
+
+Revision ID: c5e1b7d3f920
+Revises: a9c3e5f7b204
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e1b7d3f920'
+down_revision = 'a9c3e5f7b204'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'image_asset',
+        sa.Column('Source', sa.String(), nullable=False),
+        sa.Column('Status', sa.String(), nullable=False, server_default='pending'),
+        sa.Column('Width', sa.Integer(), nullable=True),
+        sa.Column('Height', sa.Integer(), nullable=True),
+        sa.Column('Variants', sa.Text(), nullable=True),
+        sa.Column('Error', sa.Text(), nullable=True),
+        sa.Column('UpdatedAt', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('Source'),
+    )
+    # Ảnh đã có được xử lý bằng `flask images process`
+
+
+def downgrade():
+    op.drop_table('image_asset')
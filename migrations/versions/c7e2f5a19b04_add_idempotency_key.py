@@ -0,0 +1,42 @@
+"""add idempotency_key table
+
+Revision ID: c7e2f5a19b04
+Revises: a4c8e0b7d913
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e2f5a19b04'
+down_revision = 'a4c8e0b7d913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'idempotency_key',
+        sa.Column('IdempotencyKeyID', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('UserID', sa.Integer(), nullable=False),
+        sa.Column('Key', sa.String(length=255), nullable=False),
+        sa.Column('Endpoint', sa.String(), nullable=False),
+        sa.Column('RequestHash', sa.String(length=64), nullable=False),
+        sa.Column('StatusCode', sa.Integer(), nullable=True),
+        sa.Column('ResponseBody', sa.LargeBinary(), nullable=True),
+        sa.Column('ContentType', sa.String(), nullable=True),
+        sa.Column('Location', sa.String(), nullable=True),
+        sa.Column('CreatedAt', sa.DateTime(), nullable=True),
+        sa.Column('ExpiresAt', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['UserID'], ['user.UserID']),
+        sa.PrimaryKeyConstraint('IdempotencyKeyID'),
+        sa.UniqueConstraint('UserID', 'Key', name='uq_idempotency_key_user_key'),
+    )
+    op.create_index('ix_idempotency_key_expires', 'idempotency_key', ['ExpiresAt'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_idempotency_key_expires', table_name='idempotency_key')
+    op.drop_table('idempotency_key')
@@ -0,0 +1,44 @@
+"""add order_daily_stats rollup table
+
+Revision ID: d4f7a2c9e816
+Revises: b2d8e4a6c1f9
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f7a2c9e816'
+down_revision = 'b2d8e4a6c1f9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'order_daily_stats',
+        sa.Column('Status', sa.String(), nullable=False),
+        sa.Column('Day', sa.Date(), nullable=False),
+        sa.Column('OrderCount', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('Revenue', sa.Float(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('Status', 'Day'),
+    )
+    op.create_index('ix_order_daily_stats_day', 'order_daily_stats', ['Day'], unique=False)
+
+    # Backfill từ đơn hàng hiện có (Status NULL tính là pending như default)
+    op.execute(
+        """
+        INSERT INTO order_daily_stats (Status, Day, OrderCount, Revenue)
+        SELECT COALESCE(Status, 'pending'), DATE(CreatedAt), COUNT(*), SUM(TotalPrice)
+        FROM "order"
+        WHERE CreatedAt IS NOT NULL
+        GROUP BY COALESCE(Status, 'pending'), DATE(CreatedAt)
+        """
+    )
+
+
+def downgrade():
+    op.drop_index('ix_order_daily_stats_day', table_name='order_daily_stats')
+    op.drop_table('order_daily_stats')
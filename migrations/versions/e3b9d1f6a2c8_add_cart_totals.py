@@ -0,0 +1,38 @@
+"""add cached ItemCount/Subtotal columns to cart
+
+Revision ID: e3b9d1f6a2c8
+Revises: c7e2f5a19b04
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3b9d1f6a2c8'
+down_revision = 'c7e2f5a19b04'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('cart') as batch_op:
+        batch_op.add_column(sa.Column('ItemCount', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('Subtotal', sa.Float(), nullable=False, server_default='0'))
+
+    # Backfill từ các dòng giỏ hiện có
+    op.execute(
+        """
+        UPDATE cart SET
+            ItemCount = (SELECT COALESCE(SUM(Quantity), 0) FROM cartdetail
+                         WHERE cartdetail.CartID = cart.CartID),
+            Subtotal = (SELECT COALESCE(SUM(Price * Quantity), 0) FROM cartdetail
+                        WHERE cartdetail.CartID = cart.CartID)
+        """
+    )
+
+def downgrade():
+    with op.batch_alter_table('cart') as batch_op:
+        batch_op.drop_column('Subtotal')
+        batch_op.drop_column('ItemCount')
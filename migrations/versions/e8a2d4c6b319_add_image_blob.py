@@ -0,0 +1,36 @@
+"""add image_blob table for the content-addressed image store
+
+Revision ID: e8a2d4c6b319
+Revises: c5e1b7d3f920
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8a2d4c6b319'
+down_revision = 'c5e1b7d3f920'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'image_blob',
+        sa.Column('Hash', sa.String(length=64), nullable=False),
+        sa.Column('Path', sa.String(), nullable=False),
+        sa.Column('Bytes', sa.Integer(), nullable=False),
+        sa.Column('RefCount', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('CreatedAt', sa.DateTime(), nullable=True),
+        sa.Column('UnreferencedAt', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('Hash'),
+        sa.UniqueConstraint('Path'),
+    )
+    op.create_index('ix_image_blob_unreferenced', 'image_blob', ['RefCount', 'UnreferencedAt'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_image_blob_unreferenced', table_name='image_blob')
+    op.drop_table('image_blob')
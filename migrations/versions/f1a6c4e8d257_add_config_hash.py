@@ -0,0 +1,75 @@
+"""add ConfigHash to cartdetail and orderdetail
+
+Revision ID: f1a6c4e8d257
+Revises: e3b9d1f6a2c8
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+import hashlib
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a6c4e8d257'
+down_revision = 'e3b9d1f6a2c8'
+branch_labels = None
+depends_on = None
+
+
+def _config_hash(config_data):
+    # Giống utils.pc_configurator.config_hash tại thời điểm viết migration
+    try:
+        selected = json.loads(config_data).get('selected_components') or {}
+        product_ids = sorted(int(c['productId']) for c in selected.values())
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return None
+    return hashlib.sha256(','.join(map(str, product_ids)).encode()).hexdigest()
+
+
+def _backfill(table, id_column):
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.text(f'SELECT {id_column}, ConfigData FROM {table} WHERE ConfigData IS NOT NULL')
+    ).fetchall()
+    updates = [
+        {'id': row_id, 'hash': _config_hash(config_data)}
+        for row_id, config_data in rows
+    ]
+    updates = [u for u in updates if u['hash']]
+    if updates:
+        bind.execute(
+            sa.text(f'UPDATE {table} SET ConfigHash = :hash WHERE {id_column} = :id'),
+            updates,
+        )
+
+
+def upgrade():
+    with op.batch_alter_table('cartdetail') as batch_op:
+        batch_op.add_column(sa.Column('ConfigHash', sa.String(length=64), nullable=True))
+        batch_op.drop_index('ix_cartdetail_cart_product')
+        batch_op.create_index(
+            'ix_cartdetail_cart_product_config', ['CartID', 'ProductID', 'ConfigHash'], unique=False
+        )
+    with op.batch_alter_table('orderdetail') as batch_op:
+        batch_op.add_column(sa.Column('ConfigHash', sa.String(length=64), nullable=True))
+        batch_op.drop_index('ix_orderdetail_product')
+        batch_op.create_index(
+            'ix_orderdetail_product_config', ['ProductID', 'ConfigHash'], unique=False
+        )
+
+    _backfill('cartdetail', 'CartDetailID')
+    _backfill('orderdetail', 'OrderDetailID')
+
+
+def downgrade():
+    with op.batch_alter_table('orderdetail') as batch_op:
+        batch_op.drop_index('ix_orderdetail_product_config')
+        batch_op.create_index('ix_orderdetail_product', ['ProductID'], unique=False)
+        batch_op.drop_column('ConfigHash')
+    with op.batch_alter_table('cartdetail') as batch_op:
+        batch_op.drop_index('ix_cartdetail_cart_product_config')
+        batch_op.create_index('ix_cartdetail_cart_product', ['CartID', 'ProductID'], unique=False)
+        batch_op.drop_column('ConfigHash')
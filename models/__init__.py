@@ -11,10 +11,17 @@ from .tables import (
     CartDetail,
     Order,
     OrderDetail,
+    ProductSales,
+    OrderDailyStats,
+    DailySales,
+    RollupState,
+    ImageAsset,
+    ImageBlob,
     PcOptionGroup,
     PcOptionItem,
     Tag,
     ProductTag,
+    IdempotencyKey,
 )
 
 __all__ = [
@@ -26,9 +33,16 @@ __all__ = [
     'CartDetail',
     'Order',
     'OrderDetail',
+    'ProductSales',
+    'OrderDailyStats',
+    'DailySales',
+    'RollupState',
+    'ImageAsset',
+    'ImageBlob',
     'PcOptionGroup',
     'PcOptionItem',
     'Tag',
     'ProductTag',
+    'IdempotencyKey',
 ]
 
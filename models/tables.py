@@ -21,6 +21,11 @@ class User(db.Model):
     carts = relationship('Cart', back_populates='user', cascade='all, delete-orphan')
     orders = relationship('Order', back_populates='user', cascade='all, delete-orphan')
 
+    __table_args__ = (
+        db.Index('ix_user_name_role', 'Name', 'Role', 'IsDelete'),
+        db.Index('ix_user_role', 'Role', 'IsDelete'),
+    )
+
 
 class Brand(db.Model):
     __tablename__ = 'brand'
@@ -41,6 +46,10 @@ class Category(db.Model):
     parent = relationship('Category', remote_side=[CategoryID], backref='children')
     products = relationship('Product', back_populates='category')
 
+    __table_args__ = (
+        db.Index('ix_category_parent', 'ParentID'),
+    )
+
 
 class Product(db.Model):
     __tablename__ = 'product'
@@ -63,6 +72,14 @@ class Product(db.Model):
     order_details = relationship('OrderDetail', back_populates='product')
     tags = relationship('ProductTag', back_populates='product', cascade='all, delete-orphan')
 
+    __table_args__ = (
+        db.Index('ix_product_ispc_created', 'IsPC', 'CreatedAt'),
+        db.Index('ix_product_ispc_name', 'IsPC', 'Name'),
+        db.Index('ix_product_ispc_price', 'IsPC', 'Price'),
+        db.Index('ix_product_category', 'CategoryID'),
+        db.Index('ix_product_brand', 'BrandID'),
+    )
+
 
 class Cart(db.Model):
     __tablename__ = 'cart'
@@ -70,10 +87,16 @@ class Cart(db.Model):
     CartID = db.Column(db.Integer, primary_key=True, autoincrement=True)
     UserID = db.Column(db.Integer, ForeignKey('user.UserID'), nullable=False)
     CreatedAt = db.Column(db.DateTime, default=datetime.utcnow)
+    ItemCount = db.Column(db.Integer, nullable=False, default=0)  # tổng số lượng, cập nhật bởi utils.cart_store
+    Subtotal = db.Column(db.Float, nullable=False, default=0)
 
     user = relationship('User', back_populates='carts')
     details = relationship('CartDetail', back_populates='cart', cascade='all, delete-orphan')
 
+    __table_args__ = (
+        db.Index('ix_cart_user', 'UserID'),
+    )
+
 
 class CartDetail(db.Model):
     __tablename__ = 'cartdetail'
@@ -84,10 +107,18 @@ class CartDetail(db.Model):
     Quantity = db.Column(db.Integer, nullable=False, default=1)
     Price = db.Column(db.Float, nullable=False)
     ConfigData = db.Column(db.Text, nullable=True)
+    ConfigHash = db.Column(db.String(64), nullable=True)  # utils.pc_configurator.config_hash
+    ReservedQuantity = db.Column(db.Integer, nullable=False, default=0)  # số lượng đang giữ trong kho
+    ReservedUntil = db.Column(db.DateTime, nullable=True)
 
     cart = relationship('Cart', back_populates='details')
     product = relationship('Product', back_populates='cart_details')
 
+    __table_args__ = (
+        db.Index('ix_cartdetail_cart_product_config', 'CartID', 'ProductID', 'ConfigHash'),
+        db.Index('ix_cartdetail_reserved_until', 'ReservedUntil'),
+    )
+
 
 class Order(db.Model):
     __tablename__ = 'order'
@@ -97,10 +128,18 @@ class Order(db.Model):
     TotalPrice = db.Column(db.Float, nullable=False)
     Status = db.Column(db.String, default='pending')
     CreatedAt = db.Column(db.DateTime, default=datetime.utcnow)
+    UpdatedAt = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     user = relationship('User', back_populates='orders')
     details = relationship('OrderDetail', back_populates='order', cascade='all, delete-orphan')
 
+    __table_args__ = (
+        db.Index('ix_order_user_created', 'UserID', 'CreatedAt'),
+        db.Index('ix_order_status_created', 'Status', 'CreatedAt'),
+        db.Index('ix_order_created', 'CreatedAt'),
+        db.Index('ix_order_updated', 'UpdatedAt'),
+    )
+
 
 class OrderDetail(db.Model):
     __tablename__ = 'orderdetail'
@@ -111,10 +150,99 @@ class OrderDetail(db.Model):
     Quantity = db.Column(db.Integer, nullable=False, default=1)
     Price = db.Column(db.Float, nullable=False)
     ConfigData = db.Column(db.Text, nullable=True)
+    ConfigHash = db.Column(db.String(64), nullable=True)
 
     order = relationship('Order', back_populates='details')
     product = relationship('Product', back_populates='order_details')
 
+    __table_args__ = (
+        db.Index('ix_orderdetail_order', 'OrderID'),
+        db.Index('ix_orderdetail_product_config', 'ProductID', 'ConfigHash'),
+    )
+
+
+class OrderDailyStats(db.Model):
+    """Số đơn và tổng tiền theo (ngày tạo đơn, trạng thái), cập nhật cùng
+    transaction với việc tạo đơn / đổi trạng thái"""
+    __tablename__ = 'order_daily_stats'
+
+    Status = db.Column(db.String, primary_key=True)
+    Day = db.Column(db.Date, primary_key=True)
+    OrderCount = db.Column(db.Integer, nullable=False, default=0)
+    Revenue = db.Column(db.Float, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_order_daily_stats_day', 'Day'),
+    )
+
+
+class DailySales(db.Model):
+    """Số lượng / doanh thu bán theo (ngày tạo đơn, sản phẩm, danh mục, trạng
+    thái đơn), tính lại theo ngày bởi `flask rollup run`"""
+    __tablename__ = 'daily_sales'
+
+    Day = db.Column(db.Date, primary_key=True)
+    ProductID = db.Column(db.Integer, ForeignKey('product.ProductID'), primary_key=True)
+    CategoryID = db.Column(db.Integer, primary_key=True)
+    Status = db.Column(db.String, primary_key=True)
+    Quantity = db.Column(db.Integer, nullable=False, default=0)
+    Revenue = db.Column(db.Float, nullable=False, default=0)
+    OrderCount = db.Column(db.Integer, nullable=False, default=0)
+
+
+class RollupState(db.Model):
+    """Watermark (Order.UpdatedAt đã xử lý tới đâu) của từng rollup"""
+    __tablename__ = 'rollup_state'
+
+    Name = db.Column(db.String, primary_key=True)
+    Watermark = db.Column(db.DateTime, nullable=True)
+    LastRunAt = db.Column(db.DateTime, nullable=True)
+
+
+class ImageBlob(db.Model):
+    """File ảnh trong image store (theo SHA-256 nội dung) và số tham chiếu"""
+    __tablename__ = 'image_blob'
+
+    Hash = db.Column(db.String(64), primary_key=True)
+    Path = db.Column(db.String, nullable=False, unique=True)
+    Bytes = db.Column(db.Integer, nullable=False)
+    RefCount = db.Column(db.Integer, nullable=False, default=0)
+    CreatedAt = db.Column(db.DateTime, default=datetime.utcnow)
+    UnreferencedAt = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_image_blob_unreferenced', 'RefCount', 'UnreferencedAt'),
+    )
+
+
+class ImageAsset(db.Model):
+    """Ảnh upload (Source: đường dẫn tương đối trong static/) và các bản thu
+    nhỏ đã tạo bởi image pipeline (Variants: JSON theo tên variant)"""
+    __tablename__ = 'image_asset'
+
+    Source = db.Column(db.String, primary_key=True)
+    Status = db.Column(db.String, nullable=False, default='pending')  # pending | ready | failed
+    Width = db.Column(db.Integer, nullable=True)
+    Height = db.Column(db.Integer, nullable=True)
+    Variants = db.Column(db.Text, nullable=True)
+    Error = db.Column(db.Text, nullable=True)
+    UpdatedAt = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ProductSales(db.Model):
+    """Bộ đếm số lượng đã bán của từng sản phẩm (không tính đơn đã hủy)"""
+    __tablename__ = 'product_sales'
+
+    ProductID = db.Column(db.Integer, ForeignKey('product.ProductID'), primary_key=True)
+    QuantitySold = db.Column(db.Integer, nullable=False, default=0)
+    UpdatedAt = db.Column(db.DateTime, default=datetime.utcnow)
+
+    product = relationship('Product')
+
+    __table_args__ = (
+        db.Index('ix_product_sales_quantity', 'QuantitySold'),
+    )
+
 
 class PcOptionGroup(db.Model):
     __tablename__ = 'pc_option_group'
@@ -136,6 +264,10 @@ class PcOptionItem(db.Model):
     group = relationship('PcOptionGroup', back_populates='items')
     product = relationship('Product')
 
+    __table_args__ = (
+        db.Index('ix_pc_option_item_group_product', 'OptionGroupID', 'ProductID'),
+    )
+
 
 class Tag(db.Model):
     __tablename__ = 'tag'
@@ -158,7 +290,28 @@ class ProductTag(db.Model):
 
     __table_args__ = (
         UniqueConstraint('ProductID', 'TagID', name='uq_product_tag'),
+        db.Index('ix_product_tag_product', 'ProductID'),
+        db.Index('ix_product_tag_tag', 'TagID'),
     )
 
 
+class IdempotencyKey(db.Model):
+    """Response đã lưu của một request POST theo Idempotency-Key của client"""
+    __tablename__ = 'idempotency_key'
 
+    IdempotencyKeyID = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    UserID = db.Column(db.Integer, ForeignKey('user.UserID'), nullable=False)
+    Key = db.Column(db.String(255), nullable=False)
+    Endpoint = db.Column(db.String, nullable=False)
+    RequestHash = db.Column(db.String(64), nullable=False)
+    StatusCode = db.Column(db.Integer, nullable=True)  # NULL: request đầu tiên đang xử lý
+    ResponseBody = db.Column(db.LargeBinary, nullable=True)
+    ContentType = db.Column(db.String, nullable=True)
+    Location = db.Column(db.String, nullable=True)
+    CreatedAt = db.Column(db.DateTime, default=datetime.utcnow)
+    ExpiresAt = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('UserID', 'Key', name='uq_idempotency_key_user_key'),
+        db.Index('ix_idempotency_key_expires', 'ExpiresAt'),
+    )
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from models.tables import Brand, Product
 from config.database import db
+from utils import reference_data
 
 bp = Blueprint('brands', __name__)
 
@@ -11,7 +12,7 @@ def list_brands():
     if not session.get('is_admin'):
         return redirect(url_for('auth.dashboard_login'))
     
-    brands = Brand.query.all()
+    brands = reference_data.all_brands()
     return render_template('backend/pages/brands/list.html', brands=brands)
 
 
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from models.tables import Category, Product
 from config.database import db
+from utils import reference_data
 
 bp = Blueprint('categories', __name__)
 
@@ -11,7 +12,7 @@ def list_categories():
     if not session.get('is_admin'):
         return redirect(url_for('auth.dashboard_login'))
     
-    categories = Category.query.all()
+    categories = reference_data.all_categories()
     return render_template('backend/pages/categories/list.html', categories=categories)
 
 
@@ -1,11 +1,10 @@
 import json
-import os
-import uuid
 from datetime import datetime
 
 from config.database import DatabaseConfig, db
 from flask import (
     Blueprint,
+    abort,
     current_app,
     flash,
     jsonify,
@@ -15,13 +14,11 @@ from flask import (
     session,
     url_for,
 )
+from sqlalchemy.orm import contains_eager
 from models.tables import (
-    Brand,
-    Cart,
     CartDetail,
     Category,
     Order,
-    OrderDetail,
     PcOptionGroup,
     PcOptionItem,
     Product,
@@ -29,144 +26,151 @@ from models.tables import (
     Tag,
     User,
 )
-from sqlalchemy import func
+from utils import cart_store, catalog, order_listing, order_stats, reference_data, sales_rollup, stock
+from utils import checkout as cart_checkout
+from utils import search as product_search
+from utils.homepage_sections import homepage_sections
+from utils.image_pipeline import image_pipeline
+from utils.idempotency import idempotent
+from utils import pc_pricing
+from utils.pc_configurator import load_configurator
+from utils.query_budget import query_budget
+from utils.suggest_index import suggest_index
+from utils.tag_index import tag_index
 
 bp = Blueprint("main", __name__)
 
 
 @bp.route("/")
 def home():
-    # Lấy 10 sản phẩm linh kiện mới nhất
-    products_early = (
-        Product.query.filter_by(IsPC=False)
-        .order_by(Product.CreatedAt.desc())
-        .limit(10)
-        .all()
-    )
-
-    # Lấy 10 sản phẩm PC mới nhất
-    pc_products = (
-        Product.query.filter_by(IsPC=True)
-        .order_by(Product.CreatedAt.desc())
-        .limit(10)
-        .all()
-    )
-
-    # Lấy 10 linh kiện bán chạy nhất
-    top_selling_components_query = (
-        db.session.query(
-            Product, func.sum(OrderDetail.Quantity).label("total_quantity")
-        )
-        .join(OrderDetail, Product.ProductID == OrderDetail.ProductID)
-        .filter(Product.IsPC == False)
-        .group_by(Product.ProductID)
-        .order_by(func.sum(OrderDetail.Quantity).desc())
-        .limit(10)
-        .all()
-    )
-    top_selling_components = [
-        product for product, quantity in top_selling_components_query
-    ]
-
-    # Lấy 10 PC bán chạy nhất
-    top_selling_pcs_query = (
-        db.session.query(
-            Product, func.sum(OrderDetail.Quantity).label("total_quantity")
-        )
-        .join(OrderDetail, Product.ProductID == OrderDetail.ProductID)
-        .filter(Product.IsPC == True)
-        .group_by(Product.ProductID)
-        .order_by(func.sum(OrderDetail.Quantity).desc())
-        .limit(10)
-        .all()
-    )
-    top_selling_pcs = [product for product, quantity in top_selling_pcs_query]
+    # Các danh sách (mới nhất, bán chạy nhất) được dựng sẵn ở nền
+    sections = homepage_sections.get()
 
     return render_template(
         "frontend/pages/homepage.html",
-        products_early=products_early,
-        pc_products=pc_products,
-        top_selling_components=top_selling_components,
-        top_selling_pcs=top_selling_pcs,
+        products_early=sections["products_early"],
+        pc_products=sections["pc_products"],
+        top_selling_components=sections["top_selling_components"],
+        top_selling_pcs=sections["top_selling_pcs"],
     )
 
 
 @bp.route("/pc-products")
 def pc_products():
-    # Lấy category có name là "PC"
-    pc_parent = Category.query.filter_by(Name="PC").first()
+    # Trang đầu được dựng phía server; các trang sau/bộ lọc gọi /api/catalog/pc
+    listing = catalog.load_page(catalog.SCOPE_PC, request.args)
 
-    if not pc_parent:
+    if not listing["pc_parent"]:
         flash("Không tìm thấy danh mục PC", "error")
         return redirect(url_for("main.home"))
 
     # Lấy các category con của PC
-    pc_categories = Category.query.filter_by(ParentID=pc_parent.CategoryID).all()
-
-    # Lấy tất cả sản phẩm PC (IsPC = 1)
-    pc_products = Product.query.filter_by(IsPC=1).all()
+    pc_categories = catalog.filter_categories(
+        catalog.SCOPE_PC, listing["child_category_ids"]
+    )
 
     # Lấy danh sách brands cho filter
-    brands = Brand.query.all()
+    brands = reference_data.all_brands()
 
     return render_template(
         "frontend/pages/pc_products.html",
         pc_categories=pc_categories,
-        pc_products=pc_products,
+        pc_products=listing["products"],
+        next_cursor=listing["next_cursor"],
+        total=listing["total"],
+        facets=catalog.facet_counts(listing["base_query"]),
+        params=listing["params"],
         brands=brands,
     )
 
 
 @bp.route("/linhkien-products")
 def linhkien_products():
-    # Lấy category có name là "PC"
-    pc_parent = Category.query.filter_by(Name="PC").first()
-
-    # Lấy tất cả category con của PC (để loại trừ)
-    pc_child_categories = []
-    if pc_parent:
-        pc_child_categories = Category.query.filter_by(
-            ParentID=pc_parent.CategoryID
-        ).all()
-        pc_child_category_ids = [cat.CategoryID for cat in pc_child_categories]
-    else:
-        pc_child_category_ids = []
-
-    # Lấy tất cả linh kiện, loại trừ:
-    # 1. Sản phẩm có Name = "pc"
-    # 2. Sản phẩm có IsPC = 1
-    # 3. Sản phẩm thuộc category con của PC
-    query = Product.query.filter(Product.Name != "pc", Product.IsPC == 0)
-
-    # Loại trừ sản phẩm thuộc category con của PC
-    if pc_child_category_ids:
-        query = query.filter(~Product.CategoryID.in_(pc_child_category_ids))
-
-    linhkien_products = query.all()
+    # Linh kiện: loại trừ sản phẩm tên "pc", PC nguyên bộ và danh mục con của PC
+    listing = catalog.load_page(catalog.SCOPE_LINHKIEN, request.args)
 
     # Lấy tất cả categories (trừ PC và con của PC) để filter
-    all_categories = Category.query.filter(Category.Name != "PC").all()
-
-    if pc_child_category_ids:
-        all_categories = [
-            cat for cat in all_categories if cat.CategoryID not in pc_child_category_ids
-        ]
+    all_categories = catalog.filter_categories(
+        catalog.SCOPE_LINHKIEN, listing["child_category_ids"]
+    )
 
     # Lấy danh sách brands cho filter
-    brands = Brand.query.all()
+    brands = reference_data.all_brands()
 
     return render_template(
         "frontend/pages/linhkien_products.html",
-        linhkien_products=linhkien_products,
+        linhkien_products=listing["products"],
+        next_cursor=listing["next_cursor"],
+        total=listing["total"],
+        facets=catalog.facet_counts(listing["base_query"]),
+        params=listing["params"],
         categories=all_categories,
         brands=brands,
     )
 
 
+@bp.route("/api/catalog/<scope>")
+def catalog_page(scope):
+    """API trả về một trang sản phẩm đã lọc/sắp xếp (dùng cho bộ lọc trên trang)"""
+    if scope not in catalog.SCOPES:
+        return jsonify({"success": False, "message": "Danh sách không hợp lệ"}), 404
+
+    listing = catalog.load_page(scope, request.args)
+    html = render_template(
+        f"frontend/components/{scope}_product_items.html",
+        products=listing["products"],
+        # Trang nối thêm (có cursor) nằm dưới màn hình đầu: lazy-load mọi ảnh
+        eager_images=0 if request.args.get("cursor") else 6,
+    )
+    return jsonify(
+        {
+            "success": True,
+            "html": html,
+            "count": len(listing["products"]),
+            "total": listing["total"],
+            "next_cursor": listing["next_cursor"],
+        }
+    )
+
+
+@bp.route("/search")
+def search():
+    """Tìm kiếm sản phẩm (full-text, xếp hạng theo độ liên quan)"""
+    keysearch = (request.args.get("keysearch") or request.args.get("q") or "").strip()
+    category_id = request.args.get("category_id", type=int) or None
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = current_app.config.get("PRODUCTS_PER_PAGE", 12)
+
+    products, total = product_search.search_products(
+        keysearch, category_id=category_id, page=page, per_page=per_page
+    )
+    category = db.session.get(Category, category_id) if category_id else None
+
+    return render_template(
+        "frontend/pages/search.html",
+        products=products,
+        total=total,
+        page=page,
+        total_pages=(total + per_page - 1) // per_page,
+        keysearch=keysearch,
+        category_id=category_id,
+        category_name=category.Name if category else None,
+        title=f"Tìm kiếm '{keysearch}'",
+    )
+
+
+@bp.route("/api/suggest")
+def api_suggest():
+    """Typeahead: tên sản phẩm, hãng, danh mục, tag theo tiền tố (từ bộ nhớ)"""
+    query = (request.args.get("q") or "").strip()
+    limit = min(max(request.args.get("limit", 5, type=int), 1), 20)
+    return jsonify({"success": True, "data": suggest_index.suggest(query, limit=limit)})
+
+
 @bp.route("/advisor")
 def advisor_page():
     """Trang tư vấn gợi ý lựa chọn cấu hình PC dựa trên Tag"""
-    tags = Tag.query.all()
+    tags = reference_data.all_tags()
     topic_to_values = {}
     for tag in tags:
         parts = [p.strip() for p in tag.Name.split("<>")]
@@ -198,91 +202,13 @@ def advisor_suggest():
             if topic and value:
                 selected_tags.add(f"{topic} <> {value}")
 
-        n_selected = len(selected_tags)
-        if n_selected == 0:
+        if not selected_tags:
             return jsonify(
                 {"success": False, "message": "Vui lòng chọn ít nhất một tiêu chí"}
             ), 400
 
-        # Lấy tất cả PC và map tags cho từng PC
-        pc_products = Product.query.filter_by(IsPC=1).all()
-        product_id_to_tags = {}
-
-        # Lấy ProductTag theo danh sách PC để giảm queries
-        pc_ids = [p.ProductID for p in pc_products]
-        if not pc_ids:
-            return jsonify(
-                {"success": True, "data": {"type1": [], "type2": [], "type3": []}}
-            )
-
-        product_tags = ProductTag.query.filter(ProductTag.ProductID.in_(pc_ids)).all()
-        tag_id_to_name = {t.TagID: t.Name for t in Tag.query.all()}
-        for pt in product_tags:
-            name = tag_id_to_name.get(pt.TagID)
-            if not name:
-                continue
-            product_id_to_tags.setdefault(pt.ProductID, set()).add(name)
-
-        # Tính điểm khớp
-        scored = []
-        for p in pc_products:
-            tags_of_p = product_id_to_tags.get(p.ProductID, set())
-            match_count = len(tags_of_p.intersection(selected_tags))
-            if match_count == 0:
-                continue  # bỏ những PC không khớp tiêu chí nào
-            scored.append(
-                {
-                    "id": p.ProductID,
-                    "name": p.Name,
-                    "price": p.Price,
-                    "image": p.ImageURL,
-                    "match_count": match_count,
-                    "total_selected": n_selected,
-                    "match_ratio": (match_count / n_selected) if n_selected else 0.0,
-                }
-            )
-
-        # Phân loại theo tỉ lệ khớp: type1 >= 80%, type2 [40%, 80%), type3 < 40%
-        import math
-
-        high_threshold = math.ceil(0.8 * n_selected)
-        mid_threshold = max(1, math.ceil(0.4 * n_selected))
-
-        type1 = []
-        type2 = []
-        type3 = []
-        for item in scored:
-            mc = item["match_count"]
-            if mc >= high_threshold:
-                type1.append(item)
-            elif mc >= mid_threshold:
-                type2.append(item)
-            else:
-                type3.append(item)
-
-        # Sắp xếp mỗi nhóm theo số match giảm dần, rồi theo giá tăng dần
-        def sort_key(it):
-            return (-it["match_count"], it["price"] or 0)
-
-        type1.sort(key=sort_key)
-        type2.sort(key=sort_key)
-        type3.sort(key=sort_key)
-
-        return jsonify(
-            {
-                "success": True,
-                "data": {
-                    "type1": type1,
-                    "type2": type2,
-                    "type3": type3,
-                    "thresholds": {
-                        "high_min": high_threshold,
-                        "mid_min": mid_threshold,
-                        "selected_count": n_selected,
-                    },
-                },
-            }
-        )
+        # Chấm điểm trên inverted index trong bộ nhớ (không truy vấn DB)
+        return jsonify({"success": True, "data": tag_index.suggest(selected_tags)})
     except Exception as e:
         return jsonify({"success": False, "message": f"Lỗi khi gợi ý: {str(e)}"}), 500
 
@@ -290,7 +216,9 @@ def advisor_suggest():
 @bp.route("/product/<int:product_id>")
 def product_detail(product_id):
     """Chi tiết sản phẩm"""
-    product = Product.query.get_or_404(product_id)
+    product = reference_data.get_product(product_id)
+    if product is None:
+        abort(404)
 
     # Nếu là sản phẩm PC, chuyển hướng đến trang chi tiết PC
     if product.IsPC == 1:
@@ -325,43 +253,11 @@ def pc_detail(product_id):
     # Lấy sản phẩm PC
     pc_product = Product.query.filter_by(ProductID=product_id, IsPC=1).first_or_404()
 
-    # Lấy tất cả nhóm lựa chọn có linh kiện (đã được thêm vào PC)
-    all_groups = PcOptionGroup.query.all()
-
-    # Tạo dictionary để lưu thông tin nhóm và sản phẩm
-    groups_with_products = []
-    for group in all_groups:
-        # Lấy tất cả sản phẩm trong nhóm này
-        group_items = PcOptionItem.query.filter_by(
-            OptionGroupID=group.OptionGroupID
-        ).all()
-
-        if group_items:  # Chỉ hiển thị nhóm có sản phẩm (đã được thêm vào PC)
-            products_in_group = []
-            for item in group_items:
-                product = Product.query.get(item.ProductID)
-                if product:
-                    products_in_group.append(
-                        {
-                            "product": product,
-                            "is_default": item.IsDefault,
-                            "item_id": item.OptionItemID,
-                        }
-                    )
-
-            # Sắp xếp để sản phẩm mặc định lên đầu
-            products_in_group.sort(key=lambda x: x["is_default"], reverse=True)
-
-            groups_with_products.append({"group": group, "products": products_in_group})
-
-    # Lấy tags của sản phẩm hiện tại
-    product_tags = ProductTag.query.filter_by(ProductID=product_id).all()
-    current_tags = [
-        Tag.query.get(pt.TagID) for pt in product_tags if Tag.query.get(pt.TagID)
-    ]
+    # Nhóm lựa chọn + linh kiện và tags hiện tại (số truy vấn cố định)
+    configurator = load_configurator(product_id, default_first=True)
 
     # Lấy tất cả tags (phục vụ admin thêm nhanh)
-    all_tags = Tag.query.all()
+    all_tags = reference_data.all_tags()
 
     # Lấy các sản phẩm PC liên quan
     related_pcs = (
@@ -373,8 +269,8 @@ def pc_detail(product_id):
     return render_template(
         "frontend/pages/pc_detail.html",
         pc_product=pc_product,
-        groups_with_products=groups_with_products,
-        current_tags=current_tags,
+        groups_with_products=configurator["groups_with_products"],
+        current_tags=configurator["current_tags"],
         all_tags=all_tags,
         related_pcs=related_pcs,
         title=f"{pc_product.Name} - Cấu hình PC",
@@ -424,6 +320,7 @@ def add_tag_to_pc(product_id):
         # Tạo liên kết
         db.session.add(ProductTag(ProductID=product_id, TagID=tag.TagID))
         db.session.commit()
+        tag_index.add_link(product_id, tag.Name)
         flash("Đã thêm tag cho sản phẩm", "success")
     except Exception as e:
         db.session.rollback()
@@ -435,7 +332,36 @@ def add_tag_to_pc(product_id):
     return redirect(url_for("main.pc_detail", product_id=product_id))
 
 
+@bp.route("/api/pc/<int:product_id>/quote")
+def api_pc_quote(product_id):
+    """Giá cấu hình PC tính ở server.
+
+    ?components=<group_id>:<product_id>,<group_id>:<product_id>,...
+    """
+    raw = request.args.get("components", "")
+    selected = {}
+    for part in filter(None, raw.split(",")):
+        group_id, _, component_id = part.partition(":")
+        selected[group_id] = {"productId": component_id}
+    try:
+        quote = pc_pricing.quote(product_id, selected)
+    except pc_pricing.InvalidConfiguration as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    return jsonify(
+        {
+            "success": True,
+            "data": {
+                "pc_id": quote.pc.ProductID,
+                "total": quote.total,
+                "components": quote.components,
+                "config_hash": quote.config_hash,
+            },
+        }
+    )
+
+
 @bp.route("/add-pc-to-cart", methods=["POST"])
+@idempotent
 def add_pc_to_cart():
     """Thêm PC với cấu hình linh kiện vào giỏ hàng"""
     import json
@@ -453,34 +379,26 @@ def add_pc_to_cart():
     try:
         data = request.get_json()
         pc_id = data.get("pcId")
-        total_price = data.get("totalPrice")
         selected_components = data.get("selectedComponents", {})
 
-        if not pc_id or not total_price:
+        if not pc_id:
             return jsonify({"success": False, "message": "Thiếu thông tin sản phẩm"})
 
-        # Lấy thông tin PC
-        pc_product = Product.query.get(pc_id)
-        if not pc_product or pc_product.IsPC != 1:
-            return jsonify({"success": False, "message": "Sản phẩm PC không tồn tại"})
-
-        # Tạo tên sản phẩm với cấu hình
-        component_names = []
-        for group_id, component in selected_components.items():
-            product = Product.query.get(component["productId"])
-            if product:
-                component_names.append(product.Name)
+        # Giá tính ở server (một truy vấn IN cho các linh kiện), không dùng
+        # totalPrice client gửi lên
+        try:
+            quote = pc_pricing.quote(pc_id, selected_components)
+        except pc_pricing.InvalidConfiguration as e:
+            return jsonify({"success": False, "message": str(e)})
 
+        pc_product = quote.pc
+        total_price = quote.total
+        component_names = [c["name"] for c in quote.components]
         config_name = f"{pc_product.Name} ({', '.join(component_names)})"
 
-        # Kiểm tra xem đã có giỏ hàng chưa
+        # Lấy hoặc tạo giỏ hàng
         user_id = session["user_id"]
-        cart = Cart.query.filter_by(UserID=user_id).first()
-
-        if not cart:
-            cart = Cart(UserID=user_id)
-            db.session.add(cart)
-            db.session.flush()
+        cart = cart_store.get_or_create(user_id)
 
         # Tạo config data để so sánh
         config_data = json.dumps(
@@ -492,16 +410,17 @@ def add_pc_to_cart():
             }
         )
 
-        # Kiểm tra xem đã có sản phẩm với cùng cấu hình chưa
-        existing_cart_detail = (
-            CartDetail.query.filter_by(CartID=cart.CartID, ProductID=pc_id)
-            .filter(CartDetail.ConfigData == config_data)
-            .first()
-        )
+        # Kiểm tra xem đã có sản phẩm với cùng cấu hình chưa (so sánh theo
+        # hash các linh kiện, dùng index thay vì so sánh chuỗi JSON)
+        config_hash = quote.config_hash
+        existing_cart_detail = CartDetail.query.filter_by(
+            CartID=cart.CartID, ProductID=pc_id, ConfigHash=config_hash
+        ).first()
 
         if existing_cart_detail:
             # Nếu đã có, tăng số lượng
-            existing_cart_detail.Quantity += 1
+            cart_detail = existing_cart_detail
+            cart_detail.Quantity += 1
         else:
             # Nếu chưa có, tạo mới
             cart_detail = CartDetail(
@@ -510,9 +429,17 @@ def add_pc_to_cart():
                 Quantity=1,
                 Price=total_price,
                 ConfigData=config_data,
+                ConfigHash=config_hash,
             )
             db.session.add(cart_detail)
 
+        try:
+            stock.reserve_cart_line(cart_detail, 1)
+        except stock.InsufficientStock:
+            db.session.rollback()
+            return jsonify({"success": False, "message": "PC này đã hết hàng"})
+
+        cart_store.refresh_totals(cart.CartID)
         db.session.commit()
 
         return jsonify(
@@ -526,6 +453,7 @@ def add_pc_to_cart():
 
 @bp.route("/add-to-cart/<int:product_id>", methods=["POST"])
 @bp.route("/add-to-cart/<int:product_id>", methods=["GET", "POST"])
+@idempotent
 def add_to_cart(product_id):
     """Thêm sản phẩm vào giỏ hàng bằng GET hoặc POST"""
     user_id = session.get("user_id")
@@ -540,19 +468,12 @@ def add_to_cart(product_id):
         else int(request.args.get("quantity", 1))
     )
 
-    if quantity > product.Stock:
-        flash("Số lượng sản phẩm không đủ trong kho", "error")
+    if quantity < 1:
+        flash("Số lượng không hợp lệ", "error")
         return redirect(url_for("main.product_detail", product_id=product_id))
 
-    cart = Cart.query.filter_by(UserID=user_id).first()
-    if not cart:
-        cart = Cart(UserID=user_id)
-        db.session.add(cart)
-        db.session.commit()
-
-    cart_detail = CartDetail.query.filter_by(
-        CartID=cart.CartID, ProductID=product_id
-    ).first()
+    cart = cart_store.get_or_create(user_id)
+    cart_detail = cart_store.find_line(user_id, product_id)
     if cart_detail:
         cart_detail.Quantity += quantity
     else:
@@ -564,6 +485,15 @@ def add_to_cart(product_id):
         )
         db.session.add(cart_detail)
 
+    # Giữ chỗ hàng trong kho (UPDATE có điều kiện, không đọc rồi ghi)
+    try:
+        stock.reserve_cart_line(cart_detail, quantity)
+    except stock.InsufficientStock:
+        db.session.rollback()
+        flash("Số lượng sản phẩm không đủ trong kho", "error")
+        return redirect(url_for("main.product_detail", product_id=product_id))
+
+    cart_store.refresh_totals(cart.CartID)
     db.session.commit()
     flash(f"Đã thêm {quantity} {product.Name} vào giỏ hàng", "success")
     return redirect(url_for("main.product_detail", product_id=product_id))
@@ -576,24 +506,22 @@ def view_cart():
         flash("Vui lòng đăng nhập để xem giỏ hàng", "error")
         return redirect(url_for("auth.login"))
 
-    user_id = session["user_id"]
-    cart = Cart.query.filter_by(UserID=user_id).first()
-
-    if not cart:
-        cart_details = []
-        subtotal = 0
-    else:
-        cart_details = CartDetail.query.filter_by(CartID=cart.CartID).all()
-        subtotal = sum(detail.Price * detail.Quantity for detail in cart_details)
+    contents = cart_store.load(session["user_id"])
 
     return render_template(
         "frontend/pages/cart.html",
-        cart_details=cart_details,
-        subtotal=subtotal,
+        cart_details=contents.lines,
+        subtotal=contents.subtotal,
         title="Giỏ hàng",
     )
 
 
+@bp.route("/api/cart/summary")
+def api_cart_summary():
+    """Số lượng và tạm tính của giỏ cho mini-cart ở header (đọc một dòng cart)"""
+    return jsonify({"success": True, "data": cart_store.summary()})
+
+
 @bp.route("/increase-cart-item/<int:product_id>")
 def increase_cart_item(product_id):
     """Tăng số lượng sản phẩm trong giỏ hàng"""
@@ -602,25 +530,23 @@ def increase_cart_item(product_id):
     if not session.get("user_id"):
         return jsonify({"success": False, "message": "Vui lòng đăng nhập"})
 
-    user_id = session["user_id"]
-    cart = Cart.query.filter_by(UserID=user_id).first()
+    cart_detail = cart_store.find_line(session["user_id"], product_id)
+    if not cart_detail:
+        return jsonify(
+            {"success": False, "message": "Không tìm thấy sản phẩm trong giỏ hàng"}
+        )
 
-    if cart:
-        cart_detail = CartDetail.query.filter_by(
-            CartID=cart.CartID, ProductID=product_id
-        ).first()
-        if cart_detail:
-            cart_detail.Quantity += 1
-            db.session.commit()
-            return jsonify(
-                {"success": True, "message": "Đã cập nhật số lượng sản phẩm"}
-            )
-        else:
-            return jsonify(
-                {"success": False, "message": "Không tìm thấy sản phẩm trong giỏ hàng"}
-            )
-    else:
-        return jsonify({"success": False, "message": "Không tìm thấy giỏ hàng"})
+    cart_detail.Quantity += 1
+    try:
+        stock.reserve_cart_line(cart_detail, 1)
+    except stock.InsufficientStock:
+        db.session.rollback()
+        return jsonify(
+            {"success": False, "message": "Số lượng sản phẩm không đủ trong kho"}
+        )
+    cart_store.refresh_totals(cart_detail.CartID)
+    db.session.commit()
+    return jsonify({"success": True, "message": "Đã cập nhật số lượng sản phẩm"})
 
 
 @bp.route("/decrease-cart-item/<int:product_id>")
@@ -631,33 +557,24 @@ def decrease_cart_item(product_id):
     if not session.get("user_id"):
         return jsonify({"success": False, "message": "Vui lòng đăng nhập"})
 
-    user_id = session["user_id"]
-    cart = Cart.query.filter_by(UserID=user_id).first()
+    cart_detail = cart_store.find_line(session["user_id"], product_id)
+    if not cart_detail:
+        return jsonify(
+            {"success": False, "message": "Không tìm thấy sản phẩm trong giỏ hàng"}
+        )
 
-    if cart:
-        cart_detail = CartDetail.query.filter_by(
-            CartID=cart.CartID, ProductID=product_id
-        ).first()
-        if cart_detail:
-            if cart_detail.Quantity > 1:
-                cart_detail.Quantity -= 1
-                db.session.commit()
-                return jsonify(
-                    {"success": True, "message": "Đã cập nhật số lượng sản phẩm"}
-                )
-            else:
-                # Xóa sản phẩm khỏi giỏ hàng nếu số lượng = 0
-                db.session.delete(cart_detail)
-                db.session.commit()
-                return jsonify(
-                    {"success": True, "message": "Đã xóa sản phẩm khỏi giỏ hàng"}
-                )
-        else:
-            return jsonify(
-                {"success": False, "message": "Không tìm thấy sản phẩm trong giỏ hàng"}
-            )
+    cart_id = cart_detail.CartID
+    if cart_detail.Quantity > 1:
+        cart_detail.Quantity -= 1
+        stock.release_cart_line(cart_detail, 1)
+        message = "Đã cập nhật số lượng sản phẩm"
     else:
-        return jsonify({"success": False, "message": "Không tìm thấy giỏ hàng"})
+        # Xóa sản phẩm khỏi giỏ hàng nếu số lượng = 0
+        stock.remove_cart_line(cart_detail)
+        message = "Đã xóa sản phẩm khỏi giỏ hàng"
+    cart_store.refresh_totals(cart_id)
+    db.session.commit()
+    return jsonify({"success": True, "message": message})
 
 
 @bp.route("/remove-from-cart/<int:product_id>")
@@ -668,25 +585,17 @@ def remove_from_cart(product_id):
     if not session.get("user_id"):
         return jsonify({"success": False, "message": "Vui lòng đăng nhập"})
 
-    user_id = session["user_id"]
-    cart = Cart.query.filter_by(UserID=user_id).first()
+    cart_detail = cart_store.find_line(session["user_id"], product_id)
+    if not cart_detail:
+        return jsonify(
+            {"success": False, "message": "Không tìm thấy sản phẩm trong giỏ hàng"}
+        )
 
-    if cart:
-        cart_detail = CartDetail.query.filter_by(
-            CartID=cart.CartID, ProductID=product_id
-        ).first()
-        if cart_detail:
-            db.session.delete(cart_detail)
-            db.session.commit()
-            return jsonify(
-                {"success": True, "message": "Đã xóa sản phẩm khỏi giỏ hàng"}
-            )
-        else:
-            return jsonify(
-                {"success": False, "message": "Không tìm thấy sản phẩm trong giỏ hàng"}
-            )
-    else:
-        return jsonify({"success": False, "message": "Không tìm thấy giỏ hàng"})
+    cart_id = cart_detail.CartID
+    stock.remove_cart_line(cart_detail)
+    cart_store.refresh_totals(cart_id)
+    db.session.commit()
+    return jsonify({"success": True, "message": "Đã xóa sản phẩm khỏi giỏ hàng"})
 
 
 @bp.route("/checkout")
@@ -696,29 +605,21 @@ def checkout():
         flash("Vui lòng đăng nhập để thanh toán", "error")
         return redirect(url_for("auth.login"))
 
-    user_id = session["user_id"]
-    cart = Cart.query.filter_by(UserID=user_id).first()
-
-    if not cart:
-        flash("Giỏ hàng trống", "error")
-        return redirect(url_for("main.view_cart"))
-
-    cart_details = CartDetail.query.filter_by(CartID=cart.CartID).all()
-    if not cart_details:
+    contents = cart_store.load(session["user_id"])
+    if not contents.lines:
         flash("Giỏ hàng trống", "error")
         return redirect(url_for("main.view_cart"))
 
-    subtotal = sum(detail.Price * detail.Quantity for detail in cart_details)
-
     return render_template(
         "frontend/pages/checkout.html",
-        cart_details=cart_details,
-        subtotal=subtotal,
+        cart_details=contents.lines,
+        subtotal=contents.subtotal,
         title="Thanh toán",
     )
 
 
 @bp.route("/process-cod-payment", methods=["POST"])
+@idempotent
 def process_cod_payment():
     if not session.get("user_id"):
         return jsonify(
@@ -728,38 +629,23 @@ def process_cod_payment():
     try:
         user_id = session["user_id"]
 
-        # Lấy thông tin giỏ hàng
-        cart = Cart.query.filter_by(UserID=user_id).first()
-        if not cart:
+        # Tạo đơn bằng các câu lệnh theo tập (INSERT ... SELECT, DELETE hàng loạt),
+        # trừ kho phần chưa giữ chỗ trong một câu UPDATE
+        try:
+            new_order = cart_checkout.place_order(user_id)
+        except cart_checkout.EmptyCart:
+            db.session.rollback()
             return jsonify({"success": False, "message": "Giỏ hàng trống"})
-
-        cart_details = CartDetail.query.filter_by(CartID=cart.CartID).all()
-        if not cart_details:
-            return jsonify({"success": False, "message": "Giỏ hàng trống"})
-
-        # Tính tổng tiền
-        total_price = sum(detail.Price * detail.Quantity for detail in cart_details)
-
-        # Tạo đơn hàng mới
-        new_order = Order(UserID=user_id, TotalPrice=total_price, Status="Chờ xử lý")
-        db.session.add(new_order)
-        db.session.flush()  # Để lấy OrderID
-
-        # Tạo OrderDetail từ CartDetail
-        for cart_detail in cart_details:
-            order_detail = OrderDetail(
-                OrderID=new_order.OrderID,
-                ProductID=cart_detail.ProductID,
-                Quantity=cart_detail.Quantity,
-                Price=cart_detail.Price,
-                ConfigData=cart_detail.ConfigData,  # Copy ConfigData từ CartDetail
+        except stock.InsufficientStock as e:
+            db.session.rollback()
+            names = [p.Name for p in Product.query.filter(Product.ProductID.in_(e.product_ids))]
+            return jsonify(
+                {
+                    "success": False,
+                    "message": "Không đủ hàng trong kho: " + ", ".join(names),
+                }
             )
-            db.session.add(order_detail)
-
-        # Xóa giỏ hàng sau khi tạo đơn hàng thành công
-        for cart_detail in cart_details:
-            db.session.delete(cart_detail)
-        db.session.delete(cart)
+        total_price = new_order.TotalPrice
 
         db.session.commit()
 
@@ -862,12 +748,82 @@ def db_check():
         return jsonify(status="error", message=str(e)), 500
 
 
+@bp.route("/admin/query-stats")
+def query_stats():
+    """Số liệu truy vấn SQL theo endpoint (từ query budget middleware)"""
+    if not session.get("is_admin"):
+        return redirect(url_for("auth.dashboard_login"))
+
+    if request.args.get("reset"):
+        query_budget.reset()
+
+    return jsonify(
+        {
+            "success": True,
+            "record_queries": current_app.config.get("SQLALCHEMY_RECORD_QUERIES", False),
+            "default_budget": current_app.config.get("QUERY_BUDGET_DEFAULT"),
+            "budgets": current_app.config.get("QUERY_BUDGETS", {}),
+            "endpoints": query_budget.snapshot(),
+        }
+    )
+
+
 @bp.route("/admin")
 def dashboard():
     if not session.get("is_admin"):
         return redirect(url_for("auth.dashboard_login"))
-    # Render simple dashboard shell; template exists at backend/pages/dashboard.html
-    return render_template("backend/pages/dashboard.html")
+    # Số liệu đơn hàng đọc từ các bảng rollup (order_daily_stats, daily_sales)
+    months = 6
+    stats = order_stats.summary(months=months)
+    start = sales_rollup.window_start(months)
+    revenue = sales_rollup.monthly_revenue(start, months)
+    users = dict(
+        db.session.query(User.Role, db.func.count(User.UserID))
+        .filter(User.IsDelete == False)  # noqa: E712
+        .group_by(User.Role)
+        .all()
+    )
+    recent_orders = (
+        order_listing.base_query()
+        .options(contains_eager(Order.user))
+        .order_by(Order.CreatedAt.desc(), Order.OrderID.desc())
+        .limit(5)
+        .all()
+    )
+
+    return render_template(
+        "backend/pages/dashboard.html",
+        total_products=db.session.query(db.func.count(Product.ProductID)).scalar(),
+        total_orders=stats["total_orders"],
+        total_revenue=stats["total_revenue"],
+        total_users=sum(users.values()),
+        total_admin_users=users.get("admin", 0),
+        total_normal_users=users.get("user", 0),
+        total_categories=len(reference_data.all_categories()),
+        total_brands=len(reference_data.all_brands()),
+        order_status_labels=json.dumps(
+            [order_stats.STATUS_LABELS[status] for status in order_stats.STATUSES], ensure_ascii=False
+        ),
+        order_status_data=json.dumps([stats["status_counts"][status] for status in order_stats.STATUSES]),
+        months=json.dumps([month["month"] for month in stats["monthly_orders"]]),
+        orders_count=json.dumps([month["count"] for month in stats["monthly_orders"]]),
+        orders_revenue=json.dumps([amount for _, amount in revenue]),
+        top_products=[
+            {"id": row.ProductID, "name": row.Name, "total_sold": row.quantity, "revenue": row.revenue}
+            for row in sales_rollup.top_products(start, limit=5)
+        ],
+        recent_orders=[
+            {
+                "id": order.OrderID,
+                "user": {"name": order.user.Name},
+                "total_price": order.TotalPrice,
+                "status": order.Status,
+                "created_at": order.CreatedAt,
+            }
+            for order in recent_orders
+        ],
+        rollup_updated_at=sales_rollup.last_run(),
+    )
 
 
 @bp.route("/about-us")
@@ -885,12 +841,7 @@ def pc_list():
     pc_products = Product.query.filter_by(IsPC=1).all()
 
     # Lấy tất cả category có parentID là PC
-    pc_parent = Category.query.filter_by(Name="PC").first()
-    pc_categories = (
-        Category.query.filter_by(ParentID=pc_parent.CategoryID).all()
-        if pc_parent
-        else []
-    )
+    pc_categories = reference_data.child_categories(reference_data.pc_parent_category())
 
     return render_template(
         "backend/pages/build_pc/pc_list.html",
@@ -907,8 +858,7 @@ def create_pc():
 
     # Lấy tất cả nhóm lựa chọn có sẵn
     available_groups = PcOptionGroup.query.all()
-    category_PC = Category.query.filter_by(Name="PC").first()
-    pc_categories = Category.query.filter_by(ParentID=category_PC.CategoryID).all()
+    pc_categories = reference_data.child_categories(reference_data.pc_parent_category())
 
     return render_template(
         "backend/pages/build_pc/create_pc.html",
@@ -950,23 +900,8 @@ def save_pc_product():
                 {"success": False, "message": "Vui lòng chọn ít nhất một nhóm lựa chọn"}
             )
 
-        # Xử lý upload ảnh
-        image_url = None
-        if pc_image:
-            # Tạo tên file unique
-            from werkzeug.utils import secure_filename
-            filename = secure_filename(pc_image.filename)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            unique_filename = f"pc_{timestamp}_{filename}"
-            
-            # Lưu file vào thư mục static/images/products
-            upload_folder = os.path.join("static", "images", "products")
-            os.makedirs(upload_folder, exist_ok=True)
-            file_path = os.path.join(upload_folder, unique_filename)
-            pc_image.save(file_path)
-            
-            # Lưu đường dẫn tương đối (không có /static/ ở đầu vì Flask tự động thêm)
-            image_url = f"images/products/{unique_filename}"
+        # Lưu ảnh gốc, ảnh thu nhỏ được tạo ở thread nền
+        image_url = image_pipeline.save_upload(pc_image)
 
         # Tạo sản phẩm PC mới
         new_pc = Product(
@@ -1113,49 +1048,19 @@ def admin_pc_detail(product_id):
     # Lấy sản phẩm PC
     pc_product = Product.query.filter_by(ProductID=product_id, IsPC=1).first_or_404()
 
-    # Lấy tất cả nhóm lựa chọn có linh kiện (đã được thêm vào PC)
-    all_groups = PcOptionGroup.query.all()
-
     # Lấy tất cả category có parentID là PC
-    pc_parent = Category.query.filter_by(Name="PC").first()
-    pc_categories = (
-        Category.query.filter_by(ParentID=pc_parent.CategoryID).all()
-        if pc_parent
-        else []
-    )
-
-    # Tạo dictionary để lưu thông tin nhóm và sản phẩm
-    groups_with_products = []
-    for group in all_groups:
-        # Lấy tất cả sản phẩm trong nhóm này
-        group_items = PcOptionItem.query.filter_by(
-            OptionGroupID=group.OptionGroupID
-        ).all()
-
-        if group_items:  # Chỉ hiển thị nhóm có sản phẩm (đã được thêm vào PC)
-            products_in_group = []
-            for item in group_items:
-                product = Product.query.get(item.ProductID)
-                if product:
-                    products_in_group.append(
-                        {"product": product, "is_default": item.IsDefault}
-                    )
-
-            groups_with_products.append({"group": group, "products": products_in_group})
+    pc_categories = reference_data.child_categories(reference_data.pc_parent_category())
 
-    # Tags
-    product_tags = ProductTag.query.filter_by(ProductID=product_id).all()
-    current_tags = [
-        Tag.query.get(pt.TagID) for pt in product_tags if Tag.query.get(pt.TagID)
-    ]
-    all_tags = Tag.query.all()
+    # Nhóm lựa chọn + linh kiện và tags hiện tại (số truy vấn cố định)
+    configurator = load_configurator(product_id)
+    all_tags = reference_data.all_tags()
 
     return render_template(
         "backend/pages/build_pc/pc_detail.html",
         pc_product=pc_product,
-        groups_with_products=groups_with_products,
+        groups_with_products=configurator["groups_with_products"],
         pc_categories=pc_categories,
-        current_tags=current_tags,
+        current_tags=configurator["current_tags"],
         all_tags=all_tags,
     )
 
@@ -1340,25 +1245,9 @@ def update_pc_info(product_id):
         # Xử lý upload ảnh nếu có
         if "edit-pc-image" in request.files:
             image_file = request.files["edit-pc-image"]
-            if image_file and image_file.filename:
-                # Tạo tên file unique
-                filename = (
-                    str(uuid.uuid4())
-                    + "."
-                    + image_file.filename.rsplit(".", 1)[1].lower()
-                )
-
-                # Lưu file vào thư mục static/images/products/
-                upload_folder = os.path.join(
-                    current_app.static_folder, "images", "products"
-                )
-                os.makedirs(upload_folder, exist_ok=True)
-
-                file_path = os.path.join(upload_folder, filename)
-                image_file.save(file_path)
-
-                # Cập nhật đường dẫn ảnh
-                pc_product.ImageURL = f"images/products/{filename}"
+            image_url = image_pipeline.save_upload(image_file)
+            if image_url:
+                pc_product.ImageURL = image_url
 
         db.session.commit()
 
@@ -1,7 +1,8 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, Response, render_template, request, redirect, stream_with_context, url_for, flash, session
 from models.tables import Order, OrderDetail, User, Product
 from config.database import db
-from datetime import datetime
+from utils import order_export, order_listing, order_stats, reference_data, sales_rollup, stock
+from utils.sales_counter import record_status_change
 
 bp = Blueprint('orders', __name__)
 
@@ -12,9 +13,38 @@ def list_orders():
     if not session.get('is_admin'):
         return redirect(url_for('auth.dashboard_login'))
     
-    # Lấy tất cả đơn hàng với thông tin user
-    orders = db.session.query(Order).join(User).filter(User.IsDelete == False).order_by(Order.CreatedAt.desc()).all()
-    return render_template('backend/pages/orders/list.html', orders=orders)
+    # Phân trang keyset theo (CreatedAt, OrderID), lọc theo trạng thái/ngày/khách hàng
+    page = order_listing.load_page(request.args)
+    return render_template('backend/pages/orders/list.html', **page)
+
+
+@bp.route('/admin/orders/export')
+def export_orders():
+    """Export đơn hàng (kind=orders) hoặc dòng đơn hàng (kind=lines) dạng CSV/JSONL.
+
+    Tham số: format=csv|jsonl, kind=orders|lines, from/to=YYYY-MM-DD, status.
+    File được stream theo lô, bộ nhớ không phụ thuộc số đơn hàng.
+    """
+    if not session.get('is_admin'):
+        return redirect(url_for('auth.dashboard_login'))
+    
+    fmt = request.args.get('format', 'csv')
+    kind = request.args.get('kind', 'orders')
+    try:
+        start = order_export.parse_date(request.args.get('from'))
+        end = order_export.parse_date(request.args.get('to'), end=True)
+        chunks = order_export.stream(kind, fmt, start, end, request.args.get('status') or None)
+    except order_export.InvalidExport as e:
+        flash(str(e), 'error')
+        return redirect(url_for('orders.list_orders'))
+    
+    return Response(
+        stream_with_context(chunks),
+        mimetype=order_export.FORMATS[fmt],
+        headers={
+            'Content-Disposition': f'attachment; filename={order_export.filename(kind, fmt, start, end)}',
+        },
+    )
 
 
 @bp.route('/admin/orders/<int:order_id>')
@@ -51,11 +81,18 @@ def update_order_status(order_id):
             flash('Trạng thái không hợp lệ!', 'error')
             return redirect(url_for('orders.detail_order', order_id=order_id))
         
+        old_status = order.Status
         order.Status = new_status
+        record_status_change(order, old_status, new_status)
+        order_stats.record_status_change(order, old_status, new_status)
+        stock.apply_status_change(order, old_status, new_status)
         db.session.commit()
         
         flash('Cập nhật trạng thái đơn hàng thành công!', 'success')
         
+    except stock.InsufficientStock:
+        db.session.rollback()
+        flash('Không đủ hàng trong kho để khôi phục đơn hàng!', 'error')
     except Exception as e:
         db.session.rollback()
         flash(f'Lỗi khi cập nhật trạng thái: {str(e)}', 'error')
@@ -69,45 +106,26 @@ def order_statistics():
     if not session.get('is_admin'):
         return redirect(url_for('auth.dashboard_login'))
     
-    # Thống kê tổng quan
-    total_orders = Order.query.count()
-    pending_orders = Order.query.filter_by(Status='pending').count()
-    processing_orders = Order.query.filter_by(Status='processing').count()
-    completed_orders = Order.query.filter_by(Status='completed').count()
-    cancelled_orders = Order.query.filter_by(Status='cancelled').count()
-    
-    # Tổng doanh thu
-    total_revenue = db.session.query(db.func.sum(Order.TotalPrice)).filter_by(Status='completed').scalar() or 0
-    
-    # Đơn hàng theo tháng (6 tháng gần nhất)
-    from sqlalchemy import extract
-    current_date = datetime.now()
-    monthly_orders = []
-    
-    for i in range(6):
-        month = current_date.month - i
-        year = current_date.year
-        if month <= 0:
-            month += 12
-            year -= 1
-        
-        count = Order.query.filter(
-            extract('year', Order.CreatedAt) == year,
-            extract('month', Order.CreatedAt) == month
-        ).count()
-        
-        monthly_orders.append({
-            'month': f"{month:02d}/{year}",
-            'count': count
-        })
-    
-    monthly_orders.reverse()
-    
+    # Đọc từ bảng order_daily_stats (hai câu GROUP BY), không đếm bảng order
+    stats = order_stats.summary(months=6)
+    counts = stats['status_counts']
+    categories = {c.CategoryID: c.Name for c in reference_data.all_categories()}
+    category_revenue = sorted(
+        (
+            {'name': categories.get(category_id, category_id), 'revenue': revenue}
+            for category_id, revenue in sales_rollup.category_revenue(sales_rollup.window_start(6)).items()
+        ),
+        key=lambda row: row['revenue'],
+        reverse=True,
+    )
+
     return render_template('backend/pages/orders/statistics.html',
-                         total_orders=total_orders,
-                         pending_orders=pending_orders,
-                         processing_orders=processing_orders,
-                         completed_orders=completed_orders,
-                         cancelled_orders=cancelled_orders,
-                         total_revenue=total_revenue,
-                         monthly_orders=monthly_orders)
\ No newline at end of file
+                         total_orders=stats['total_orders'],
+                         pending_orders=counts['pending'],
+                         processing_orders=counts['processing'],
+                         completed_orders=counts['completed'],
+                         cancelled_orders=counts['cancelled'],
+                         total_revenue=stats['total_revenue'],
+                         monthly_orders=stats['monthly_orders'],
+                         category_revenue=category_revenue,
+                         rollup_updated_at=sales_rollup.last_run())
\ No newline at end of file
@@ -1,35 +1,15 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app
-from models.tables import Product, Category, Brand
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from models.tables import Product
 from config.database import db
-import os
-import uuid
-from werkzeug.utils import secure_filename
+from utils import reference_data
+from utils import search as product_search
+from utils.image_pipeline import image_pipeline
 
 bp = Blueprint('products', __name__)
 
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
-
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
 def save_uploaded_file(file):
-    """Lưu file upload và trả về đường dẫn"""
-    if file and allowed_file(file.filename):
-        # Tạo tên file unique
-        filename = secure_filename(file.filename)
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-        
-        # Tạo thư mục upload nếu chưa có
-        upload_folder = os.path.join(current_app.static_folder, 'images', 'products')
-        os.makedirs(upload_folder, exist_ok=True)
-        
-        # Lưu file
-        file_path = os.path.join(upload_folder, unique_filename)
-        file.save(file_path)
-        
-        # Trả về đường dẫn relative
-        return f"images/products/{unique_filename}"
-    return None
+    """Lưu file upload, đưa vào image pipeline và trả về đường dẫn"""
+    return image_pipeline.save_upload(file)
 
 
 @bp.route('/admin/products')
@@ -54,16 +34,16 @@ def list_products():
     if brand_filter:
         query = query.filter(Product.BrandID == brand_filter)
     
-    # Áp dụng tìm kiếm theo tên
+    # Áp dụng tìm kiếm full-text (tên, thông số, hãng, danh mục)
     if search:
-        query = query.filter(Product.Name.contains(search))
+        query = product_search.filter_query(query, search)
     
     # Lấy kết quả
     products = query.all()
     
     # Lấy danh sách categories và brands cho filter dropdown
-    categories = Category.query.all()
-    brands = Brand.query.all()
+    categories = reference_data.all_categories()
+    brands = reference_data.all_brands()
     
     return render_template('backend/pages/products/list.html', 
                          products=products, 
@@ -91,8 +71,8 @@ def add_product():
         if not all([name, price, stock, category_id]):
             flash('Vui lòng điền đầy đủ thông tin bắt buộc', 'error')
             return render_template('backend/pages/products/add.html', 
-                                 categories=Category.query.all(), 
-                                 brands=Brand.query.all())
+                                 categories=reference_data.all_categories(), 
+                                 brands=reference_data.all_brands())
         
         try:
             # Xử lý upload ảnh
@@ -121,8 +101,8 @@ def add_product():
             db.session.rollback()
             flash(f'Lỗi khi thêm sản phẩm: {str(e)}', 'error')
     
-    categories = Category.query.all()
-    brands = Brand.query.all()
+    categories = reference_data.all_categories()
+    brands = reference_data.all_brands()
     return render_template('backend/pages/products/add.html', 
                          categories=categories, 
                          brands=brands)
@@ -135,8 +115,8 @@ def detail_product(product_id):
         return redirect(url_for('auth.dashboard_login'))
     
     product = Product.query.get_or_404(product_id)
-    categories = Category.query.all()
-    brands = Brand.query.all()
+    categories = reference_data.all_categories()
+    brands = reference_data.all_brands()
     
     return render_template('backend/pages/products/detail.html', 
                          product=product,
@@ -201,12 +181,8 @@ def delete_product(product_id):
     product = Product.query.get_or_404(product_id)
     
     try:
-        # Xóa ảnh nếu có
-        if product.ImageURL:
-            image_path = os.path.join(current_app.static_folder, product.ImageURL)
-            if os.path.exists(image_path):
-                os.remove(image_path)
-        
+        # File ảnh có thể dùng chung với sản phẩm khác: chỉ bỏ tham chiếu,
+        # blob không còn dùng được xóa bởi `flask images gc`
         db.session.delete(product)
         db.session.commit()
         flash('Xóa sản phẩm thành công', 'success')
@@ -1,6 +1,8 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from models.tables import Tag, ProductTag, Product
 from config.database import db
+from utils import reference_data
+from utils.tag_index import tag_index
 
 bp = Blueprint('tags', __name__)
 
@@ -11,7 +13,7 @@ def list_tags():
     if not session.get('is_admin'):
         return redirect(url_for('auth.dashboard_login'))
     
-    tags = Tag.query.all()
+    tags = reference_data.all_tags()
     return render_template('backend/pages/tags/list.html', tags=tags)
 
 
@@ -88,8 +90,10 @@ def update_tag(tag_id):
             return redirect(url_for('tags.edit_tag', tag_id=tag_id))
         
         # Cập nhật nhãn
+        old_name = tag.Name
         tag.Name = name
         db.session.commit()
+        tag_index.rename_tag(old_name, name)
         
         flash('Cập nhật nhãn thành công!', 'success')
         return redirect(url_for('tags.list_tags'))
@@ -113,8 +117,10 @@ def delete_tag(tag_id):
         ProductTag.query.filter_by(TagID=tag_id).delete()
         
         # Xóa nhãn
+        tag_name = tag.Name
         db.session.delete(tag)
         db.session.commit()
+        tag_index.remove_tag(tag_name)
         
         flash('Xóa nhãn thành công!', 'success')
         
@@ -166,3 +166,28 @@
 	}
 
 })(jQuery);
+
+// Key cho header Idempotency-Key: giữ nguyên khi gửi lại cùng một thao tác
+function newIdempotencyKey() {
+	if (window.crypto && crypto.randomUUID) {
+		return crypto.randomUUID();
+	}
+	return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2) + Math.random().toString(36).slice(2);
+}
+
+// Cập nhật số lượng / tạm tính của mini-cart ở header từ /api/cart/summary
+function refreshMiniCart() {
+	return fetch('/api/cart/summary', { credentials: 'same-origin' })
+		.then(function (response) { return response.json(); })
+		.then(function (data) {
+			if (!data.success) {
+				return;
+			}
+			document.querySelectorAll('[data-cart-count]').forEach(function (el) {
+				el.textContent = data.data.item_count;
+			});
+			document.querySelectorAll('[data-cart-subtotal]').forEach(function (el) {
+				el.textContent = Math.round(data.data.subtotal).toLocaleString('en-US');
+			});
+		});
+}
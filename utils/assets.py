@@ -0,0 +1,339 @@
+"""
+Static asset pipeline
+
+`flask assets build` ghép và minify các bundle CSS/JS trong BUNDLES (theo
+đúng thứ tự trong layout frontend/backend) thành static/dist/<tên>.<hash>.<ext>,
+và ghi static/dist/manifest.json gồm tên file của từng bundle cùng hash nội
+dung của mọi file trong FINGERPRINT_DIRS (font, ảnh giao diện, JS lẻ).
+
+Khi có manifest:
+- bundle_urls('frontend.css') trong template trả về URL của file đã build
+  (không có manifest thì trả về từng file gốc như trước);
+- url_for('static', filename=...) tự thêm ?v=<hash> cho file có trong manifest;
+  url() trong CSS đã build cũng trỏ tới font/ảnh kèm ?v=<hash>;
+- file trong static/dist/ và URL có ?v khớp hash được trả về với
+  Cache-Control: immutable, max-age 1 năm, nên lần truy cập sau trình duyệt
+  không gửi request nào cho CSS/JS/font.
+
+Build cũng nén sẵn các file text (COMPRESS_EXTENSIONS, cả bundle) thành file
+.br (nếu cài Brotli) và .gz cạnh file gốc. View static chọn bản nén theo
+Accept-Encoding (br ưu tiên hơn gzip khi cùng q), luôn trả Vary:
+Accept-Encoding; mỗi bản có ETag riêng và hỗ trợ Range/If-None-Match như
+file gốc (send_from_directory), nên không phải nén lại ở mỗi request.
+
+Sửa CSS/JS thì chạy lại `flask assets build` rồi khởi động lại app (manifest
+chỉ đọc lúc khởi động); xóa static/dist/ để quay về phục vụ file gốc.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+import click
+from flask import current_app, request, send_from_directory, url_for
+from flask.cli import AppGroup
+
+try:
+    import rcssmin
+    import rjsmin
+except ImportError:  # Không có thì chỉ ghép file, không minify
+    rcssmin = rjsmin = None
+
+try:
+    import brotli
+except ImportError:  # Brotli là tùy chọn: không có thì chỉ tạo .gz
+    brotli = None
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 12
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Thư mục chứa file tĩnh của giao diện (ảnh upload trong images/ thay đổi lúc chạy)
+FINGERPRINT_DIRS = ('css', 'js', 'fonts', 'img', 'backend')
+# File text đáng nén (woff/woff2, ảnh raster đã nén sẵn)
+COMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.ttf', '.eot', '.otf', '.json')
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_MIN_SAVING = 0.9  # chỉ giữ bản nén nhỏ hơn 90% file gốc
+# Thứ tự ưu tiên khi trình duyệt nhận cả hai với cùng q
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+ENCODING_SUFFIXES = tuple(suffix for _, suffix in ENCODINGS)
+
+BUNDLES = {
+    'frontend.css': (
+        'css/bootstrap.min.css',
+        'css/slick.css',
+        'css/chat.css',
+        'css/slick-theme.css',
+        'css/nouislider.min.css',
+        'css/font-awesome.min.css',
+        'css/style.css',
+    ),
+    'frontend.js': (
+        'js/jquery.min.js',
+        'js/bootstrap.min.js',
+        'js/slick.min.js',
+        'js/nouislider.min.js',
+        'js/jquery.zoom.min.js',
+        'js/main.js',
+    ),
+    'backend.css': (
+        'backend/css/styles.css',
+    ),
+    'backend.js': (
+        'backend/js/scripts.js',
+        'backend/js/datatables-simple-demo.js',
+    ),
+}
+
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+CSS_CHARSET = re.compile(r'@charset\s+[\'"][^\'"]*[\'"]\s*;')
+EXTERNAL_PREFIXES = ('data:', 'http:', 'https:', '//', '/', '#')
+
+assets_cli = AppGroup('assets', help='Đóng gói và fingerprint file tĩnh (CSS/JS)')
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def file_hashes(static_folder):
+    """{đường dẫn tương đối: hash nội dung} của các file trong FINGERPRINT_DIRS"""
+    hashes = {}
+    for directory in FINGERPRINT_DIRS:
+        for root, _, files in os.walk(os.path.join(static_folder, directory)):
+            for name in files:
+                if name.endswith(ENCODING_SUFFIXES):
+                    continue
+                path = os.path.join(root, name)
+                with open(path, 'rb') as f:
+                    hashes[os.path.relpath(path, static_folder).replace(os.sep, '/')] = content_hash(f.read())
+    return hashes
+
+
+def rewrite_css_urls(css, source, hashes):
+    """Đổi url() tương đối của `source` thành tương đối với static/dist/ (kèm ?v=hash)"""
+    base = posixpath.dirname(source)
+
+    def replace(match):
+        quote, url = match.group(1), match.group(2).strip()
+        if url.startswith(EXTERNAL_PREFIXES):
+            return match.group(0)
+        path, hash_sign, fragment = url.partition('#')
+        target = posixpath.normpath(posixpath.join(base, path.split('?', 1)[0]))
+        new_url = posixpath.relpath(target, DIST_DIR)
+        if target in hashes:
+            new_url += '?v=' + hashes[target]
+        return f'url({quote}{new_url}{hash_sign}{fragment}{quote})'
+
+    return CSS_URL.sub(replace, css)
+
+
+def _read(static_folder, source):
+    with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+        return f.read()
+
+
+def build_bundle(static_folder, name, hashes):
+    """Nội dung (bytes) của bundle `name` đã ghép và minify"""
+    sources = BUNDLES[name]
+    if name.endswith('.css'):
+        parts = [CSS_CHARSET.sub('', rewrite_css_urls(_read(static_folder, s), s, hashes)) for s in sources]
+        text = '\n'.join(parts)
+        if rcssmin:
+            text = rcssmin.cssmin(text, keep_bang_comments=True)
+        text = '@charset "UTF-8";\n' + text
+    else:
+        # Mỗi file kết thúc bằng ';' để file sau không bị nối vào biểu thức trước
+        parts = [_read(static_folder, s) for s in sources]
+        if rjsmin:
+            parts = [rjsmin.jsmin(part, keep_bang_comments=True) for part in parts]
+        text = ';\n'.join(part.strip() for part in parts) + ';\n'
+    return text.encode('utf-8')
+
+
+def _write_atomic(path, data):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _encoders():
+    encoders = {}
+    if brotli:
+        encoders['br'] = lambda data: brotli.compress(data, quality=11)
+    encoders['gzip'] = lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    return encoders
+
+
+def compress_files(static_folder, paths):
+    """Tạo file .br/.gz cạnh các file text trong `paths` (bỏ qua bản nén còn
+    mới hơn file gốc); trả về {đường dẫn: [encoding đã có bản nén]}"""
+    encoders = _encoders()
+    compressed = {}
+    for path in sorted(paths):
+        source = os.path.join(static_folder, path)
+        if not path.endswith(COMPRESS_EXTENSIONS) or os.path.getsize(source) < COMPRESS_MIN_SIZE:
+            continue
+        data = None
+        for encoding, suffix in ENCODINGS:
+            if encoding not in encoders:
+                continue
+            target = source + suffix
+            if not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(source):
+                if data is None:
+                    with open(source, 'rb') as f:
+                        data = f.read()
+                encoded = encoders[encoding](data)
+                if len(encoded) > len(data) * COMPRESS_MIN_SAVING:
+                    if os.path.exists(target):
+                        os.remove(target)
+                    continue
+                _write_atomic(target, encoded)
+            compressed.setdefault(path, []).append(encoding)
+    return compressed
+
+
+def build(static_folder):
+    """Build các bundle và ghi manifest; trả về manifest mới.
+
+    Giữ lại file của lần build trước (trang HTML đã cache có thể còn trỏ tới),
+    xóa các file cũ hơn.
+    """
+    dist = os.path.join(static_folder, DIST_DIR)
+    os.makedirs(dist, exist_ok=True)
+    previous = load_manifest(static_folder)
+    hashes = file_hashes(static_folder)
+
+    bundles = {}
+    for name in BUNDLES:
+        data = build_bundle(static_folder, name, hashes)
+        stem, ext = name.rsplit('.', 1)
+        filename = f'{stem}.{content_hash(data)}.{ext}'
+        path = os.path.join(dist, filename)
+        if not os.path.exists(path):
+            _write_atomic(path, data)
+        bundles[name] = f'{DIST_DIR}/{filename}'
+
+    compressed = compress_files(static_folder, [*hashes, *bundles.values()])
+    manifest = {'bundles': bundles, 'files': hashes, 'compressed': compressed}
+    _write_atomic(os.path.join(dist, MANIFEST_NAME), json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8'))
+
+    keep = {MANIFEST_NAME} | {
+        posixpath.basename(path) for path in (*bundles.values(), *previous['bundles'].values())
+    }
+    for filename in os.listdir(dist):
+        base, suffix = os.path.splitext(filename)
+        if filename not in keep and not (suffix in ENCODING_SUFFIXES and base in keep):
+            os.remove(os.path.join(dist, filename))
+    return manifest
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    return {key: manifest.get(key, {}) for key in ('bundles', 'files', 'compressed')}
+
+
+class Assets:
+    """Manifest đã build: URL bundle, ?v=hash cho url_for, bản nén sẵn và
+    header cache"""
+
+    def __init__(self):
+        self.bundles = {}
+        self.files = {}
+        self.compressed = {}
+
+    def init_app(self, app):
+        self.load(app.static_folder)
+        app.cli.add_command(assets_cli)
+        if app.has_static_folder:
+            app.view_functions['static'] = self.send_static
+        app.url_defaults(self._add_version)
+        app.after_request(self._cache_headers)
+        app.jinja_env.globals['bundle_urls'] = self.bundle_urls
+
+    def load(self, static_folder):
+        manifest = load_manifest(static_folder)
+        self.bundles, self.files, self.compressed = manifest['bundles'], manifest['files'], manifest['compressed']
+
+    def bundle_urls(self, name):
+        """URL của bundle đã build, hoặc các file gốc khi chưa build"""
+        if name in self.bundles:
+            return [url_for('static', filename=self.bundles[name])]
+        return [url_for('static', filename=source) for source in BUNDLES[name]]
+
+    def _negotiate(self, encodings):
+        """Encoding tốt nhất theo Accept-Encoding trong số bản nén có sẵn"""
+        best, best_quality = None, 0
+        for encoding, _ in ENCODINGS:
+            quality = request.accept_encodings[encoding]
+            if encoding in encodings and quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def send_static(self, filename):
+        """View static: trả bản .br/.gz nếu có và trình duyệt nhận, ngược lại file gốc"""
+        encodings = self.compressed.get(filename)
+        encoding = self._negotiate(encodings) if encodings else None
+        if encoding is None:
+            response = current_app.send_static_file(filename)
+        else:
+            response = send_from_directory(
+                current_app.static_folder,
+                filename + dict(ENCODINGS)[encoding],
+                mimetype=mimetypes.guess_type(filename)[0],
+                max_age=current_app.get_send_file_max_age(filename),
+            )
+            response.content_encoding = encoding
+        if encodings:
+            response.vary.add('Accept-Encoding')
+        return response
+
+    def _add_version(self, endpoint, values):
+        if endpoint == 'static' and 'v' not in values:
+            version = self.files.get(values.get('filename'))
+            if version:
+                values['v'] = version
+
+    def _cache_headers(self, response):
+        if request.endpoint != 'static' or response.status_code not in (200, 206, 304):
+            return response
+        filename = (request.view_args or {}).get('filename', '')
+        version = request.args.get('v')
+        if filename.startswith(DIST_DIR + '/') or (version and self.files.get(filename) == version):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        return response
+
+
+assets = Assets()
+
+
+@assets_cli.command('build')
+def build_command():
+    """Ghép, minify và fingerprint các bundle CSS/JS vào static/dist/"""
+    if rcssmin is None:
+        click.echo('Không có rcssmin/rjsmin: chỉ ghép file, không minify', err=True)
+    manifest = build(current_app.static_folder)
+    for name, path in sorted(manifest['bundles'].items()):
+        size = os.path.getsize(os.path.join(current_app.static_folder, path))
+        source_size = sum(os.path.getsize(os.path.join(current_app.static_folder, s)) for s in BUNDLES[name])
+        click.echo(f'{name}: {len(BUNDLES[name])} file, {source_size} -> {size} byte ({path})')
+    click.echo(f"Fingerprint {len(manifest['files'])} file tĩnh; khởi động lại app để dùng manifest mới")
+    if brotli is None:
+        click.echo('Không có Brotli (pip install Brotli): chỉ tạo bản .gz', err=True)
+    for path, encodings in sorted(manifest['compressed'].items()):
+        source = os.path.join(current_app.static_folder, path)
+        sizes = ', '.join(
+            f'{encoding} {os.path.getsize(source + dict(ENCODINGS)[encoding])}' for encoding in encodings
+        )
+        click.echo(f'  {path}: {os.path.getsize(source)} -> {sizes}')
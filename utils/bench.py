@@ -0,0 +1,426 @@
+"""
+Benchmark các luồng đặt hàng
+
+`flask bench checkout` tạo một sản phẩm tạm với tồn kho giới hạn và N người
+dùng tạm, mỗi người có một giỏ hàng, chạy app trên một cổng local rồi bắn N
+request /process-cod-payment song song. Lệnh báo lỗi nếu bán quá tồn kho
+hoặc số liệu kho/đơn hàng không khớp, in throughput và độ trễ, rồi xóa dữ
+liệu tạm.
+
+`flask bench order-lines` đo độ trễ và số câu lệnh SQL của một lần đặt hàng
+(utils.checkout.place_order) với giỏ 1, 20, 200 dòng.
+
+`flask bench configurator` đếm số câu lệnh SQL của
+utils.pc_configurator.load_configurator khi số nhóm lựa chọn, số linh kiện
+mỗi nhóm và số tag của PC tăng, và báo lỗi nếu số câu lệnh thay đổi.
+
+`flask bench export` đo bộ nhớ đỉnh (tracemalloc) khi export dòng đơn hàng với
+số dòng tăng dần và báo lỗi nếu bộ nhớ tăng theo số dòng.
+
+Các lệnh ghi và xóa dữ liệu thật nên chỉ chạy với TestingConfig trên một bản
+sao tạm của DB (đã migrate), và từ chối chạy nếu DB đích là DB dev/prod đã cấu
+hình:
+
+    cp config/db.sqlite3 /tmp/bench.db
+    FLASK_ENV=testing TEST_DATABASE_URL=sqlite:////tmp/bench.db flask db upgrade
+    FLASK_ENV=testing TEST_DATABASE_URL=sqlite:////tmp/bench.db flask bench checkout
+"""
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from flask_sqlalchemy.record_queries import get_recorded_queries
+from sqlalchemy.engine import make_url
+from werkzeug.serving import make_server
+
+from config.database import db
+from config.setting import DevelopmentConfig, ProductionConfig
+from models.tables import (
+    Brand,
+    Cart,
+    CartDetail,
+    Category,
+    Order,
+    OrderDetail,
+    PcOptionGroup,
+    PcOptionItem,
+    Product,
+    ProductSales,
+    ProductTag,
+    Tag,
+    User,
+)
+from utils import order_export, order_stats, sales_rollup
+from utils.checkout import place_order
+from utils.pc_configurator import load_configurator
+
+bench_cli = AppGroup('bench', help='Benchmark các luồng ghi quan trọng')
+
+
+def _database_target(uri):
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite' and url.database:
+        return os.path.realpath(url.database)
+    return url.render_as_string(hide_password=False)
+
+
+def _require_scratch_database():
+    """Dừng nếu không chạy với TestingConfig hoặc DB đích là DB dev/prod"""
+    target = _database_target(current_app.config['SQLALCHEMY_DATABASE_URI'])
+    protected = {
+        _database_target(config.SQLALCHEMY_DATABASE_URI) for config in (DevelopmentConfig, ProductionConfig)
+    }
+    if not current_app.testing or target in protected:
+        click.echo(
+            "LỖI: benchmark ghi/xóa dữ liệu thật, chỉ chạy với FLASK_ENV=testing và "
+            "TEST_DATABASE_URL trỏ tới một bản sao tạm của DB (không phải DB dev/prod)",
+            err=True,
+        )
+        sys.exit(1)
+
+
+def _setup(orders, stock, quantity):
+    tag = uuid.uuid4().hex[:8]
+    category = Category.query.first()
+    product = Product(
+        Name=f'bench-{tag}', CategoryID=category.CategoryID, Price=1000, Stock=stock, IsPC=0
+    )
+    db.session.add(product)
+    users = [
+        User(
+            Name=f'bench-{tag}-{i}',
+            Email=f'bench-{tag}-{i}@bench.local',
+            PasswordHash='-',
+            Role='user',
+        )
+        for i in range(orders)
+    ]
+    db.session.add_all(users)
+    db.session.flush()
+    for user in users:
+        cart = Cart(UserID=user.UserID)
+        db.session.add(cart)
+        db.session.flush()
+        db.session.add(
+            CartDetail(
+                CartID=cart.CartID,
+                ProductID=product.ProductID,
+                Quantity=quantity,
+                Price=product.Price,
+            )
+        )
+    db.session.commit()
+    return product.ProductID, [user.UserID for user in users]
+
+
+def _cleanup(product_ids, user_ids):
+    """Xóa dữ liệu tạm (đơn, giỏ, người dùng, sản phẩm) của một lần benchmark"""
+    order_ids = [
+        oid for (oid,) in db.session.query(Order.OrderID).filter(Order.UserID.in_(user_ids))
+    ]
+    cart_ids = [cid for (cid,) in db.session.query(Cart.CartID).filter(Cart.UserID.in_(user_ids))]
+    if order_ids:
+        order_stats.forget_orders(order_ids)
+        days = sales_rollup.order_days(order_ids)
+        OrderDetail.query.filter(OrderDetail.OrderID.in_(order_ids)).delete()
+        Order.query.filter(Order.OrderID.in_(order_ids)).delete()
+        sales_rollup.refresh_days(days)
+    if cart_ids:
+        CartDetail.query.filter(CartDetail.CartID.in_(cart_ids)).delete()
+        Cart.query.filter(Cart.CartID.in_(cart_ids)).delete()
+    User.query.filter(User.UserID.in_(user_ids)).delete()
+    ProductSales.query.filter(ProductSales.ProductID.in_(product_ids)).delete()
+    Product.query.filter(Product.ProductID.in_(product_ids)).delete()
+    db.session.commit()
+
+
+def _post(url, cookie):
+    request = urllib.request.Request(url, data=b'', method='POST', headers={'Cookie': cookie})
+    started = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=60) as response:
+        body = json.loads(response.read())
+    return body.get('success', False), time.perf_counter() - started
+
+
+@bench_cli.command('checkout')
+@click.option('--orders', default=300, show_default=True, help='Số lượt đặt hàng song song')
+@click.option('--stock', default=100, show_default=True, help='Tồn kho ban đầu của sản phẩm tạm')
+@click.option('--quantity', default=1, show_default=True, help='Số lượng mỗi đơn')
+@click.option('--workers', default=32, show_default=True, help='Số client đồng thời')
+def checkout_command(orders, stock, quantity, workers):
+    """Đặt hàng song song trên một sản phẩm, kiểm tra không bán quá tồn kho"""
+    _require_scratch_database()
+    app = current_app._get_current_object()
+    product_id, user_ids = _setup(orders, stock, quantity)
+    db.session.remove()
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f'http://127.0.0.1:{server.server_port}/process-cod-payment'
+    serializer = app.session_interface.get_signing_serializer(app)
+    cookie_name = app.config['SESSION_COOKIE_NAME']
+    cookies = [f'{cookie_name}={serializer.dumps({"user_id": uid})}' for uid in user_ids]
+
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda c: _post(url, c), cookies))
+        elapsed = time.perf_counter() - started
+    finally:
+        server.shutdown()
+
+    try:
+        succeeded = sum(1 for ok, _ in results if ok)
+        remaining = db.session.get(Product, product_id).Stock
+        sold = (
+            db.session.query(db.func.coalesce(db.func.sum(OrderDetail.Quantity), 0))
+            .filter(OrderDetail.ProductID == product_id)
+            .scalar()
+        )
+        latencies = sorted(latency for _, latency in results)
+
+        click.echo(f"Đơn thành công: {succeeded}/{orders} (tồn kho ban đầu {stock}, {quantity}/đơn)")
+        click.echo(f"Tồn kho còn lại: {remaining}, đã bán: {sold}")
+        click.echo(
+            f"Throughput: {orders / elapsed:.1f} request/s, "
+            f"p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms"
+        )
+
+        problems = []
+        if remaining < 0 or sold > stock:
+            problems.append("bán quá tồn kho")
+        if remaining + sold != stock or sold != succeeded * quantity:
+            problems.append("số liệu kho và đơn hàng không khớp")
+        if succeeded < min(orders, stock // quantity):
+            problems.append("có đơn thất bại dù còn hàng")
+    finally:
+        _cleanup([product_id], user_ids)
+
+    if problems:
+        click.echo("LỖI: " + "; ".join(problems), err=True)
+        sys.exit(1)
+    click.echo("OK: không bán quá tồn kho")
+
+
+@bench_cli.command('order-lines')
+@click.option('--lines', default='1,20,200', show_default=True, help='Các kích thước giỏ, cách nhau bởi dấu phẩy')
+@click.option('--repeat', default=20, show_default=True, help='Số lần đặt hàng cho mỗi kích thước')
+def order_lines_command(lines, repeat):
+    """Độ trễ mỗi đơn theo số dòng trong giỏ"""
+    _require_scratch_database()
+    sizes = [int(size) for size in lines.split(',') if size.strip()]
+    tag = uuid.uuid4().hex[:8]
+    category = Category.query.first()
+    user = User(Name=f'bench-{tag}', Email=f'bench-{tag}@bench.local', PasswordHash='-', Role='user')
+    products = [
+        Product(Name=f'bench-{tag}-{i}', CategoryID=category.CategoryID, Price=1000, Stock=10**9, IsPC=0)
+        for i in range(max(sizes))
+    ]
+    db.session.add(user)
+    db.session.add_all(products)
+    db.session.commit()
+    user_id = user.UserID
+    product_ids = [p.ProductID for p in products]
+
+    try:
+        click.echo(f"{'dòng':>6} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'SQL/đơn':>8}")
+        for size in sizes:
+            timings = []
+            statements = 0
+            for _ in range(repeat):
+                cart = Cart(UserID=user_id)
+                db.session.add(cart)
+                db.session.flush()
+                db.session.execute(
+                    CartDetail.__table__.insert(),
+                    [
+                        {'CartID': cart.CartID, 'ProductID': pid, 'Quantity': 1,
+                         'Price': 1000, 'ReservedQuantity': 0}
+                        for pid in product_ids[:size]
+                    ],
+                )
+                db.session.commit()
+
+                before = len(get_recorded_queries())
+                started = time.perf_counter()
+                place_order(user_id)
+                db.session.commit()
+                timings.append(time.perf_counter() - started)
+                statements = len(get_recorded_queries()) - before
+
+            timings.sort()
+            click.echo(
+                f"{size:>6} {timings[len(timings) // 2] * 1000:>9.2f} "
+                f"{timings[max(int(len(timings) * 0.95) - 1, 0)] * 1000:>9.2f} "
+                f"{timings[-1] * 1000:>9.2f} {statements:>8}"
+            )
+    finally:
+        _cleanup(product_ids, [user_id])
+
+
+def _seed_configurator(tag, groups, items):
+    """Một PC tạm có `items` tag và `groups` nhóm lựa chọn, mỗi nhóm `items` linh kiện"""
+    category = Category.query.first()
+    brand = Brand.query.first()
+
+    def product(name, is_pc=0):
+        return Product(
+            Name=name, CategoryID=category.CategoryID, BrandID=brand.BrandID if brand else None,
+            Price=1000, Stock=1, IsPC=is_pc,
+        )
+
+    pc = product(f'bench-{tag}-pc', is_pc=1)
+    db.session.add(pc)
+    for g in range(groups):
+        group = PcOptionGroup(Name=f'bench-{tag}-{g}')
+        for i in range(items):
+            group.items.append(PcOptionItem(product=product(f'bench-{tag}-{g}-{i}'), IsDefault=int(i == 0)))
+        db.session.add(group)
+    for i in range(items):
+        db.session.add(ProductTag(product=pc, tag=Tag(Name=f'bench-{tag}-{i}')))
+    db.session.commit()
+    return pc.ProductID
+
+
+def _cleanup_configurator(tag):
+    group_ids = db.session.query(PcOptionGroup.OptionGroupID).filter(PcOptionGroup.Name.like(f'bench-{tag}-%'))
+    tag_ids = db.session.query(Tag.TagID).filter(Tag.Name.like(f'bench-{tag}-%'))
+    PcOptionItem.query.filter(PcOptionItem.OptionGroupID.in_(group_ids)).delete(synchronize_session=False)
+    PcOptionGroup.query.filter(PcOptionGroup.Name.like(f'bench-{tag}-%')).delete(synchronize_session=False)
+    ProductTag.query.filter(ProductTag.TagID.in_(tag_ids)).delete(synchronize_session=False)
+    Tag.query.filter(Tag.Name.like(f'bench-{tag}-%')).delete(synchronize_session=False)
+    Product.query.filter(Product.Name.like(f'bench-{tag}-%')).delete(synchronize_session=False)
+    db.session.commit()
+
+
+@bench_cli.command('configurator')
+@click.option('--groups', default='1,5,20', show_default=True, help='Số nhóm lựa chọn tạm, cách nhau bởi dấu phẩy')
+@click.option('--items', default='1,10', show_default=True, help='Số linh kiện mỗi nhóm (và số tag của PC)')
+def configurator_command(groups, items):
+    """Số câu lệnh SQL của trang cấu hình PC không tăng theo số nhóm/linh kiện"""
+    _require_scratch_database()
+    group_sizes = [int(size) for size in groups.split(',') if size.strip()]
+    item_sizes = [int(size) for size in items.split(',') if size.strip()]
+
+    counts = {}
+    click.echo(f"{'nhóm':>6} {'linh kiện':>10} {'SQL':>5} {'ms':>8}")
+    for group_count in group_sizes:
+        for item_count in item_sizes:
+            tag = uuid.uuid4().hex[:8]
+            try:
+                product_id = _seed_configurator(tag, group_count, item_count)
+                db.session.expunge_all()
+                before = len(get_recorded_queries())
+                started = time.perf_counter()
+                payload = load_configurator(product_id, default_first=True)
+                elapsed = time.perf_counter() - started
+                # Duyệt dữ liệu như template để lazy load (nếu có) cũng được đếm
+                for entry in payload['groups_with_products']:
+                    for item in entry['products']:
+                        item['product'].brand, item['product'].category
+                statements = len(get_recorded_queries()) - before
+            finally:
+                db.session.rollback()
+                _cleanup_configurator(tag)
+            counts[(group_count, item_count)] = statements
+            click.echo(f"{group_count:>6} {item_count:>10} {statements:>5} {elapsed * 1000:>8.2f}")
+
+    if len(set(counts.values())) > 1:
+        click.echo("LỖI: số câu lệnh SQL thay đổi theo số nhóm/linh kiện", err=True)
+        sys.exit(1)
+    click.echo(f"OK: {next(iter(counts.values()))} câu lệnh SQL cho mọi kích thước")
+
+
+def _cleanup_export(product_id, user_id):
+    """Xóa đơn tạm của bench export.
+
+    Các đơn này được chèn thẳng bằng SQL nên chưa từng được cộng vào
+    order_daily_stats; xóa trực tiếp thay vì qua _cleanup (forget_orders sẽ trừ
+    chúng và để lại số âm trong thống kê).
+    """
+    order_ids = db.session.query(Order.OrderID).filter(Order.UserID == user_id)
+    days = sales_rollup.order_days(order_ids)
+    OrderDetail.query.filter(OrderDetail.OrderID.in_(order_ids)).delete(synchronize_session=False)
+    Order.query.filter(Order.UserID == user_id).delete(synchronize_session=False)
+    sales_rollup.refresh_days(days)
+    db.session.commit()
+    _cleanup([product_id], [user_id])
+
+
+@bench_cli.command('export')
+@click.option('--rows', default='5000,50000', show_default=True, help='Các số dòng export, cách nhau bởi dấu phẩy')
+def export_command(rows):
+    """Bộ nhớ đỉnh của export CSV/JSONL không tăng theo số dòng"""
+    _require_scratch_database()
+    sizes = sorted(int(size) for size in rows.split(',') if size.strip())
+    tag = uuid.uuid4().hex[:8]
+    category = Category.query.first()
+    user = User(Name=f'bench-{tag}', Email=f'bench-{tag}@bench.local', PasswordHash='-', Role='user')
+    product = Product(Name=f'bench-{tag}', CategoryID=category.CategoryID, Price=1000, Stock=0, IsPC=0)
+    db.session.add_all([user, product])
+    db.session.commit()
+    user_id, product_id = user.UserID, product.ProductID
+
+    # Đơn hàng tạm nằm trong một khoảng thời gian riêng để export chỉ đọc chúng
+    base = datetime(2100, 1, 1) + timedelta(days=int(tag, 16) % 3650)
+    last_id = db.session.query(db.func.coalesce(db.func.max(Order.OrderID), 0)).scalar()
+    order_ids = range(last_id + 1, last_id + 1 + max(sizes))
+    db.session.execute(
+        Order.__table__.insert(),
+        [
+            {'OrderID': oid, 'UserID': user_id, 'TotalPrice': 1000, 'Status': 'completed',
+             'CreatedAt': base + timedelta(seconds=i)}
+            for i, oid in enumerate(order_ids)
+        ],
+    )
+    db.session.execute(
+        OrderDetail.__table__.insert(),
+        [{'OrderID': oid, 'ProductID': product_id, 'Quantity': 1, 'Price': 1000} for oid in order_ids],
+    )
+    db.session.commit()
+
+    problems = []
+    try:
+        click.echo(f"{'fmt':>6} {'dòng':>8} {'MB ra':>8} {'peak KB':>9} {'giây':>7}")
+        for fmt in order_export.FORMATS:
+            peaks = []
+            for size in sizes:
+                db.session.expunge_all()
+                tracemalloc.start()
+                started = time.perf_counter()
+                written = 0
+                for chunk in order_export.stream('lines', fmt, base, base + timedelta(seconds=size)):
+                    written += len(chunk)
+                elapsed = time.perf_counter() - started
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                peaks.append(peak)
+                click.echo(
+                    f"{fmt:>6} {size:>8} {written / 2**20:>8.1f} {peak / 1024:>9.0f} {elapsed:>7.2f}"
+                )
+            # Cho phép dao động nhỏ (cache compile, buffer), không cho tăng theo số dòng
+            if peaks[-1] > peaks[0] * 1.5 + 256 * 1024:
+                problems.append(f"{fmt}: bộ nhớ đỉnh tăng theo số dòng")
+    finally:
+        _cleanup_export(product_id, user_id)
+
+    if problems:
+        click.echo("LỖI: " + "; ".join(problems), err=True)
+        sys.exit(1)
+    click.echo("OK: bộ nhớ export không phụ thuộc số dòng")
+
+
+def init_app(app):
+    app.cli.add_command(bench_cli)
@@ -0,0 +1,238 @@
+"""
+Read-through cache với invalidation theo tag
+
+Mỗi entry được lưu kèm phiên bản (version) của các tag phụ thuộc, ví dụ
+'brands', 'categories', 'tags', 'product:<id>', 'pc_options'.
+Invalidate một tag chỉ tăng version của tag đó; entry nào ghi version cũ sẽ bị
+coi là miss ở lần đọc sau.
+
+Backend chọn theo CACHE_TYPE:
+    'simple' / 'lru'  LRU trong process (mặc định)
+    'redis'           dùng chung giữa các worker (cần gói redis, CACHE_REDIS_URL)
+    'null'            tắt cache
+
+Các thay đổi Brand/Category/Tag/Product/PcOptionGroup/PcOptionItem được
+commit qua ORM sẽ tự invalidate tag tương ứng (session events). Với backend LRU,
+invalidation chỉ có hiệu lực trong process thực hiện ghi; các process khác
+thấy dữ liệu mới sau tối đa CACHE_DEFAULT_TIMEOUT giây.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models.tables import Brand, Category, PcOptionGroup, PcOptionItem, Product, Tag
+
+
+class NullBackend:
+    shared = False
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+    def tag_versions(self, tags):
+        return {}
+
+    def bump_tags(self, tags):
+        pass
+
+
+class LRUBackend:
+    shared = False
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (hết hạn lúc, value)
+        self._versions = {}  # tag -> version, không bị LRU loại bỏ
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        expires_at = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def tag_versions(self, tags):
+        with self._lock:
+            return {tag: self._versions.get(tag, 0) for tag in tags}
+
+    def bump_tags(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+
+class RedisBackend:
+    shared = True
+
+    def __init__(self, url, prefix='bmt:'):
+        import redis
+
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        raw = self._client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, timeout):
+        self._client.set(self.prefix + key, pickle.dumps(value), ex=timeout or None)
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+    def clear(self):
+        keys = list(self._client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self._client.delete(*keys)
+
+    def tag_versions(self, tags):
+        tags = list(tags)
+        if not tags:
+            return {}
+        values = self._client.mget([f'{self.prefix}tag:{tag}' for tag in tags])
+        return {tag: int(value or 0) for tag, value in zip(tags, values)}
+
+    def bump_tags(self, tags):
+        pipe = self._client.pipeline()
+        for tag in tags:
+            pipe.incr(f'{self.prefix}tag:{tag}')
+        pipe.execute()
+
+
+def _create_backend(config):
+    cache_type = config.get('CACHE_TYPE', 'simple')
+    if cache_type in ('simple', 'lru'):
+        return LRUBackend(max_entries=config.get('CACHE_MAX_ENTRIES', 1024))
+    if cache_type == 'redis':
+        return RedisBackend(config['CACHE_REDIS_URL'], prefix=config.get('CACHE_KEY_PREFIX', 'bmt:'))
+    if cache_type == 'null':
+        return NullBackend()
+    raise ValueError(f"CACHE_TYPE không hợp lệ: {cache_type}")
+
+
+class Cache:
+    def __init__(self):
+        self.backend = NullBackend()
+        self.default_timeout = 300
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.backend = _create_backend(app.config)
+        self.default_timeout = app.config.get('CACHE_DEFAULT_TIMEOUT', 300)
+        event.listen(Session, 'after_flush', _track_changes)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_rollback', _clear_changes)
+
+    def get_or_set(self, key, loader, tags=(), timeout=None):
+        """Trả về giá trị đã cache, hoặc gọi loader() rồi lưu lại.
+
+        Giá trị được lưu qua pickle với backend dùng chung nên loader nên trả
+        về dữ liệu thuần (dict, list, tuple...), không phải ORM instance.
+        """
+        versions = self.backend.tag_versions(tags)
+        entry = self.backend.get(key)
+        if entry is not None:
+            value, stored_versions = entry
+            if stored_versions == versions:
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        value = loader()
+        self.backend.set(key, (value, versions), timeout or self.default_timeout)
+        return value
+
+    def delete(self, key):
+        self.backend.delete(key)
+
+    @property
+    def shared(self):
+        """True nếu version tag dùng chung giữa các worker (backend redis)"""
+        return self.backend.shared
+
+    def versions(self, *tags):
+        """Version hiện tại của các tag (dùng chung giữa worker với backend redis)"""
+        return self.backend.tag_versions(tags)
+
+    def invalidate_tags(self, *tags):
+        if tags:
+            self.backend.bump_tags(tags)
+
+    def clear(self):
+        self.backend.clear()
+
+    def _after_commit(self, session):
+        tags = session.info.pop('cache_tags', None)
+        if tags:
+            self.invalidate_tags(*tags)
+
+
+def tags_for(obj):
+    """Tag cache bị ảnh hưởng khi obj thay đổi"""
+    if isinstance(obj, Brand):
+        return ('brands',)
+    if isinstance(obj, Category):
+        return ('categories',)
+    if isinstance(obj, Tag):
+        return ('tags',)
+    if isinstance(obj, Product):
+        return (f'product:{obj.ProductID}',)
+    if isinstance(obj, (PcOptionGroup, PcOptionItem)):
+        return ('pc_options',)
+    return ()
+
+
+def invalidate_on_commit(session, *tags):
+    """Đánh dấu tag cần invalidate khi session commit (cho UPDATE/DELETE
+    chạy thẳng bằng SQL, không đi qua session events)"""
+    session.info.setdefault('cache_tags', set()).update(tags)
+
+
+def _track_changes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        tags = tags_for(obj)
+        if tags:
+            invalidate_on_commit(session, *tags)
+
+
+def _clear_changes(session):
+    session.info.pop('cache_tags', None)
+
+
+cache = Cache()
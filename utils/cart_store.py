@@ -0,0 +1,122 @@
+"""
+Cart store
+
+Giỏ hàng được đọc bằng một truy vấn (cartdetail JOIN cart JOIN product LEFT
+JOIN brand) nên template không lazy load product/brand theo từng dòng. Tổng
+số lượng và tạm tính được giữ sẵn trong cart.ItemCount / cart.Subtotal: mọi
+thao tác sửa giỏ gọi refresh_totals() trong cùng transaction. Câu UPDATE tính
+lại từ cartdetail nên vẫn đúng khi dòng giỏ bị sửa bằng SQL trực tiếp (giữ chỗ
+tồn kho, xóa dòng bằng DELETE ... RETURNING).
+
+Header và /api/cart/summary chỉ đọc một dòng cart qua summary().
+"""
+from collections import namedtuple
+
+from flask import session
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import contains_eager
+
+from config.database import db
+from models.tables import Cart, CartDetail, Product
+
+CartContents = namedtuple('CartContents', 'cart_id lines subtotal item_count')
+
+
+def _cart_id_of(user_id):
+    # Mỗi user dùng giỏ đầu tiên, giống place_order()
+    return (
+        select(Cart.CartID)
+        .where(Cart.UserID == user_id)
+        .order_by(Cart.CartID)
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+def contents_query(user_id):
+    return (
+        CartDetail.query.join(CartDetail.cart)
+        .join(CartDetail.product)
+        .outerjoin(Product.brand)
+        .filter(CartDetail.CartID == _cart_id_of(user_id))
+        .options(
+            contains_eager(CartDetail.cart),
+            contains_eager(CartDetail.product).contains_eager(Product.brand),
+        )
+        .order_by(CartDetail.CartDetailID)
+    )
+
+
+def load(user_id):
+    """Các dòng giỏ (kèm product, brand) và tổng đã lưu, trong một truy vấn"""
+    lines = contents_query(user_id).all()
+    if not lines:
+        return CartContents(None, [], 0, 0)
+    cart = lines[0].cart
+    return CartContents(cart.CartID, lines, cart.Subtotal, cart.ItemCount)
+
+
+def get_or_create(user_id):
+    cart = Cart.query.filter_by(UserID=user_id).order_by(Cart.CartID).first()
+    if not cart:
+        cart = Cart(UserID=user_id)
+        db.session.add(cart)
+        db.session.flush()
+    return cart
+
+
+def find_line(user_id, product_id):
+    """Dòng giỏ đầu tiên của sản phẩm trong giỏ của user (None nếu không có)"""
+    return (
+        CartDetail.query.filter(
+            CartDetail.CartID == _cart_id_of(user_id),
+            CartDetail.ProductID == product_id,
+        )
+        .order_by(CartDetail.CartDetailID)
+        .first()
+    )
+
+
+def refresh_totals(cart_id):
+    """Tính lại ItemCount/Subtotal của giỏ từ cartdetail (một câu UPDATE).
+
+    Chạy trên db.session (tự flush thay đổi đang chờ) nên nằm chung transaction
+    với thao tác sửa giỏ.
+    """
+    def total(expression):
+        return (
+            select(func.coalesce(func.sum(expression), 0))
+            .where(CartDetail.CartID == cart_id)
+            .scalar_subquery()
+        )
+
+    db.session.execute(
+        update(Cart)
+        .where(Cart.CartID == cart_id)
+        .values(
+            ItemCount=total(CartDetail.Quantity),
+            Subtotal=total(CartDetail.Price * CartDetail.Quantity),
+        ),
+        execution_options={'synchronize_session': False},
+    )
+
+
+def summary(user_id=None):
+    """{'item_count', 'subtotal'} của giỏ, đọc từ cột đã lưu của cart"""
+    user_id = user_id or session.get('user_id')
+    row = None
+    if user_id:
+        row = (
+            db.session.query(Cart.ItemCount, Cart.Subtotal)
+            .filter(Cart.UserID == user_id)
+            .order_by(Cart.CartID)
+            .first()
+        )
+    if row is None:
+        return {'item_count': 0, 'subtotal': 0}
+    return {'item_count': row.ItemCount, 'subtotal': row.Subtotal}
+
+
+def init_app(app):
+    # Header: {% set mini_cart = cart_summary() %}
+    app.jinja_env.globals['cart_summary'] = summary
@@ -0,0 +1,212 @@
+"""
+Server-side catalog listing
+
+Lọc (danh mục, hãng, khoảng giá, tình trạng kho), sắp xếp và phân trang
+keyset cho /pc-products và /linhkien-products. Toàn bộ điều kiện được đẩy
+xuống SQL; mỗi trang chỉ đọc PRODUCTS_PER_PAGE + 1 dòng.
+"""
+import base64
+import json
+
+from flask import current_app
+from sqlalchemy import case, func, tuple_
+from sqlalchemy.orm import joinedload
+
+from config.database import db
+from models.tables import Product
+from utils import reference_data
+
+SCOPE_PC = 'pc'
+SCOPE_LINHKIEN = 'linhkien'
+SCOPES = (SCOPE_PC, SCOPE_LINHKIEN)
+
+# sort key -> (cột, giảm dần?)
+SORTS = {
+    'name-asc': (Product.Name, False),
+    'name-desc': (Product.Name, True),
+    'price-asc': (Product.Price, False),
+    'price-desc': (Product.Price, True),
+    'stock-desc': (Product.Stock, True),
+}
+DEFAULT_SORT = 'name-asc'
+
+LOW_STOCK_LIMIT = 5
+STOCK_FILTERS = {
+    'available': lambda: Product.Stock > LOW_STOCK_LIMIT,
+    'low': lambda: db.and_(Product.Stock > 0, Product.Stock <= LOW_STOCK_LIMIT),
+    'out': lambda: Product.Stock == 0,
+}
+
+
+def _int_list(values):
+    result = []
+    for value in values:
+        try:
+            result.append(int(value))
+        except (TypeError, ValueError):
+            continue
+    return result
+
+
+def _float_or_none(value):
+    try:
+        return float(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def encode_cursor(sort_value, product_id):
+    raw = json.dumps([sort_value, product_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        sort_value, product_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return sort_value, int(product_id)
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+class ListingParams:
+    """Tham số lọc/sắp xếp/phân trang đọc từ query string"""
+
+    def __init__(self, args):
+        self.categories = _int_list(args.getlist('category'))
+        self.brands = _int_list(args.getlist('brand'))
+        self.stock = [s for s in args.getlist('stock') if s in STOCK_FILTERS]
+        self.min_price = _float_or_none(args.get('min_price'))
+        self.max_price = _float_or_none(args.get('max_price'))
+        self.sort = args.get('sort') if args.get('sort') in SORTS else DEFAULT_SORT
+        self.cursor = decode_cursor(args.get('cursor')) if args.get('cursor') else None
+        per_page = current_app.config.get('PRODUCTS_PER_PAGE', 12)
+        try:
+            self.per_page = max(1, min(int(args.get('per_page', per_page)), 100))
+        except (TypeError, ValueError):
+            self.per_page = per_page
+
+
+def pc_child_category_ids(pc_parent):
+    """ID các danh mục con của danh mục "PC" """
+    return [c.CategoryID for c in reference_data.child_categories(pc_parent)]
+
+
+def scope_query(scope, excluded_category_ids=None):
+    """Query gốc cho từng trang danh sách (chưa áp dụng bộ lọc người dùng)"""
+    if scope == SCOPE_PC:
+        return Product.query.filter(Product.IsPC == 1)
+
+    # Linh kiện: bỏ sản phẩm tên "pc", PC nguyên bộ và thuộc danh mục con của PC
+    query = Product.query.filter(Product.Name != "pc", Product.IsPC == 0)
+    if excluded_category_ids:
+        query = query.filter(~Product.CategoryID.in_(excluded_category_ids))
+    return query
+
+
+def apply_filters(query, params):
+    if params.categories:
+        query = query.filter(Product.CategoryID.in_(params.categories))
+    if params.brands:
+        query = query.filter(Product.BrandID.in_(params.brands))
+    if params.min_price is not None:
+        query = query.filter(Product.Price >= params.min_price)
+    if params.max_price is not None:
+        query = query.filter(Product.Price <= params.max_price)
+    if params.stock:
+        query = query.filter(db.or_(*(STOCK_FILTERS[s]() for s in params.stock)))
+    return query
+
+
+def fetch_page(query, params):
+    """Lấy một trang theo keyset (cột sắp xếp, ProductID).
+
+    Trả về (products, next_cursor); next_cursor là None ở trang cuối.
+    """
+    column, descending = SORTS[params.sort]
+    key = tuple_(column, Product.ProductID)
+
+    if params.cursor:
+        sort_value, last_id = params.cursor
+        query = query.filter(key < (sort_value, last_id) if descending else key > (sort_value, last_id))
+
+    if descending:
+        query = query.order_by(column.desc(), Product.ProductID.desc())
+    else:
+        query = query.order_by(column.asc(), Product.ProductID.asc())
+
+    rows = (
+        query.options(joinedload(Product.category), joinedload(Product.brand))
+        .limit(params.per_page + 1)
+        .all()
+    )
+    products = rows[:params.per_page]
+    next_cursor = None
+    if len(rows) > params.per_page:
+        last = products[-1]
+        next_cursor = encode_cursor(getattr(last, column.key), last.ProductID)
+    return products, next_cursor
+
+
+def count_matching(query):
+    return query.order_by(None).with_entities(func.count(Product.ProductID)).scalar() or 0
+
+
+def facet_counts(query):
+    """Số sản phẩm theo danh mục, hãng và tình trạng kho (3 truy vấn GROUP BY)"""
+    base = query.order_by(None)
+    by_category = dict(
+        base.with_entities(Product.CategoryID, func.count(Product.ProductID))
+        .group_by(Product.CategoryID)
+        .all()
+    )
+    by_brand = dict(
+        base.with_entities(Product.BrandID, func.count(Product.ProductID))
+        .group_by(Product.BrandID)
+        .all()
+    )
+    stock_bucket = case(
+        (Product.Stock > LOW_STOCK_LIMIT, 'available'),
+        (Product.Stock > 0, 'low'),
+        else_='out',
+    )
+    by_stock = dict(
+        base.with_entities(stock_bucket, func.count(Product.ProductID))
+        .group_by(stock_bucket)
+        .all()
+    )
+    return {'category': by_category, 'brand': by_brand, 'stock': by_stock}
+
+
+def filter_categories(scope, excluded_category_ids):
+    """Danh mục hiển thị ở cột lọc"""
+    excluded = set(excluded_category_ids or ())
+    categories = reference_data.all_categories()
+    if scope == SCOPE_PC:
+        return [c for c in categories if c.CategoryID in excluded]
+    return [
+        c for c in categories
+        if c.Name != reference_data.PC_CATEGORY_NAME and c.CategoryID not in excluded
+    ]
+
+
+def load_page(scope, args):
+    """Dựng một trang kết quả cho scope từ query string.
+
+    Trả về dict gồm products, next_cursor, total, params và các ID danh mục
+    con của PC (để trang HTML dùng lại khi dựng cột lọc).
+    """
+    pc_parent = reference_data.pc_parent_category()
+    child_category_ids = pc_child_category_ids(pc_parent)
+    base = scope_query(scope, child_category_ids)
+    params = ListingParams(args)
+    filtered = apply_filters(base, params)
+    products, next_cursor = fetch_page(filtered, params)
+    return {
+        'pc_parent': pc_parent,
+        'child_category_ids': child_category_ids,
+        'base_query': base,
+        'params': params,
+        'products': products,
+        'next_cursor': next_cursor,
+        'total': count_matching(filtered),
+    }
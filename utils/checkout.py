@@ -0,0 +1,98 @@
+"""
+Set-based checkout
+
+Tạo đơn từ giỏ hàng với số câu lệnh cố định, không phụ thuộc số dòng giỏ:
+khóa các dòng giỏ, đọc tổng theo sản phẩm, trừ kho (một UPDATE), thêm Order,
+INSERT ... SELECT từ cartdetail sang orderdetail và sang product_sales rồi xóa
+giỏ bằng hai câu DELETE. Các câu lệnh có hình dạng cố định nên SQLAlchemy
+dùng lại được bản compile đã cache. Tất cả chạy trong transaction của db.session;
+nơi gọi commit hoặc rollback.
+"""
+from sqlalchemy import delete, func, insert, literal, select, update
+
+from config.database import db
+from models.tables import Cart, CartDetail, Order, OrderDetail
+from utils import order_stats, stock
+from utils.sales_counter import record_sales_from_select
+
+DEFAULT_STATUS = "Chờ xử lý"
+
+
+class EmptyCart(Exception):
+    """Người dùng không có giỏ hàng hoặc giỏ không có sản phẩm"""
+
+
+def place_order(user_id, status=DEFAULT_STATUS):
+    """Tạo đơn từ giỏ hàng của user, trả về Order (đã flush, chưa commit).
+
+    Raise EmptyCart nếu giỏ trống, stock.InsufficientStock nếu thiếu hàng.
+    """
+    cart_id = db.session.query(Cart.CartID).filter(Cart.UserID == user_id).limit(1).scalar()
+    if cart_id is None:
+        raise EmptyCart()
+
+    # Ghi vào các dòng giỏ trước tiên để giữ khóa ghi: thread dọn giỏ hết hạn
+    # (lọc theo ReservedUntil) không thể trả hàng của giỏ đang được đặt
+    locked = db.session.execute(
+        update(CartDetail).where(CartDetail.CartID == cart_id).values(ReservedUntil=None),
+        execution_options={'synchronize_session': False},
+    ).rowcount
+    if not locked:
+        raise EmptyCart()
+
+    totals = (
+        db.session.query(
+            CartDetail.ProductID,
+            func.sum(CartDetail.Quantity).label('quantity'),
+            func.sum(CartDetail.ReservedQuantity).label('reserved'),
+            func.sum(CartDetail.Price * CartDetail.Quantity).label('amount'),
+        )
+        .filter(CartDetail.CartID == cart_id)
+        .group_by(CartDetail.ProductID)
+        .all()
+    )
+
+    # Dùng phần đã giữ chỗ, trừ thêm phần còn thiếu
+    stock.reserve_cart(cart_id, [row.ProductID for row in totals])
+
+    order = Order(
+        UserID=user_id,
+        TotalPrice=sum(row.amount for row in totals),
+        Status=status,
+    )
+    db.session.add(order)
+    db.session.flush()  # Để lấy OrderID
+    order_stats.record_order(order)
+
+    db.session.execute(
+        insert(OrderDetail).from_select(
+            ['OrderID', 'ProductID', 'Quantity', 'Price', 'ConfigData', 'ConfigHash'],
+            select(
+                literal(order.OrderID),
+                CartDetail.ProductID,
+                CartDetail.Quantity,
+                CartDetail.Price,
+                CartDetail.ConfigData,
+                CartDetail.ConfigHash,
+            )
+            .where(CartDetail.CartID == cart_id)
+            .order_by(CartDetail.CartDetailID),
+        )
+    )
+
+    # Cập nhật bộ đếm số lượng đã bán trong cùng transaction
+    record_sales_from_select(
+        select(CartDetail.ProductID, func.sum(CartDetail.Quantity))
+        .where(CartDetail.CartID == cart_id)
+        .group_by(CartDetail.ProductID)
+    )
+
+    db.session.execute(
+        delete(CartDetail).where(CartDetail.CartID == cart_id),
+        execution_options={'synchronize_session': False},
+    )
+    db.session.execute(
+        delete(Cart).where(Cart.CartID == cart_id),
+        execution_options={'synchronize_session': False},
+    )
+    return order
@@ -0,0 +1,168 @@
+"""
+Homepage section store
+
+Giữ sẵn snapshot các danh sách sản phẩm của trang chủ (linh kiện mới, PC mới,
+linh kiện bán chạy, PC bán chạy). Snapshot được làm mới định kỳ bởi một thread
+nền và ngay sau khi có commit thay đổi sản phẩm/đơn hàng, nên request vào trang
+chủ chỉ đọc dữ liệu đã dựng sẵn, không chạy truy vấn tổng hợp nào.
+"""
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from config.database import db
+from models.tables import (
+    Category,
+    Order,
+    OrderDetail,
+    Product,
+    ProductSales,
+    ProductTag,
+    Tag,
+)
+from utils.sales_counter import top_selling_ids
+
+SECTION_LIMIT = 10
+
+# Các model mà khi thay đổi sẽ làm snapshot trang chủ bị cũ
+WATCHED_MODELS = (Product, Category, Tag, ProductTag, Order, OrderDetail, ProductSales)
+
+
+def _product_to_dict(product):
+    """Chuyển Product thành dict thuần để dùng chung giữa các thread/request.
+
+    Giữ nguyên tên thuộc tính như model để template (product.Name,
+    product.category.Name, product_tag.tag.Name, ...) không phải thay đổi.
+    """
+    return {
+        'ProductID': product.ProductID,
+        'Name': product.Name,
+        'Price': product.Price,
+        'ImageURL': product.ImageURL,
+        'Stock': product.Stock,
+        'IsPC': product.IsPC,
+        'category': {'Name': product.category.Name} if product.category else None,
+        'tags': [
+            {'tag': {'Name': pt.tag.Name} if pt.tag else None}
+            for pt in product.tags
+        ],
+    }
+
+
+def _with_relations(query):
+    return query.options(
+        joinedload(Product.category),
+        selectinload(Product.tags).joinedload(ProductTag.tag),
+    )
+
+
+def _newest(is_pc):
+    products = (
+        _with_relations(Product.query.filter(Product.IsPC == is_pc))
+        .order_by(Product.CreatedAt.desc())
+        .limit(SECTION_LIMIT)
+        .all()
+    )
+    return [_product_to_dict(p) for p in products]
+
+
+def _top_selling(is_pc):
+    ranked_ids = top_selling_ids(is_pc, limit=SECTION_LIMIT)
+    if not ranked_ids:
+        return []
+
+    products = _with_relations(
+        Product.query.filter(Product.ProductID.in_(ranked_ids))
+    ).all()
+    by_id = {p.ProductID: p for p in products}
+    return [_product_to_dict(by_id[pid]) for pid in ranked_ids if pid in by_id]
+
+
+def build_sections():
+    """Chạy các truy vấn và dựng snapshot mới cho trang chủ"""
+    return {
+        'products_early': _newest(False),
+        'pc_products': _newest(True),
+        'top_selling_components': _top_selling(False),
+        'top_selling_pcs': _top_selling(True),
+    }
+
+
+class HomepageSections:
+    """Kho snapshot trang chủ với thread làm mới nền"""
+
+    def __init__(self):
+        self.app = None
+        self.interval = 300
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get('HOMEPAGE_REFRESH_INTERVAL', 300)
+        event.listen(Session, 'after_flush', _track_changes)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_rollback', _clear_changes)
+
+    def get(self):
+        """Trả về snapshot hiện tại; chỉ dựng đồng bộ ở lần gọi đầu tiên"""
+        if self._snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = build_sections()
+        self._ensure_worker()
+        return self._snapshot
+
+    def refresh(self):
+        """Dựng lại snapshot ngay lập tức (dùng trong thread nền)"""
+        with self.app.app_context():
+            try:
+                snapshot = build_sections()
+            finally:
+                db.session.remove()
+        with self._lock:
+            self._snapshot = snapshot
+
+    def request_refresh(self):
+        """Báo cho thread nền dựng lại snapshot ở lượt kế tiếp"""
+        self._wakeup.set()
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='homepage-sections', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.refresh()
+            except Exception as e:
+                self.app.logger.error(f"Lỗi khi làm mới trang chủ: {e}")
+
+    def _after_commit(self, session):
+        if session.info.pop('homepage_dirty', False):
+            self.request_refresh()
+
+
+def _track_changes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, WATCHED_MODELS):
+            session.info['homepage_dirty'] = True
+            return
+
+
+def _clear_changes(session):
+    session.info.pop('homepage_dirty', None)
+
+
+homepage_sections = HomepageSections()
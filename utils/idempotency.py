@@ -0,0 +1,196 @@
+"""
+Idempotency key cho các endpoint POST tạo đơn / sửa giỏ hàng
+
+Client gửi header Idempotency-Key (form HTML dùng field idempotency_key) và
+giữ nguyên key khi retry. Request đầu tiên giữ key bằng INSERT ... ON CONFLICT
+DO NOTHING trong một transaction riêng (commit ngay), chạy view rồi lưu
+status, body và Location vào bảng idempotency_key. Request trùng key:
+
+    - đã có response: trả lại response đã lưu, không chạm tới Cart/Order;
+    - request đầu còn đang chạy: chờ tới khi có response (tối đa
+      IDEMPOTENCY_WAIT_TIMEOUT giây, quá hạn trả 409) thay vì chạy song song;
+    - cùng key nhưng khác endpoint/nội dung: trả 422.
+
+Response 5xx hoặc exception không được lưu; key bị xóa để client retry.
+Key hết hạn sau IDEMPOTENCY_TTL, key đang xử lý sau IDEMPOTENCY_LOCK_TIMEOUT
+(request đầu bị chết giữa chừng). CLI: flask idempotency purge.
+"""
+import functools
+import hashlib
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app, jsonify, make_response, request, session
+from flask.cli import AppGroup
+from sqlalchemy import delete, select, update
+
+from config.database import db
+from models.tables import IdempotencyKey
+from utils.sql import dialect_insert
+
+HEADER = 'Idempotency-Key'
+FORM_FIELD = 'idempotency_key'
+MAX_KEY_LENGTH = 255
+
+idempotency_cli = AppGroup('idempotency', help='Quản lý idempotency key')
+
+
+def _request_hash():
+    # Đọc body trước khi parse form để request.form vẫn dùng được
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(request.full_path.encode())
+    digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def _row_filter(user_id, key):
+    return (IdempotencyKey.UserID == user_id, IdempotencyKey.Key == key)
+
+
+def _load(user_id, key):
+    with db.engine.connect() as conn:
+        return conn.execute(select(IdempotencyKey.__table__).where(*_row_filter(user_id, key))).first()
+
+
+def _claim(user_id, key, endpoint, request_hash):
+    """Giữ key cho request hiện tại. Trả về None nếu giữ được, ngược lại
+    trả về dòng đã có của key"""
+    now = datetime.utcnow()
+    lock_timeout = current_app.config.get('IDEMPOTENCY_LOCK_TIMEOUT', 60)
+    with db.engine.begin() as conn:
+        conn.execute(delete(IdempotencyKey).where(*_row_filter(user_id, key), IdempotencyKey.ExpiresAt < now))
+        insert = dialect_insert(conn)
+        claimed = conn.execute(
+            insert(IdempotencyKey)
+            .values(
+                UserID=user_id,
+                Key=key,
+                Endpoint=endpoint,
+                RequestHash=request_hash,
+                CreatedAt=now,
+                ExpiresAt=now + timedelta(seconds=lock_timeout),
+            )
+            .on_conflict_do_nothing(index_elements=['UserID', 'Key'])
+        ).rowcount
+        if claimed:
+            return None
+        return conn.execute(select(IdempotencyKey.__table__).where(*_row_filter(user_id, key))).first()
+
+
+def _store(user_id, key, response):
+    ttl = current_app.config.get('IDEMPOTENCY_TTL', timedelta(hours=24))
+    with db.engine.begin() as conn:
+        conn.execute(
+            update(IdempotencyKey)
+            .where(*_row_filter(user_id, key))
+            .values(
+                StatusCode=response.status_code,
+                ResponseBody=response.get_data(),
+                ContentType=response.content_type,
+                Location=response.headers.get('Location'),
+                ExpiresAt=datetime.utcnow() + ttl,
+            )
+        )
+
+
+def _forget(user_id, key):
+    with db.engine.begin() as conn:
+        conn.execute(delete(IdempotencyKey).where(*_row_filter(user_id, key)))
+
+
+def _matches(row, request_hash):
+    return row.Endpoint == request.endpoint and row.RequestHash == request_hash
+
+
+def _replay(row):
+    response = current_app.response_class(row.ResponseBody, status=row.StatusCode, content_type=row.ContentType)
+    if row.Location:
+        response.headers['Location'] = row.Location
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _error(status, message):
+    return jsonify({"success": False, "message": message}), status
+
+
+def _execute(view, args, kwargs, user_id, key):
+    try:
+        response = make_response(view(*args, **kwargs))
+    except Exception:
+        _forget(user_id, key)
+        raise
+    if response.status_code >= 500 or response.is_streamed:
+        _forget(user_id, key)
+    else:
+        _store(user_id, key, response)
+    return response
+
+
+def idempotent(view):
+    """Decorator cho view POST: request cùng user và cùng Idempotency-Key chỉ
+    được xử lý một lần. Request không có key (hoặc chưa đăng nhập) chạy như cũ."""
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'POST':
+            return view(*args, **kwargs)
+        request_hash = _request_hash()
+        key = request.headers.get(HEADER) or request.form.get(FORM_FIELD)
+        user_id = session.get('user_id')
+        if not key or not user_id:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return _error(400, "Idempotency-Key quá dài")
+
+        row = _claim(user_id, key, request.endpoint, request_hash)
+        if row is not None and not _matches(row, request_hash):
+            return _error(422, "Idempotency-Key đã được dùng cho một request khác")
+        deadline = time.monotonic() + current_app.config.get('IDEMPOTENCY_WAIT_TIMEOUT', 10)
+        delay = 0.02
+        while row is not None and row.StatusCode is None and time.monotonic() < deadline:
+            # Request đầu tiên đang chạy: chờ kết quả của nó
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+            row = _load(user_id, key)
+            if row is None:
+                # Request đầu lỗi và đã nhả key
+                row = _claim(user_id, key, request.endpoint, request_hash)
+
+        if row is None:
+            return _execute(view, args, kwargs, user_id, key)
+        if not _matches(row, request_hash):
+            return _error(422, "Idempotency-Key đã được dùng cho một request khác")
+        if row.StatusCode is None:
+            return _error(409, "Request với Idempotency-Key này vẫn đang được xử lý")
+        return _replay(row)
+
+    return wrapper
+
+
+def new_key():
+    return uuid.uuid4().hex
+
+
+def purge_expired(now=None):
+    """Xóa các key đã hết hạn, trả về số dòng đã xóa"""
+    now = now or datetime.utcnow()
+    result = db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.ExpiresAt < now))
+    db.session.commit()
+    return result.rowcount
+
+
+@idempotency_cli.command('purge')
+def purge_command():
+    """Xóa các idempotency key đã hết hạn"""
+    count = purge_expired()
+    click.echo(f"Đã xóa {count} idempotency key hết hạn")
+
+
+def init_app(app):
+    app.cli.add_command(idempotency_cli)
+    # Form HTML: <input type="hidden" name="idempotency_key" value="{{ idempotency_key() }}">
+    app.jinja_env.globals['idempotency_key'] = new_key
@@ -0,0 +1,298 @@
+"""
+Image pipeline cho ảnh sản phẩm
+
+Request upload chỉ ghi file gốc vào image store (utils/image_store, theo
+SHA-256) rồi đẩy việc xử lý sang một thread pool (IMAGE_WORKERS); ảnh đã có
+variants thì không xử lý lại. Worker dùng Pillow tạo các bản thu nhỏ theo
+IMAGE_VARIANTS (thumb, card, detail) ở cả WebP và JPEG cạnh blob (ảnh cũ
+ngoài store: static/images/products/variants/) và ghi đường dẫn, kích thước
+vào bảng image_asset. Template dùng filter image_url(variant) để lấy bản thu nhỏ; khi
+ảnh chưa xử lý xong (hoặc không có Pillow) filter trả về ảnh gốc.
+
+Map Source -> variants được giữ trong bộ nhớ và dựng lại sau commit thay đổi
+image_asset (hoặc sau IMAGE_INDEX_TTL giây, cho các process khác), nên render
+một trang danh sách không tốn thêm truy vấn nào.
+
+Việc đang chờ trong pool mất khi process dừng: `flask images process` xử lý
+lại mọi ảnh sản phẩm chưa có variant.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import click
+from flask import current_app, url_for
+from flask.cli import AppGroup
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config.database import db
+from models.tables import ImageAsset, Product
+from utils import image_store
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow là tùy chọn: không có thì chỉ phục vụ ảnh gốc
+    Image = ImageOps = None
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+VARIANT_DIR = 'images/products/variants'
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 6},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+images_cli = AppGroup('images', help='Xử lý ảnh sản phẩm (tạo bản thu nhỏ)')
+
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def _flatten(image):
+    """RGB trên nền trắng (JPEG không có kênh alpha)"""
+    if not _has_alpha(image):
+        return image.convert('RGB')
+    image = image.convert('RGBA')
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def _save_atomic(image, path, options):
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        image.save(tmp_path, **options)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return os.path.getsize(path)
+
+
+def render_variants(static_folder, source, sizes):
+    """Tạo các bản thu nhỏ của static/<source>.
+
+    sizes: {tên variant: cạnh dài tối đa (px)}; ảnh nhỏ hơn không bị phóng to.
+    Trả về (width, height, {variant: {'width', 'height', 'webp', 'jpeg', 'bytes'}}).
+    """
+    stem = os.path.splitext(os.path.basename(source))[0]
+    # Ảnh trong image store: variants nằm cạnh blob (URL bất biến)
+    variant_dir = os.path.dirname(source) if image_store.is_blob(source) else VARIANT_DIR
+    out_dir = os.path.join(static_folder, variant_dir)
+    os.makedirs(out_dir, exist_ok=True)
+
+    with Image.open(os.path.join(static_folder, source)) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if _has_alpha(image) else 'RGB')
+
+    variants = {}
+    for name, size in sizes.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        entry = {'width': resized.width, 'height': resized.height, 'bytes': {}}
+        for fmt, options in FORMATS.items():
+            filename = f'{stem}-{name}-{size}.{EXTENSIONS[fmt]}'
+            encoded = resized if fmt == 'webp' else _flatten(resized)
+            entry['bytes'][fmt] = _save_atomic(encoded, os.path.join(out_dir, filename), options)
+            entry[fmt] = f'{variant_dir}/{filename}'
+        variants[name] = entry
+    return image.width, image.height, variants
+
+
+class ImagePipeline:
+    """Thread pool xử lý ảnh và map Source -> variants trong bộ nhớ"""
+
+    def __init__(self):
+        self.app = None
+        self.sizes = {}
+        self.index_ttl = 60
+        self._executor = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._index = None
+        self._loaded_at = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.sizes = app.config.get('IMAGE_VARIANTS', {'thumb': 160, 'card': 480, 'detail': 1000})
+        self.index_ttl = app.config.get('IMAGE_INDEX_TTL', 60)
+        app.cli.add_command(images_cli)
+        app.jinja_env.filters['image_url'] = self.url
+        event.listen(Session, 'after_flush', _track_changes)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_rollback', _clear_changes)
+
+    @property
+    def enabled(self):
+        return Image is not None
+
+    # Upload -----------------------------------------------------------------
+
+    def save_upload(self, file):
+        """Lưu file upload vào image store, đưa vào hàng đợi xử lý (nếu ảnh
+        chưa có variants) và trả về đường dẫn tương đối (None nếu file không
+        hợp lệ)"""
+        if not file or not file.filename or not allowed_file(file.filename):
+            return None
+        source = image_store.put(self.app.static_folder, file)
+        asset = db.session.get(ImageAsset, source)
+        if asset is None or asset.Status != 'ready':
+            self.submit(source)
+        return source
+
+    def submit(self, source):
+        """Xử lý ảnh ở thread nền; trả về Future (None nếu không có Pillow).
+
+        Ảnh đang chờ/đang xử lý (cùng blob upload nhiều lần) dùng lại Future cũ.
+        """
+        if not self.enabled:
+            self.app.logger.warning('Pillow chưa được cài, bỏ qua xử lý ảnh %s', source)
+            return None
+        with self._lock:
+            if source in self._pending:
+                return self._pending[source]
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.app.config.get('IMAGE_WORKERS', 2),
+                    thread_name_prefix='image-pipeline',
+                )
+            future = self._pending[source] = self._executor.submit(self._run, source)
+        future.add_done_callback(lambda _: self._done(source))
+        return future
+
+    def _done(self, source):
+        with self._lock:
+            self._pending.pop(source, None)
+
+    def _run(self, source):
+        with self.app.app_context():
+            try:
+                return self.process(source)
+            except Exception as e:
+                self.app.logger.error(f"Lỗi khi xử lý ảnh {source}: {e}")
+                raise
+            finally:
+                db.session.remove()
+
+    def process(self, source):
+        """Tạo variants cho một ảnh và ghi kết quả vào image_asset (commit)"""
+        asset = db.session.get(ImageAsset, source) or ImageAsset(Source=source)
+        try:
+            width, height, variants = render_variants(self.app.static_folder, source, self.sizes)
+        except Exception as e:
+            asset.Status, asset.Error = 'failed', str(e)
+            db.session.add(asset)
+            db.session.commit()
+            raise
+        asset.Status, asset.Error = 'ready', None
+        asset.Width, asset.Height = width, height
+        asset.Variants = json.dumps(variants)
+        db.session.add(asset)
+        db.session.commit()
+        return asset
+
+    # Lookup -----------------------------------------------------------------
+
+    def _load(self):
+        rows = db.session.query(ImageAsset.Source, ImageAsset.Variants).filter(
+            ImageAsset.Status == 'ready'
+        )
+        return {source: json.loads(variants) for source, variants in rows if variants}
+
+    def variants(self, source):
+        """{variant: {...}} của ảnh đã xử lý, None nếu chưa có"""
+        if not source:
+            return None
+        index = self._index
+        if index is None or time.monotonic() - self._loaded_at > self.index_ttl:
+            with self._lock:
+                if self._index is None or time.monotonic() - self._loaded_at > self.index_ttl:
+                    self._index = self._load()
+                    self._loaded_at = time.monotonic()
+                index = self._index
+        return index.get(source)
+
+    def url(self, source, variant='card', fmt='webp'):
+        """URL của bản thu nhỏ (ảnh gốc nếu chưa có); dùng trong template:
+        {{ product.ImageURL|image_url('card') }}"""
+        if not source:
+            return ''
+        entry = (self.variants(source) or {}).get(variant)
+        return url_for('static', filename=entry[fmt] if entry else source)
+
+    def invalidate(self):
+        self._index = None
+
+    def _after_commit(self, session):
+        if session.info.pop('images_dirty', False):
+            self.invalidate()
+
+
+def _track_changes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, ImageAsset):
+            session.info['images_dirty'] = True
+            return
+
+
+def _clear_changes(session):
+    session.info.pop('images_dirty', None)
+
+
+image_pipeline = ImagePipeline()
+
+
+@images_cli.command('gc')
+@click.option('--dry-run', is_flag=True, help='Chỉ liệt kê blob sẽ bị xóa')
+def gc_command(dry_run):
+    """Đếm lại tham chiếu và xóa blob ảnh không còn được dùng"""
+    grace = current_app.config.get('IMAGE_GC_GRACE', timedelta(days=1))
+    fixed, paths = image_store.collect_garbage(current_app.static_folder, grace, dry_run=dry_run)
+    for path in paths:
+        click.echo(('[sẽ xóa] ' if dry_run else '[đã xóa] ') + path)
+    click.echo(f"Sửa RefCount của {fixed} blob, {'sẽ xóa' if dry_run else 'đã xóa'} {len(paths)} blob")
+
+
+@images_cli.command('import-legacy')
+def import_legacy_command():
+    """Chuyển ảnh sản phẩm cũ vào image store (gộp các file trùng nội dung)"""
+    moved = image_store.import_legacy(current_app.static_folder)
+    blobs = set(moved.values())
+    click.echo(f'Đã chuyển {len(moved)} ảnh vào store ({len(blobs)} blob sau khi gộp trùng)')
+    for source in sorted(blobs):
+        if image_pipeline.enabled and image_pipeline.variants(source) is None:
+            image_pipeline.submit(source).result()
+
+
+@images_cli.command('process')
+@click.option('--all', 'process_all', is_flag=True, help='Xử lý lại cả ảnh đã có variant')
+def process_command(process_all):
+    """Tạo bản thu nhỏ cho ảnh sản phẩm chưa được xử lý"""
+    if not image_pipeline.enabled:
+        click.echo('Cần cài Pillow (pip install Pillow)', err=True)
+        raise SystemExit(1)
+    sources = {url for (url,) in db.session.query(Product.ImageURL).filter(Product.ImageURL.isnot(None))}
+    if not process_all:
+        ready = {s for (s,) in db.session.query(ImageAsset.Source).filter(ImageAsset.Status == 'ready')}
+        sources -= ready
+    futures = {source: image_pipeline.submit(source) for source in sorted(sources)}
+    failed = 0
+    for source, future in futures.items():
+        try:
+            future.result()
+        except Exception as e:
+            failed += 1
+            click.echo(f'[lỗi] {source}: {e}')
+    click.echo(f'Đã xử lý {len(futures) - failed}/{len(futures)} ảnh')
@@ -0,0 +1,256 @@
+"""
+Content-addressed image store
+
+Ảnh upload được lưu theo SHA-256 của nội dung:
+static/images/blobs/<2 ký tự đầu>/<sha256>.<ext>. Upload lại cùng một ảnh (ví
+dụ dùng chung ảnh cho nhiều cấu hình PC) trỏ về cùng một file, và vì nội
+dung của một URL không bao giờ đổi nên /static/images/blobs/ được trả về với
+Cache-Control: immutable, max-age 1 năm. Bản thu nhỏ của image pipeline nằm
+cạnh file gốc (<sha256>-<variant>-<px>.<ext>) nên cũng bất biến.
+
+Bảng image_blob đếm số tham chiếu tới mỗi blob từ các cột trong REFERENCES
+(Product.ImageURL; bảng brand hiện chưa có cột ảnh). RefCount được cập nhật
+trong cùng transaction khi các cột đó đổi qua ORM. delete_product() không xóa
+file nữa; `flask images gc` đếm lại tham chiếu từ dữ liệu thật (sửa lệch do
+UPDATE/DELETE bằng SQL trực tiếp) rồi mới xóa blob không còn tham chiếu quá
+IMAGE_GC_GRACE, nên blob vừa upload (sản phẩm chưa commit) hay vừa bỏ
+tham chiếu không bị xóa ngay.
+"""
+import glob
+import hashlib
+import os
+import uuid
+from datetime import datetime
+
+from flask import request
+from sqlalchemy import case, delete, event, func, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+from config.database import db
+from models.tables import ImageAsset, ImageBlob, Product
+from utils.sql import dialect_insert
+
+BLOB_DIR = 'images/blobs'
+CHUNK_SIZE = 1024 * 1024
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Các cột chứa đường dẫn ảnh (tương đối trong static/) được đếm tham chiếu
+REFERENCES = (
+    (Product, 'ImageURL'),
+)
+
+
+def _normalize_ext(filename):
+    ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else 'bin'
+    return 'jpg' if ext == 'jpeg' else ext
+
+
+def blob_path(digest, ext):
+    return f'{BLOB_DIR}/{digest[:2]}/{digest}.{ext}'
+
+
+def is_blob(path):
+    return bool(path) and path.startswith(BLOB_DIR + '/')
+
+
+def put(static_folder, file):
+    """Lưu file upload (FileStorage) vào store, xem put_stream"""
+    return put_stream(static_folder, file.stream, file.filename)
+
+
+def put_stream(static_folder, stream, filename):
+    """Lưu nội dung stream vào store, trả về đường dẫn tương đối của blob.
+
+    Nội dung đã có trong store thì dùng lại blob cũ (không ghi thêm byte nào).
+    Dòng image_blob được ghi trong transaction riêng (commit ngay) với
+    RefCount hiện có, nên `flask images gc` thấy blob mới và bỏ qua nhờ
+    IMAGE_GC_GRACE cho tới khi sản phẩm tham chiếu tới nó được commit.
+    """
+    root = os.path.join(static_folder, BLOB_DIR)
+    os.makedirs(root, exist_ok=True)
+    tmp_path = os.path.join(root, f'.upload-{uuid.uuid4().hex}')
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, 'wb') as out:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        digest = digest.hexdigest()
+
+        now = datetime.utcnow()
+        with db.engine.begin() as conn:
+            # ON CONFLICT: hai upload cùng nội dung chạy song song không lỗi khóa chính
+            inserted = conn.execute(
+                dialect_insert(conn)(ImageBlob)
+                .values(
+                    Hash=digest,
+                    Path=blob_path(digest, _normalize_ext(filename)),
+                    Bytes=size,
+                    RefCount=0,
+                    CreatedAt=now,
+                    UnreferencedAt=now,
+                )
+                .on_conflict_do_nothing(index_elements=['Hash'])
+            ).rowcount
+            if not inserted:
+                # Làm mới mốc thời gian để gc không xóa blob vừa được upload lại
+                conn.execute(
+                    update(ImageBlob)
+                    .where(ImageBlob.Hash == digest, ImageBlob.RefCount <= 0)
+                    .values(UnreferencedAt=now)
+                )
+            path = conn.execute(select(ImageBlob.Path).where(ImageBlob.Hash == digest)).scalar_one()
+
+        final_path = os.path.join(static_folder, path)
+        if not os.path.exists(final_path):
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+        return path
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _adjust(connection, deltas):
+    now = datetime.utcnow()
+    for path, delta in deltas.items():
+        if not delta or not is_blob(path):
+            continue
+        new_count = ImageBlob.RefCount + delta
+        connection.execute(
+            update(ImageBlob)
+            .where(ImageBlob.Path == path)
+            .values(
+                RefCount=new_count,
+                UnreferencedAt=case((new_count <= 0, now), else_=None),
+            )
+        )
+
+
+def _track_references(session, flush_context):
+    """after_flush: cộng/trừ RefCount theo thay đổi của các cột REFERENCES"""
+    deltas = {}
+    for model, column in REFERENCES:
+        for obj in session.new:
+            if isinstance(obj, model) and getattr(obj, column):
+                deltas[getattr(obj, column)] = deltas.get(getattr(obj, column), 0) + 1
+        for obj in session.deleted:
+            if isinstance(obj, model):
+                history = get_history(obj, column)
+                for path in (*history.unchanged, *history.deleted):
+                    if path:
+                        deltas[path] = deltas.get(path, 0) - 1
+        for obj in session.dirty:
+            if isinstance(obj, model):
+                history = get_history(obj, column)
+                for path in history.added:
+                    if path:
+                        deltas[path] = deltas.get(path, 0) + 1
+                for path in history.deleted:
+                    if path:
+                        deltas[path] = deltas.get(path, 0) - 1
+    if any(deltas.values()):
+        _adjust(session.connection(), deltas)
+
+
+def recount():
+    """Đếm lại RefCount của mọi blob từ các cột REFERENCES (không commit)"""
+    actual = {}
+    for model, column in REFERENCES:
+        attr = getattr(model, column)
+        rows = db.session.query(attr, func.count()).filter(attr.like(BLOB_DIR + '/%')).group_by(attr)
+        for path, count in rows:
+            actual[path] = actual.get(path, 0) + count
+
+    now = datetime.utcnow()
+    changed = 0
+    for blob in ImageBlob.query:
+        count = actual.get(blob.Path, 0)
+        if blob.RefCount != count:
+            changed += 1
+            blob.RefCount = count
+        if count > 0:
+            blob.UnreferencedAt = None
+        elif blob.UnreferencedAt is None:
+            blob.UnreferencedAt = now
+    db.session.flush()
+    return changed
+
+
+def collect_garbage(static_folder, grace, dry_run=False, now=None):
+    """Xóa blob (và variants) không còn tham chiếu quá `grace`.
+
+    Trả về (số RefCount đã sửa, danh sách đường dẫn blob đã xóa).
+    """
+    now = now or datetime.utcnow()
+    fixed = recount()
+    cutoff = now - grace
+    candidates = [
+        path
+        for (path,) in db.session.query(ImageBlob.Path).filter(
+            ImageBlob.RefCount <= 0, ImageBlob.UnreferencedAt < cutoff
+        )
+    ]
+    if dry_run:
+        db.session.rollback()
+        return fixed, candidates
+
+    removed = []
+    for path in candidates:
+        # Xóa có điều kiện: blob có thể vừa được tham chiếu/upload lại
+        result = db.session.execute(
+            delete(ImageBlob).where(
+                ImageBlob.Path == path, ImageBlob.RefCount <= 0, ImageBlob.UnreferencedAt < cutoff
+            )
+        )
+        if result.rowcount:
+            db.session.execute(delete(ImageAsset).where(ImageAsset.Source == path))
+            removed.append(path)
+    db.session.commit()
+
+    for path in removed:
+        stem = os.path.splitext(os.path.join(static_folder, path))[0]
+        for file_path in [os.path.join(static_folder, path), *glob.glob(glob.escape(stem) + '-*')]:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+    return fixed, removed
+
+
+def import_legacy(static_folder):
+    """Chuyển ảnh cũ (tên uuid/timestamp) của các cột REFERENCES vào store.
+
+    File cũ được giữ nguyên; trả về {đường dẫn cũ: đường dẫn blob}.
+    """
+    moved = {}
+    for model, column in REFERENCES:
+        attr = getattr(model, column)
+        for (path,) in db.session.query(attr).filter(attr.isnot(None)).distinct():
+            if is_blob(path) or path in moved:
+                continue
+            file_path = os.path.join(static_folder, path)
+            if not os.path.isfile(file_path):
+                continue
+            with open(file_path, 'rb') as stream:
+                moved[path] = put_stream(static_folder, stream, path)
+        for old, new in moved.items():
+            db.session.execute(update(model).where(attr == old).values({column: new}))
+    recount()
+    db.session.commit()
+    return moved
+
+
+def _immutable_headers(response):
+    if request.endpoint == 'static' and (request.view_args or {}).get('filename', '').startswith(BLOB_DIR + '/'):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    event.listen(Session, 'after_flush', _track_references)
+    app.after_request(_immutable_headers)
@@ -0,0 +1,151 @@
+"""
+Streaming export đơn hàng / dòng đơn hàng (CSV hoặc JSONL)
+
+Các dòng được đọc bằng câu SELECT Core với yield_per + stream_results (không
+tạo ORM instance, không giữ identity map) và được ghi ra từng lô, nên bộ nhớ
+dùng không phụ thuộc số đơn hàng. Thứ tự (CreatedAt, OrderID) đi theo index
+ix_order_created nên không cần sắp xếp toàn bộ kết quả trước khi trả về.
+
+`flask bench export` kiểm tra bộ nhớ đỉnh khi export không tăng theo số dòng.
+"""
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from config.database import db
+from models.tables import Order, OrderDetail, Product, User
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+BATCH_SIZE = 1000
+
+
+class InvalidExport(ValueError):
+    """Tham số export không hợp lệ"""
+
+
+def parse_date(value, end=False):
+    """'YYYY-MM-DD' -> datetime; end=True trả về đầu ngày hôm sau (khoảng mở)"""
+    if not value:
+        return None
+    try:
+        day = datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise InvalidExport(f"Ngày không hợp lệ: {value}")
+    return day + timedelta(days=1) if end else day
+
+
+def _statement(kind, start=None, end=None, status=None):
+    if kind == 'orders':
+        stmt = select(
+            Order.OrderID,
+            Order.CreatedAt,
+            Order.Status,
+            Order.UserID,
+            User.Name.label('UserName'),
+            User.Email,
+            Order.TotalPrice,
+        ).join(User, User.UserID == Order.UserID)
+        order_by = (Order.CreatedAt, Order.OrderID)
+    elif kind == 'lines':
+        stmt = (
+            select(
+                Order.OrderID,
+                OrderDetail.OrderDetailID,
+                Order.CreatedAt,
+                Order.Status,
+                Order.UserID,
+                OrderDetail.ProductID,
+                Product.Name.label('ProductName'),
+                OrderDetail.Quantity,
+                OrderDetail.Price,
+                (OrderDetail.Price * OrderDetail.Quantity).label('LineTotal'),
+                OrderDetail.ConfigHash,
+            )
+            .join(OrderDetail, OrderDetail.OrderID == Order.OrderID)
+            .join(Product, Product.ProductID == OrderDetail.ProductID)
+        )
+        order_by = (Order.CreatedAt, Order.OrderID, OrderDetail.OrderDetailID)
+    else:
+        raise InvalidExport(f"Loại export không hợp lệ: {kind}")
+
+    if start:
+        stmt = stmt.where(Order.CreatedAt >= start)
+    if end:
+        stmt = stmt.where(Order.CreatedAt < end)
+    if status:
+        stmt = stmt.where(Order.Status == status)
+    return stmt.order_by(*order_by)
+
+
+def iter_batches(kind, start=None, end=None, status=None):
+    """Các lô (list Row, tối đa BATCH_SIZE dòng) của export"""
+    result = db.session.execute(
+        _statement(kind, start, end, status),
+        execution_options={'yield_per': BATCH_SIZE, 'stream_results': True},
+    )
+    try:
+        yield from result.partitions()
+    finally:
+        result.close()
+
+
+def _csv_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    # Chặn công thức khi mở file bằng Excel
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        return "'" + value
+    return value
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def stream(kind, fmt, start=None, end=None, status=None):
+    """Generator các chunk str của file export (mỗi chunk một lô BATCH_SIZE dòng).
+
+    Tham số được kiểm tra ngay (raise InvalidExport) trước khi bắt đầu stream.
+    """
+    if fmt not in FORMATS:
+        raise InvalidExport(f"Định dạng không hợp lệ: {fmt}")
+    columns = list(_statement(kind).selected_columns.keys())
+    return _generate(kind, fmt, columns, start, end, status)
+
+
+def _generate(kind, fmt, columns, start, end, status):
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+    for batch in iter_batches(kind, start, end, status):
+        if fmt == 'csv':
+            writer.writerows([_csv_cell(value) for value in row] for row in batch)
+        else:
+            buffer.writelines(
+                json.dumps(dict(zip(columns, map(_json_value, row))), ensure_ascii=False) + '\n'
+                for row in batch
+            )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def filename(kind, fmt, start=None, end=None):
+    parts = [kind]
+    if start:
+        parts.append(start.strftime('%Y%m%d'))
+    if end:
+        parts.append((end - timedelta(days=1)).strftime('%Y%m%d'))
+    return '-'.join(parts) + f'.{fmt}'
@@ -0,0 +1,193 @@
+"""
+Admin order listing
+
+Lọc (trạng thái, khoảng ngày, khách hàng) và phân trang keyset theo
+(CreatedAt, OrderID) giảm dần cho /admin/orders. Mỗi trang đọc
+ORDERS_PER_PAGE + 1 dòng theo index (ix_order_created,
+ix_order_status_created) nên thời gian tải không phụ thuộc số đơn hàng.
+
+Số đơn theo trạng thái khi chỉ lọc theo ngày (hoặc không lọc) đọc từ
+order_daily_stats (utils.order_stats), được cập nhật cùng transaction với đơn
+hàng nên luôn mới và không phụ thuộc số đơn. Bảng này tính cả đơn của tài khoản
+đã xóa nên số đơn đó (GROUP BY chỉ trên đơn của tài khoản đã xóa, theo
+ix_order_user_created) được trừ đi để khớp với danh sách. Khi lọc theo khách
+hàng mới chạy GROUP BY Status trên bảng order, cache FACET_CACHE_TIMEOUT giây
+theo bộ lọc (không invalidate theo từng lần ghi đơn).
+"""
+import base64
+import json
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import func, or_, select, tuple_
+from sqlalchemy.orm import contains_eager
+
+from config.database import db
+from models.tables import Order, OrderDetail, User
+from utils import order_stats
+from utils.cache import cache
+from utils.order_export import InvalidExport, parse_date
+
+FACET_CACHE_TIMEOUT = 60
+
+
+def encode_cursor(created_at, order_id):
+    raw = json.dumps([created_at.isoformat() if created_at else None, order_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, order_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(created_at), int(order_id)
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+class OrderListParams:
+    """Tham số lọc/phân trang đọc từ query string"""
+
+    def __init__(self, args):
+        self.status = args.get('status') or None
+        self.customer = (args.get('customer') or '').strip()
+        self.date_from = args.get('from') or ''
+        self.date_to = args.get('to') or ''
+        try:
+            self.start = parse_date(self.date_from)
+            self.end = parse_date(self.date_to, end=True)
+        except InvalidExport:
+            self.start = self.end = None
+            self.date_from = self.date_to = ''
+        self.cursor = decode_cursor(args.get('cursor')) if args.get('cursor') else None
+        per_page = current_app.config.get('ORDERS_PER_PAGE', 20)
+        try:
+            self.per_page = max(1, min(int(args.get('per_page', per_page)), 200))
+        except (TypeError, ValueError):
+            self.per_page = per_page
+
+    def filter_args(self, **overrides):
+        """Query string của bộ lọc hiện tại (không có cursor), dùng cho link"""
+        args = {
+            'status': self.status,
+            'customer': self.customer,
+            'from': self.date_from,
+            'to': self.date_to,
+        }
+        args.update(overrides)
+        return {key: value for key, value in args.items() if value}
+
+
+def base_query():
+    # Giống danh sách cũ: bỏ đơn của tài khoản đã xóa
+    return (
+        db.session.query(Order)
+        .join(User, User.UserID == Order.UserID)
+        .filter(User.IsDelete == False)  # noqa: E712
+    )
+
+
+def apply_filters(query, params, with_status=True):
+    if with_status and params.status:
+        query = query.filter(Order.Status == params.status)
+    if params.start:
+        query = query.filter(Order.CreatedAt >= params.start)
+    if params.end:
+        query = query.filter(Order.CreatedAt < params.end)
+    if params.customer:
+        if params.customer.isdigit():
+            query = query.filter(Order.UserID == int(params.customer))
+        else:
+            pattern = f'%{params.customer}%'
+            query = query.filter(
+                Order.UserID.in_(
+                    select(User.UserID).where(or_(User.Name.ilike(pattern), User.Email.ilike(pattern)))
+                )
+            )
+    return query
+
+
+def fetch_query(query, cursor=None, per_page=20):
+    """Query một trang (per_page + 1 dòng) sau cursor (CreatedAt, OrderID)"""
+    if cursor:
+        query = query.filter(tuple_(Order.CreatedAt, Order.OrderID) < cursor)
+    return (
+        query.options(contains_eager(Order.user))
+        .order_by(Order.CreatedAt.desc(), Order.OrderID.desc())
+        .limit(per_page + 1)
+    )
+
+
+def fetch_page(query, params):
+    """Lấy một trang theo keyset (CreatedAt, OrderID) giảm dần.
+
+    Trả về (orders, next_cursor); next_cursor là None ở trang cuối.
+    """
+    rows = fetch_query(query, params.cursor, params.per_page).all()
+    orders = rows[:params.per_page]
+    next_cursor = None
+    if len(rows) > params.per_page:
+        last = orders[-1]
+        next_cursor = encode_cursor(last.CreatedAt, last.OrderID)
+    return orders, next_cursor
+
+
+def line_counts(order_ids):
+    """Số dòng sản phẩm của từng đơn trong trang (một truy vấn GROUP BY)"""
+    if not order_ids:
+        return {}
+    return dict(
+        db.session.query(OrderDetail.OrderID, func.count(OrderDetail.OrderDetailID))
+        .filter(OrderDetail.OrderID.in_(order_ids))
+        .group_by(OrderDetail.OrderID)
+        .all()
+    )
+
+
+def deleted_account_query(params):
+    """GROUP BY Status trên đơn của tài khoản đã xóa (trạng thái như order_daily_stats)"""
+    status = func.coalesce(Order.Status, order_stats.DEFAULT_STATUS)
+    query = (
+        db.session.query(status, func.count(Order.OrderID))
+        .join(User, User.UserID == Order.UserID)
+        .filter(User.IsDelete == True)  # noqa: E712
+    )
+    return apply_filters(query, params, with_status=False).group_by(status)
+
+
+def status_counts(params):
+    """{Status: số đơn} theo các bộ lọc khác (không lọc trạng thái)"""
+    if not params.customer:
+        counts = order_stats.status_counts(
+            params.start.date() if params.start else None,
+            params.end.date() if params.end else None,
+        )
+        for status, count in deleted_account_query(params):
+            counts[status] = counts.get(status, 0) - count
+        return {status: count for status, count in counts.items() if count > 0}
+
+    key = 'orders:facets:' + json.dumps(params.filter_args(status=None), sort_keys=True)
+
+    def load():
+        query = apply_filters(base_query(), params, with_status=False)
+        return dict(
+            query.with_entities(Order.Status, func.count(Order.OrderID))
+            .group_by(Order.Status)
+            .all()
+        )
+
+    return cache.get_or_set(key, load, timeout=FACET_CACHE_TIMEOUT)
+
+
+def load_page(args):
+    params = OrderListParams(args)
+    orders, next_cursor = fetch_page(apply_filters(base_query(), params), params)
+    counts = status_counts(params)
+    total = counts.get(params.status, 0) if params.status else sum(counts.values())
+    return {
+        'params': params,
+        'orders': orders,
+        'next_cursor': next_cursor,
+        'line_counts': line_counts([o.OrderID for o in orders]),
+        'status_counts': counts,
+        'total': total,
+    }
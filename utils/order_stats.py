@@ -0,0 +1,179 @@
+"""
+Order statistics
+
+Bảng order_daily_stats giữ số đơn và tổng tiền theo (trạng thái, ngày tạo đơn)
+và được cập nhật trong cùng transaction với việc tạo đơn (place_order) và đổi
+trạng thái (update_order_status), giống product_sales. Trang
+/admin/orders/statistics chỉ đọc bảng này bằng hai câu GROUP BY: tổng theo
+trạng thái và chuỗi theo tháng (range Day >= ..., không dùng extract() trên
+CreatedAt), nên thời gian tải phụ thuộc số ngày chứ không phụ thuộc số đơn.
+"""
+from datetime import date, datetime
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import delete, func, insert, literal, select
+
+from config.database import db
+from models.tables import Order, OrderDailyStats
+from utils.sql import dialect_insert, upsert_source
+
+DEFAULT_STATUS = 'pending'
+STATUSES = ('pending', 'processing', 'completed', 'cancelled')
+STATUS_LABELS = {
+    'pending': 'Chờ xử lý',
+    'processing': 'Đang xử lý',
+    'completed': 'Hoàn thành',
+    'cancelled': 'Đã hủy',
+}
+REVENUE_STATUS = 'completed'
+
+stats_cli = AppGroup('order-stats', help='Quản lý bảng thống kê đơn hàng theo ngày')
+
+
+def _add_on_conflict(stmt):
+    return stmt.on_conflict_do_update(
+        index_elements=[OrderDailyStats.Status, OrderDailyStats.Day],
+        set_={
+            'OrderCount': OrderDailyStats.OrderCount + stmt.excluded.OrderCount,
+            'Revenue': OrderDailyStats.Revenue + stmt.excluded.Revenue,
+        },
+    )
+
+
+def _row(order, status, sign):
+    created_at = order.CreatedAt or datetime.utcnow()
+    return {
+        'Status': status or DEFAULT_STATUS,
+        'Day': created_at.date(),
+        'OrderCount': sign,
+        'Revenue': sign * (order.TotalPrice or 0),
+    }
+
+
+def _apply(rows):
+    db.session.execute(_add_on_conflict(dialect_insert()(OrderDailyStats).values(rows)))
+
+
+def record_order(order):
+    """Cộng đơn mới vào thống kê (gọi sau flush để có CreatedAt)"""
+    _apply([_row(order, order.Status, 1)])
+
+
+def record_status_change(order, old_status, new_status):
+    """Chuyển đơn từ ô (old_status, ngày) sang ô (new_status, ngày)"""
+    if (old_status or DEFAULT_STATUS) == (new_status or DEFAULT_STATUS):
+        return
+    _apply([_row(order, old_status, -1), _row(order, new_status, 1)])
+
+
+def _grouped_orders():
+    status = func.coalesce(Order.Status, DEFAULT_STATUS)
+    day = func.date(Order.CreatedAt)
+    return (
+        select(status, day, func.count(Order.OrderID), func.coalesce(func.sum(Order.TotalPrice), 0))
+        .where(Order.CreatedAt.isnot(None))
+        .group_by(status, day)
+    )
+
+
+def forget_orders(order_ids):
+    """Trừ các đơn sắp bị xóa khỏi thống kê (gọi trước khi DELETE)"""
+    if not order_ids:
+        return
+    source = _grouped_orders().where(Order.OrderID.in_(order_ids)).subquery()
+    status, day, count, revenue = source.c
+    db.session.execute(
+        _add_on_conflict(
+            dialect_insert()(OrderDailyStats).from_select(
+                ['Status', 'Day', 'OrderCount', 'Revenue'],
+                upsert_source(status, day, literal(0) - count, literal(0) - revenue),
+            )
+        )
+    )
+
+
+def add_months(day, months):
+    """Ngày đầu tháng của tháng cách tháng chứa `day` một số tháng"""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def monthly_series(daily_rows, start, months):
+    """Cộng các cặp (Day, giá trị) vào từng tháng kể từ tháng chứa `start`.
+
+    Trả về list (ngày đầu tháng, tổng) đủ `months` tháng, tháng không có dữ
+    liệu bằng 0.
+    """
+    by_month = {add_months(start, i): 0 for i in range(months)}
+    for day, value in daily_rows:
+        key = date(day.year, day.month, 1)
+        if key in by_month:
+            by_month[key] += value or 0
+    return list(by_month.items())
+
+
+def status_counts(start=None, end=None):
+    """{Status: số đơn} của các ngày trong [start, end) (date, None = không giới hạn)"""
+    query = db.session.query(OrderDailyStats.Status, func.sum(OrderDailyStats.OrderCount))
+    if start:
+        query = query.filter(OrderDailyStats.Day >= start)
+    if end:
+        query = query.filter(OrderDailyStats.Day < end)
+    return {status: count for status, count in query.group_by(OrderDailyStats.Status) if count}
+
+
+def summary(months=6, today=None):
+    """Số liệu cho trang thống kê: số đơn theo trạng thái, doanh thu (đơn
+    hoàn thành) và số đơn của `months` tháng gần nhất"""
+    today = today or datetime.utcnow().date()
+
+    totals = {
+        status: (count or 0, revenue or 0)
+        for status, count, revenue in db.session.query(
+            OrderDailyStats.Status,
+            func.sum(OrderDailyStats.OrderCount),
+            func.sum(OrderDailyStats.Revenue),
+        ).group_by(OrderDailyStats.Status)
+    }
+
+    start = add_months(today, 1 - months)
+    daily = (
+        db.session.query(OrderDailyStats.Day, func.sum(OrderDailyStats.OrderCount))
+        .filter(OrderDailyStats.Day >= start)
+        .group_by(OrderDailyStats.Day)
+    )
+
+    counts = {status: totals.get(status, (0, 0))[0] for status in STATUSES}
+    return {
+        'status_counts': counts,
+        'total_orders': sum(count for count, _ in totals.values()),
+        'total_revenue': totals.get(REVENUE_STATUS, (0, 0))[1],
+        'monthly_orders': [
+            {'month': month.strftime('%m/%Y'), 'count': count}
+            for month, count in monthly_series(daily, start, months)
+        ],
+    }
+
+
+def rebuild():
+    """Tính lại toàn bộ order_daily_stats từ bảng order"""
+    db.session.execute(delete(OrderDailyStats))
+    result = db.session.execute(
+        insert(OrderDailyStats).from_select(
+            ['Status', 'Day', 'OrderCount', 'Revenue'], _grouped_orders()
+        )
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+@stats_cli.command('rebuild')
+def rebuild_command():
+    """Backfill bảng order_daily_stats từ bảng order"""
+    count = rebuild()
+    click.echo(f"Đã tính lại thống kê cho {count} ô (trạng thái, ngày)")
+
+
+def init_app(app):
+    app.cli.add_command(stats_cli)
@@ -0,0 +1,88 @@
+"""
+PC configurator loader
+
+Dựng dữ liệu nhóm lựa chọn linh kiện (groups_with_products) và tag hiện tại
+của một PC cho pc_detail và admin_pc_detail với số truy vấn cố định, không
+phụ thuộc số nhóm hay số linh kiện trong nhóm.
+
+config_hash() cho mỗi cấu hình linh kiện một fingerprint chuẩn hóa, lưu trong
+CartDetail.ConfigHash / OrderDetail.ConfigHash (có index) để tìm dòng giỏ trùng
+cấu hình bằng index thay vì so sánh JSON.
+"""
+import hashlib
+
+from sqlalchemy.orm import joinedload, selectinload
+
+from models.tables import (
+    PcOptionGroup,
+    PcOptionItem,
+    Product,
+    ProductTag,
+    Tag,
+)
+
+
+def load_groups_with_products(default_first=False):
+    """Các nhóm lựa chọn đã có linh kiện, kèm sản phẩm của từng item.
+
+    2 truy vấn: nhóm, và item + sản phẩm + hãng + danh mục (selectinload).
+    """
+    groups = (
+        PcOptionGroup.query.options(
+            selectinload(PcOptionGroup.items)
+            .joinedload(PcOptionItem.product)
+            .options(joinedload(Product.brand), joinedload(Product.category))
+        )
+        .order_by(PcOptionGroup.OptionGroupID)
+        .all()
+    )
+
+    groups_with_products = []
+    for group in groups:
+        # Chỉ hiển thị nhóm có sản phẩm (đã được thêm vào PC)
+        products_in_group = [
+            {
+                "product": item.product,
+                "is_default": item.IsDefault,
+                "item_id": item.OptionItemID,
+            }
+            for item in sorted(group.items, key=lambda i: i.OptionItemID)
+            if item.product
+        ]
+        if not products_in_group:
+            continue
+
+        if default_first:
+            # Sắp xếp để sản phẩm mặc định lên đầu
+            products_in_group.sort(key=lambda x: x["is_default"], reverse=True)
+
+        groups_with_products.append({"group": group, "products": products_in_group})
+    return groups_with_products
+
+
+def load_current_tags(product_id):
+    """Tag đang gắn trên sản phẩm (1 truy vấn JOIN)"""
+    return (
+        Tag.query.join(ProductTag, ProductTag.TagID == Tag.TagID)
+        .filter(ProductTag.ProductID == product_id)
+        .order_by(ProductTag.ProductTagID)
+        .all()
+    )
+
+
+def load_configurator(product_id, default_first=False):
+    return {
+        "groups_with_products": load_groups_with_products(default_first=default_first),
+        "current_tags": load_current_tags(product_id),
+    }
+
+
+def config_hash(selected_components):
+    """sha256 của các ProductID linh kiện đã sắp xếp.
+
+    selected_components: {group_id: {"productId": ..., ...}} như client gửi lên.
+    Không phụ thuộc thứ tự key hay các trường khác (giá, tên nhóm) trong JSON.
+    """
+    product_ids = sorted(int(c["productId"]) for c in (selected_components or {}).values())
+    return hashlib.sha256(",".join(map(str, product_ids)).encode()).hexdigest()
+
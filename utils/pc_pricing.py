@@ -0,0 +1,93 @@
+"""
+PC configurator pricing
+
+Tính giá một cấu hình PC ở server thay vì tin totalPrice client gửi lên:
+linh kiện được đọc bằng một truy vấn IN, mỗi linh kiện phải thuộc đúng nhóm
+lựa chọn được chọn (map nhóm -> linh kiện lấy qua cache, tag 'pc_options').
+Dùng cho add_pc_to_cart và /api/pc/<id>/quote.
+"""
+from collections import namedtuple
+
+from config.database import db
+from models.tables import PcOptionGroup, PcOptionItem, Product
+from utils.cache import cache
+from utils.pc_configurator import config_hash
+from utils.reference_data import get_product
+
+Quote = namedtuple('Quote', 'pc components total config_hash')
+
+
+class InvalidConfiguration(Exception):
+    """Cấu hình không hợp lệ (PC không tồn tại, linh kiện không thuộc nhóm...)"""
+
+
+def _load_option_map():
+    groups = dict(db.session.query(PcOptionGroup.OptionGroupID, PcOptionGroup.Name))
+    items = {}
+    for group_id, product_id in db.session.query(PcOptionItem.OptionGroupID, PcOptionItem.ProductID):
+        items.setdefault(group_id, set()).add(product_id)
+    return {
+        group_id: {'name': groups.get(group_id), 'products': product_ids}
+        for group_id, product_ids in items.items()
+    }
+
+
+def option_map():
+    """{OptionGroupID: {'name', 'products': set(ProductID)}} của các nhóm có linh kiện"""
+    return cache.get_or_set('pc_options:map', _load_option_map, tags=('pc_options',))
+
+
+def _selections(selected_components):
+    try:
+        return {
+            int(group_id): int(component['productId'])
+            for group_id, component in (selected_components or {}).items()
+        }
+    except (TypeError, ValueError, KeyError):
+        raise InvalidConfiguration("Dữ liệu linh kiện không hợp lệ")
+
+
+def quote(pc_id, selected_components):
+    """Giá của PC pc_id với các linh kiện được chọn.
+
+    selected_components: {group_id: {"productId": ...}} như client gửi lên;
+    các trường khác (price, groupName) bị bỏ qua. Raise InvalidConfiguration.
+    """
+    pc = get_product(pc_id)
+    if not pc or pc.IsPC != 1:
+        raise InvalidConfiguration("Sản phẩm PC không tồn tại")
+
+    selections = _selections(selected_components)
+    if not selections:
+        raise InvalidConfiguration("Vui lòng chọn linh kiện")
+
+    groups = option_map()
+    for group_id, product_id in selections.items():
+        if product_id not in groups.get(group_id, {}).get('products', ()):
+            raise InvalidConfiguration(f"Linh kiện {product_id} không thuộc nhóm lựa chọn {group_id}")
+
+    products = {
+        p.ProductID: p
+        for p in Product.query.filter(Product.ProductID.in_(set(selections.values())))
+    }
+    components = []
+    for group_id, product_id in sorted(selections.items()):
+        product = products.get(product_id)
+        if product is None:
+            raise InvalidConfiguration(f"Linh kiện {product_id} không tồn tại")
+        components.append(
+            {
+                'group_id': group_id,
+                'group_name': groups[group_id]['name'],
+                'product_id': product_id,
+                'name': product.Name,
+                'price': product.Price,
+            }
+        )
+
+    return Quote(
+        pc=pc,
+        components=components,
+        total=sum(c['price'] for c in components),
+        config_hash=config_hash(selected_components),
+    )
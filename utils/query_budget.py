@@ -0,0 +1,110 @@
+"""
+Per-request SQL query budget
+
+Đọc các truy vấn mà Flask-SQLAlchemy ghi lại (SQLALCHEMY_RECORD_QUERIES) sau
+mỗi request: đếm số câu lệnh, tổng thời gian DB và số lần lặp của cùng một
+câu lệnh (dấu hiệu N+1). Vượt ngân sách theo blueprint thì ghi log, hoặc báo
+lỗi khi QUERY_BUDGET_ACTION = 'raise' (dùng khi testing). Số liệu gộp theo
+endpoint được giữ trong bộ nhớ để xem ở /admin/query-stats.
+"""
+import threading
+from collections import Counter
+
+from flask import request
+from flask_sqlalchemy.record_queries import get_recorded_queries
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """Request chạy nhiều truy vấn hơn ngân sách cho phép"""
+
+
+class EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.statements = 0
+        self.max_statements = 0
+        self.db_time = 0.0
+        self.max_db_time = 0.0
+        self.max_repeats = 0
+        self.over_budget = 0
+
+    def to_dict(self, endpoint):
+        return {
+            'endpoint': endpoint,
+            'requests': self.requests,
+            'avg_statements': round(self.statements / self.requests, 2) if self.requests else 0,
+            'max_statements': self.max_statements,
+            'avg_db_ms': round(self.db_time * 1000 / self.requests, 2) if self.requests else 0,
+            'max_db_ms': round(self.max_db_time * 1000, 2),
+            'max_repeats': self.max_repeats,
+            'over_budget': self.over_budget,
+        }
+
+
+class QueryBudget:
+    def __init__(self):
+        self.app = None
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        app.after_request(self._after_request)
+
+    def budget_for(self, blueprint):
+        return self.app.config.get('QUERY_BUDGETS', {}).get(
+            blueprint, self.app.config.get('QUERY_BUDGET_DEFAULT', 50)
+        )
+
+    def _after_request(self, response):
+        endpoint = request.endpoint
+        if not endpoint or endpoint == 'static':
+            return response
+
+        queries = get_recorded_queries()
+        statements = len(queries)
+        db_time = sum(q.duration for q in queries)
+        repeats = Counter(q.statement for q in queries)
+        statement, max_repeats = repeats.most_common(1)[0] if repeats else (None, 0)
+
+        budget = self.budget_for(request.blueprint)
+        repeat_limit = self.app.config.get('QUERY_BUDGET_REPEAT_LIMIT', 10)
+        problems = []
+        if statements > budget:
+            problems.append(f"{statements} truy vấn (ngân sách {budget})")
+        if max_repeats > repeat_limit:
+            problems.append(f"câu lệnh lặp {max_repeats} lần (có thể N+1): {statement[:200]}")
+
+        self._record(endpoint, statements, db_time, max_repeats, bool(problems))
+
+        if problems:
+            message = f"Query budget vượt ở {endpoint}: " + "; ".join(problems)
+            if self.app.config.get('QUERY_BUDGET_ACTION', 'log') == 'raise':
+                raise QueryBudgetExceeded(message)
+            self.app.logger.warning(message)
+        return response
+
+    def _record(self, endpoint, statements, db_time, max_repeats, over_budget):
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, EndpointStats())
+            stats.requests += 1
+            stats.statements += statements
+            stats.max_statements = max(stats.max_statements, statements)
+            stats.db_time += db_time
+            stats.max_db_time = max(stats.max_db_time, db_time)
+            stats.max_repeats = max(stats.max_repeats, max_repeats)
+            stats.over_budget += int(over_budget)
+
+    def snapshot(self):
+        """Số liệu theo endpoint, sắp theo tổng số truy vấn giảm dần"""
+        with self._lock:
+            rows = [stats.to_dict(endpoint) for endpoint, stats in self._stats.items()]
+        rows.sort(key=lambda r: r['avg_statements'] * r['requests'], reverse=True)
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+query_budget = QueryBudget()
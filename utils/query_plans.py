@@ -0,0 +1,193 @@
+"""
+EXPLAIN QUERY PLAN check cho các truy vấn nóng
+
+HOT_QUERIES liệt kê các dạng truy vấn chạy trên mỗi request (đăng nhập, giỏ
+hàng, lịch sử đơn, trang danh sách, build PC...). `flask plans check` chạy
+EXPLAIN QUERY PLAN cho từng truy vấn và trả về mã lỗi nếu có truy vấn quét
+toàn bảng (SCAN không dùng index). Sắp xếp bằng bảng tạm chỉ được cảnh báo.
+"""
+import sys
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import text
+
+from config.database import db
+from models.tables import (
+    Cart,
+    CartDetail,
+    Category,
+    DailySales,
+    Order,
+    OrderDailyStats,
+    OrderDetail,
+    PcOptionItem,
+    Product,
+    ProductSales,
+    ProductTag,
+    Tag,
+    User,
+)
+from utils import cart_store, order_listing, sales_rollup
+
+plans_cli = AppGroup('plans', help='Kiểm tra query plan của các truy vấn nóng')
+
+# Giá trị mẫu; planner của SQLite không phụ thuộc giá trị cụ thể
+SAMPLE_ID = 1
+SAMPLE_CURSOR = (datetime(2024, 1, 1), SAMPLE_ID)
+
+HOT_QUERIES = {
+    'auth.login': lambda: User.query.filter_by(Name='admin', IsDelete=False, Role='user'),
+    'users.list': lambda: User.query.filter_by(Role='user', IsDelete=False),
+    'catalog.pc_children': lambda: db.session.query(Category.CategoryID).filter(
+        Category.ParentID == SAMPLE_ID
+    ),
+    'homepage.newest': lambda: Product.query.filter(Product.IsPC == 1)
+    .order_by(Product.CreatedAt.desc())
+    .limit(8),
+    'homepage.top_selling': lambda: db.session.query(ProductSales.ProductID)
+    .join(Product, Product.ProductID == ProductSales.ProductID)
+    .filter(Product.IsPC == 1, ProductSales.QuantitySold > 0)
+    .order_by(ProductSales.QuantitySold.desc())
+    .limit(8),
+    'catalog.page_by_name': lambda: Product.query.filter(Product.IsPC == 1)
+    .order_by(Product.Name, Product.ProductID)
+    .limit(13),
+    'catalog.page_by_price': lambda: Product.query.filter(Product.IsPC == 1)
+    .order_by(Product.Price.desc(), Product.ProductID.desc())
+    .limit(13),
+    'cart.by_user': lambda: Cart.query.filter_by(UserID=SAMPLE_ID),
+    'cart.line': lambda: CartDetail.query.filter_by(CartID=SAMPLE_ID, ProductID=SAMPLE_ID),
+    'cart.lines': lambda: CartDetail.query.filter_by(CartID=SAMPLE_ID),
+    'cart.contents': lambda: cart_store.contents_query(SAMPLE_ID),
+    'cart.summary': lambda: db.session.query(Cart.ItemCount, Cart.Subtotal)
+    .filter(Cart.UserID == SAMPLE_ID)
+    .order_by(Cart.CartID),
+    'orders.history': lambda: Order.query.filter_by(UserID=SAMPLE_ID).order_by(
+        Order.CreatedAt.desc()
+    ),
+    'orders.admin_list': lambda: db.session.query(Order)
+    .join(User)
+    .filter(User.IsDelete == False)  # noqa: E712
+    .order_by(Order.CreatedAt.desc()),
+    'orders.count_by_status': lambda: db.session.query(db.func.count(Order.OrderID)).filter(
+        Order.Status == 'pending'
+    ),
+    'orders.admin_page': lambda: order_listing.fetch_query(
+        order_listing.base_query(), SAMPLE_CURSOR, per_page=20
+    ),
+    'orders.admin_page_by_status': lambda: order_listing.fetch_query(
+        order_listing.base_query().filter(Order.Status == 'pending'), SAMPLE_CURSOR, per_page=20
+    ),
+    'orders.status_facets': lambda: order_listing.base_query()
+    .filter(Order.UserID == SAMPLE_ID)
+    .with_entities(Order.Status, db.func.count(Order.OrderID))
+    .group_by(Order.Status),
+    'orders.status_facets_deleted': lambda: order_listing.deleted_account_query(
+        order_listing.OrderListParams({'from': '2024-01-01'})
+    ),
+    'orders.status_facets_by_day': lambda: db.session.query(
+        OrderDailyStats.Status, db.func.sum(OrderDailyStats.OrderCount)
+    )
+    .filter(OrderDailyStats.Day >= SAMPLE_CURSOR[0].date())
+    .group_by(OrderDailyStats.Status),
+    'orders.stats_totals': lambda: db.session.query(
+        OrderDailyStats.Status, db.func.sum(OrderDailyStats.OrderCount)
+    ).group_by(OrderDailyStats.Status),
+    'orders.stats_daily': lambda: db.session.query(
+        OrderDailyStats.Day, db.func.sum(OrderDailyStats.OrderCount)
+    )
+    .filter(OrderDailyStats.Day >= SAMPLE_CURSOR[0].date())
+    .group_by(OrderDailyStats.Day),
+    'rollup.changed_days': lambda: db.session.query(Order.CreatedAt).filter(
+        Order.UpdatedAt > SAMPLE_CURSOR[0]
+    ),
+    'rollup.refresh_day': lambda: sales_rollup.aggregate_query(SAMPLE_CURSOR[0], SAMPLE_CURSOR[0]),
+    'rollup.monthly_revenue': lambda: db.session.query(
+        DailySales.Day, db.func.sum(DailySales.Revenue)
+    )
+    .filter(DailySales.Day >= SAMPLE_CURSOR[0].date(), DailySales.Status == 'completed')
+    .group_by(DailySales.Day),
+    'rollup.top_products': lambda: db.session.query(
+        DailySales.ProductID, db.func.sum(DailySales.Quantity)
+    )
+    .filter(DailySales.Day >= SAMPLE_CURSOR[0].date())
+    .group_by(DailySales.ProductID),
+    'orders.details': lambda: OrderDetail.query.filter_by(OrderID=SAMPLE_ID),
+    'orders.build_count': lambda: OrderDetail.query.filter_by(
+        ProductID=SAMPLE_ID, ConfigHash='0' * 64
+    ),
+    'cart.pc_line': lambda: CartDetail.query.filter_by(
+        CartID=SAMPLE_ID, ProductID=SAMPLE_ID, ConfigHash='0' * 64
+    ),
+    'build_pc.group_items': lambda: PcOptionItem.query.filter_by(OptionGroupID=SAMPLE_ID),
+    'build_pc.item': lambda: PcOptionItem.query.filter_by(
+        OptionGroupID=SAMPLE_ID, ProductID=SAMPLE_ID
+    ),
+    'tags.products': lambda: db.session.query(Product)
+    .join(ProductTag)
+    .filter(ProductTag.TagID == SAMPLE_ID),
+    'tags.current': lambda: Tag.query.join(ProductTag, ProductTag.TagID == Tag.TagID)
+    .filter(ProductTag.ProductID == SAMPLE_ID)
+    .order_by(ProductTag.ProductTagID),
+}
+
+
+def _is_full_scan(detail):
+    return detail.startswith('SCAN ') and ' USING ' not in detail
+
+
+def _is_temp_sort(detail):
+    return detail.startswith('USE TEMP B-TREE FOR ORDER BY')
+
+
+def explain(query):
+    """Trả về danh sách dòng `detail` của EXPLAIN QUERY PLAN"""
+    statement = getattr(query, 'statement', query)
+    compiled = statement.compile(
+        dialect=db.session.get_bind().dialect,
+        compile_kwargs={'literal_binds': True},
+    )
+    rows = db.session.execute(text(f'EXPLAIN QUERY PLAN {compiled}')).all()
+    return [row[-1] for row in rows]
+
+
+def check():
+    """Chạy EXPLAIN cho mọi truy vấn nóng, trả về {tên: (plan, các dòng SCAN)}"""
+    results = {}
+    for name, build in HOT_QUERIES.items():
+        plan = explain(build())
+        results[name] = (plan, [detail for detail in plan if _is_full_scan(detail)])
+    return results
+
+
+@plans_cli.command('check')
+@click.option('--verbose', '-v', is_flag=True, help='In toàn bộ query plan')
+def check_command(verbose):
+    """Báo lỗi nếu truy vấn nóng nào quét toàn bảng"""
+    if db.session.get_bind().dialect.name != 'sqlite':
+        click.echo('Chỉ hỗ trợ SQLite, bỏ qua')
+        return
+
+    failures = 0
+    for name, (plan, problems) in check().items():
+        if problems:
+            status = 'FAIL'
+        elif any(_is_temp_sort(detail) for detail in plan):
+            status = 'sort'
+        else:
+            status = 'ok'
+        click.echo(f'[{status}] {name}')
+        if problems or verbose:
+            for detail in plan:
+                click.echo(f'       {detail}')
+        failures += bool(problems)
+
+    if failures:
+        click.echo(f'{failures} truy vấn quét toàn bảng', err=True)
+        sys.exit(1)
+
+
+def init_app(app):
+    app.cli.add_command(plans_cli)
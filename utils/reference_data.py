@@ -0,0 +1,71 @@
+"""
+Dữ liệu tham chiếu (hãng, danh mục, tag) đọc qua cache
+
+Cache chỉ giữ giá trị các cột; mỗi lần đọc, các dòng được gắn lại vào
+db.session bằng merge(load=False) nên nơi gọi nhận ORM instance như
+Brand.query.all() (lazy load relationship vẫn hoạt động) mà không cần truy vấn.
+"""
+from sqlalchemy.orm import make_transient_to_detached
+
+from config.database import db
+from models.tables import Brand, Category, Product, Tag
+from utils.cache import cache
+
+PC_CATEGORY_NAME = 'PC'
+
+
+def _snapshot(model, instances):
+    keys = [attr.key for attr in model.__mapper__.column_attrs]
+    return [{key: getattr(instance, key) for key in keys} for instance in instances]
+
+
+def _attach(model, rows):
+    instances = []
+    for row in rows:
+        instance = model(**row)
+        make_transient_to_detached(instance)
+        instances.append(db.session.merge(instance, load=False))
+    return instances
+
+
+def _cached_all(model, key, tag, order_by):
+    rows = cache.get_or_set(
+        key,
+        lambda: _snapshot(model, model.query.order_by(order_by).all()),
+        tags=(tag,),
+    )
+    return _attach(model, rows)
+
+
+def all_brands():
+    return _cached_all(Brand, 'brands:all', 'brands', Brand.BrandID)
+
+
+def all_categories():
+    return _cached_all(Category, 'categories:all', 'categories', Category.CategoryID)
+
+
+def all_tags():
+    return _cached_all(Tag, 'tags:all', 'tags', Tag.TagID)
+
+
+def pc_parent_category():
+    """Danh mục gốc "PC" (None nếu chưa có)"""
+    return next((c for c in all_categories() if c.Name == PC_CATEGORY_NAME), None)
+
+
+def child_categories(parent):
+    if not parent:
+        return []
+    return [c for c in all_categories() if c.ParentID == parent.CategoryID]
+
+
+def get_product(product_id):
+    """Sản phẩm theo ID (None nếu không tồn tại), cache theo tag product:<id>"""
+    rows = cache.get_or_set(
+        f'product:{product_id}',
+        lambda: _snapshot(Product, Product.query.filter_by(ProductID=product_id).all()),
+        tags=(f'product:{product_id}',),
+    )
+    attached = _attach(Product, rows)
+    return attached[0] if attached else None
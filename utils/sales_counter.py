@@ -0,0 +1,130 @@
+"""
+Per-product sales counter
+
+Bảng product_sales được cập nhật trong cùng transaction với việc tạo đơn
+(process_cod_payment) và đổi trạng thái đơn (update_order_status), nên các
+truy vấn "bán chạy nhất" chỉ cần ORDER BY QuantitySold DESC LIMIT n trên một
+bảng nhỏ có index thay vì SUM toàn bộ orderdetail.
+"""
+from collections import defaultdict
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, literal
+
+from config.database import db
+from models.tables import Order, OrderDetail, Product, ProductSales
+from utils.sql import dialect_insert, upsert_source
+
+CANCELLED_STATUS = 'cancelled'
+
+sales_cli = AppGroup('sales', help='Quản lý bộ đếm số lượng đã bán')
+
+
+def record_sales(lines, sign=1):
+    """Cộng (sign=1) hoặc trừ (sign=-1) số lượng đã bán.
+
+    lines: iterable các cặp (ProductID, Quantity). Câu lệnh chạy trên
+    db.session nên nằm chung transaction với thao tác gọi nó.
+    """
+    totals = defaultdict(int)
+    for product_id, quantity in lines:
+        totals[product_id] += sign * (quantity or 0)
+    rows = [
+        {'ProductID': pid, 'QuantitySold': qty, 'UpdatedAt': datetime.utcnow()}
+        for pid, qty in totals.items()
+        if qty
+    ]
+    if not rows:
+        return
+
+    insert = dialect_insert()
+    db.session.execute(_add_on_conflict(insert(ProductSales).values(rows)))
+
+
+def record_sales_from_select(select_stmt):
+    """Như record_sales nhưng lấy (ProductID, Quantity) từ một câu SELECT đã
+    GROUP BY ProductID, bằng một câu INSERT ... SELECT ... ON CONFLICT"""
+    source = select_stmt.subquery()
+    product_id, quantity = source.c
+    insert = dialect_insert()
+    stmt = insert(ProductSales).from_select(
+        ['ProductID', 'QuantitySold', 'UpdatedAt'],
+        upsert_source(product_id, quantity, literal(datetime.utcnow())),
+    )
+    db.session.execute(_add_on_conflict(stmt))
+
+
+def _add_on_conflict(stmt):
+    return stmt.on_conflict_do_update(
+        index_elements=[ProductSales.ProductID],
+        set_={
+            'QuantitySold': ProductSales.QuantitySold + stmt.excluded.QuantitySold,
+            'UpdatedAt': stmt.excluded.UpdatedAt,
+        },
+    )
+
+
+def record_status_change(order, old_status, new_status):
+    """Điều chỉnh bộ đếm khi đơn chuyển vào/ra trạng thái đã hủy"""
+    was_cancelled = old_status == CANCELLED_STATUS
+    is_cancelled = new_status == CANCELLED_STATUS
+    if was_cancelled == is_cancelled:
+        return
+
+    lines = (
+        db.session.query(OrderDetail.ProductID, OrderDetail.Quantity)
+        .filter(OrderDetail.OrderID == order.OrderID)
+        .all()
+    )
+    record_sales(lines, sign=-1 if is_cancelled else 1)
+
+
+def top_selling_ids(is_pc, limit=10):
+    """Trả về danh sách ProductID bán chạy nhất theo thứ tự giảm dần"""
+    rows = (
+        db.session.query(ProductSales.ProductID)
+        .join(Product, Product.ProductID == ProductSales.ProductID)
+        .filter(Product.IsPC == is_pc, ProductSales.QuantitySold > 0)
+        .order_by(ProductSales.QuantitySold.desc())
+        .limit(limit)
+        .all()
+    )
+    return [row.ProductID for row in rows]
+
+
+def rebuild():
+    """Tính lại toàn bộ bảng product_sales từ OrderDetail"""
+    totals = (
+        db.session.query(
+            OrderDetail.ProductID,
+            func.sum(OrderDetail.Quantity).label('quantity'),
+        )
+        .join(Order, Order.OrderID == OrderDetail.OrderID)
+        .filter(db.or_(Order.Status.is_(None), Order.Status != CANCELLED_STATUS))
+        .group_by(OrderDetail.ProductID)
+        .all()
+    )
+    now = datetime.utcnow()
+    db.session.query(ProductSales).delete()
+    db.session.bulk_insert_mappings(
+        ProductSales,
+        [
+            {'ProductID': row.ProductID, 'QuantitySold': row.quantity, 'UpdatedAt': now}
+            for row in totals
+        ],
+    )
+    db.session.commit()
+    return len(totals)
+
+
+@sales_cli.command('rebuild')
+def rebuild_command():
+    """Backfill bảng product_sales từ OrderDetail"""
+    count = rebuild()
+    click.echo(f"Đã tính lại số lượng bán cho {count} sản phẩm")
+
+
+def init_app(app):
+    app.cli.add_command(sales_cli)
@@ -0,0 +1,185 @@
+"""
+Daily sales rollup
+
+Bảng daily_sales giữ số lượng, doanh thu và số đơn theo (ngày tạo đơn, sản
+phẩm, danh mục, trạng thái đơn). Dashboard và trang thống kê đọc bảng này
+theo range Day thay vì JOIN order/orderdetail trực tiếp.
+
+`flask rollup run` chạy định kỳ (cron): lấy các ngày có đơn được tạo/sửa từ
+watermark (Order.UpdatedAt, index ix_order_updated) rồi tính lại toàn bộ các
+ngày đó từ order/orderdetail. Tính lại theo ngày nên chạy lặp không sai số
+liệu; mỗi lần chạy lùi watermark ROLLUP_OVERLAP để không bỏ sót transaction
+commit muộn. `flask rollup run --full` tính lại toàn bộ bảng (lần chạy đầu
+tiên cũng là full).
+"""
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, distinct, func, insert, select
+
+from config.database import db
+from models.tables import DailySales, Order, OrderDetail, Product, RollupState
+from utils.order_stats import DEFAULT_STATUS, REVENUE_STATUS, add_months, monthly_series
+from utils.sales_counter import CANCELLED_STATUS
+
+ROLLUP_NAME = 'daily_sales'
+
+RollupResult = namedtuple('RollupResult', 'full days watermark')
+
+rollup_cli = AppGroup('rollup', help='Cập nhật các bảng rollup cho trang thống kê')
+
+
+def _order_day():
+    return func.date(Order.CreatedAt, type_=db.Date)
+
+
+def aggregate_query(start=None, end=None):
+    """SELECT các dòng daily_sales cho đơn tạo trong [start, end)"""
+    day = _order_day()
+    status = func.coalesce(Order.Status, DEFAULT_STATUS)
+    stmt = (
+        select(
+            day,
+            OrderDetail.ProductID,
+            Product.CategoryID,
+            status,
+            func.sum(OrderDetail.Quantity),
+            func.sum(OrderDetail.Price * OrderDetail.Quantity),
+            func.count(distinct(Order.OrderID)),
+        )
+        .select_from(Order)
+        .join(OrderDetail, OrderDetail.OrderID == Order.OrderID)
+        .join(Product, Product.ProductID == OrderDetail.ProductID)
+        .where(Order.CreatedAt.isnot(None))
+        .group_by(day, OrderDetail.ProductID, Product.CategoryID, status)
+    )
+    if start:
+        stmt = stmt.where(Order.CreatedAt >= start)
+    if end:
+        stmt = stmt.where(Order.CreatedAt < end)
+    return stmt
+
+
+def _insert(select_stmt):
+    db.session.execute(
+        insert(DailySales).from_select(
+            ['Day', 'ProductID', 'CategoryID', 'Status', 'Quantity', 'Revenue', 'OrderCount'],
+            select_stmt,
+        )
+    )
+
+
+def changed_days(since):
+    """Các ngày (theo CreatedAt) có đơn được tạo hoặc sửa sau `since`"""
+    rows = db.session.execute(
+        select(distinct(_order_day())).where(Order.UpdatedAt > since, Order.CreatedAt.isnot(None))
+    )
+    return sorted(day for (day,) in rows)
+
+
+def order_days(order_ids):
+    """Các ngày (theo CreatedAt) của các đơn order_ids"""
+    rows = db.session.execute(select(distinct(_order_day())).where(Order.OrderID.in_(order_ids)))
+    return sorted(day for (day,) in rows if day)
+
+
+def refresh_days(days):
+    """Tính lại daily_sales của các ngày `days` (không commit)"""
+    for day in days:
+        start = datetime.combine(day, time.min)
+        db.session.execute(delete(DailySales).where(DailySales.Day == day))
+        _insert(aggregate_query(start, start + timedelta(days=1)))
+
+
+def _rebuild():
+    db.session.execute(delete(DailySales))
+    _insert(aggregate_query())
+
+
+def run(full=False, now=None):
+    """Cập nhật daily_sales từ watermark (hoặc toàn bộ nếu full) và commit"""
+    now = now or datetime.utcnow()
+    state = db.session.get(RollupState, ROLLUP_NAME)
+    if state is None:
+        state = RollupState(Name=ROLLUP_NAME)
+        db.session.add(state)
+
+    if full or state.Watermark is None:
+        _rebuild()
+        days = None
+    else:
+        days = changed_days(state.Watermark - current_app.config.get('ROLLUP_OVERLAP', timedelta()))
+        refresh_days(days)
+
+    state.Watermark = now
+    state.LastRunAt = now
+    db.session.commit()
+    return RollupResult(full=days is None, days=days, watermark=now)
+
+
+def last_run():
+    state = db.session.get(RollupState, ROLLUP_NAME)
+    return state.LastRunAt if state else None
+
+
+def monthly_revenue(start, months):
+    """[(ngày đầu tháng, doanh thu đơn hoàn thành)] từ tháng chứa `start`"""
+    daily = (
+        db.session.query(DailySales.Day, func.sum(DailySales.Revenue))
+        .filter(DailySales.Day >= start, DailySales.Status == REVENUE_STATUS)
+        .group_by(DailySales.Day)
+    )
+    return monthly_series(daily, start, months)
+
+
+def top_products(start, limit=10):
+    """Sản phẩm bán chạy (không tính đơn đã hủy) từ ngày `start`"""
+    quantity = func.sum(DailySales.Quantity).label('quantity')
+    return (
+        db.session.query(
+            DailySales.ProductID,
+            Product.Name,
+            quantity,
+            func.sum(DailySales.Revenue).label('revenue'),
+        )
+        .join(Product, Product.ProductID == DailySales.ProductID)
+        .filter(DailySales.Day >= start, DailySales.Status != CANCELLED_STATUS)
+        .group_by(DailySales.ProductID, Product.Name)
+        .order_by(quantity.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def category_revenue(start):
+    """{CategoryID: doanh thu đơn hoàn thành} từ ngày `start`"""
+    return dict(
+        db.session.query(DailySales.CategoryID, func.sum(DailySales.Revenue))
+        .filter(DailySales.Day >= start, DailySales.Status == REVENUE_STATUS)
+        .group_by(DailySales.CategoryID)
+        .all()
+    )
+
+
+def window_start(months, today=None):
+    """Ngày đầu tháng của cửa sổ `months` tháng gần nhất"""
+    return add_months(today or datetime.utcnow().date(), 1 - months)
+
+
+@rollup_cli.command('run')
+@click.option('--full', is_flag=True, help='Tính lại toàn bộ bảng daily_sales')
+def run_command(full):
+    """Cập nhật daily_sales cho các đơn đổi từ lần chạy trước"""
+    result = run(full=full)
+    if result.full:
+        click.echo("Đã tính lại toàn bộ daily_sales")
+    else:
+        click.echo(f"Đã tính lại daily_sales cho {len(result.days)} ngày")
+    click.echo(f"Watermark: {result.watermark:%Y-%m-%d %H:%M:%S}")
+
+
+def init_app(app):
+    app.cli.add_command(rollup_cli)
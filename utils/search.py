@@ -0,0 +1,136 @@
+"""
+Full-text product search backed by SQLite FTS5
+
+Bảng ảo product_fts (Name, Specs, BrandName, CategoryName) được tạo bởi
+migration 8b4e2d61c0a3 và giữ đồng bộ bằng trigger trên product/brand/
+category. Kết quả xếp hạng theo bm25; khi DB không phải SQLite (hoặc chưa
+chạy migration) thì quay về LIKE trên Product.Name.
+"""
+import re
+import time
+
+from sqlalchemy import Integer, column, text
+from sqlalchemy.orm import joinedload
+
+from config.database import db
+from models.tables import Product
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Trọng số bm25 cho các cột Name, Specs, BrandName, CategoryName
+RANK_WEIGHTS = "10.0, 1.0, 4.0, 4.0"
+
+# Chưa thấy bảng product_fts thì kiểm tra lại sau FTS_RECHECK_INTERVAL giây
+# (migration có thể chạy sau khi process đã khởi động)
+FTS_RECHECK_INTERVAL = 30
+
+_fts_ready = {}  # URL DB -> True, hoặc thời điểm (monotonic) được kiểm tra lại
+
+
+def fold(value):
+    """Gộp đ/Đ -> d/D giống như khi đánh chỉ mục (unicode61 tự bỏ các dấu khác)"""
+    return value.replace('đ', 'd').replace('Đ', 'D')
+
+
+def build_match(query, prefix=True):
+    """Chuyển chuỗi người dùng nhập thành biểu thức MATCH an toàn.
+
+    Mỗi từ được đặt trong dấu nháy kép (không thể chèn cú pháp FTS), từ cuối
+    được tìm theo tiền tố để gõ dở vẫn ra kết quả.
+    """
+    tokens = TOKEN_RE.findall(fold(query or ''))
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    if prefix:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def fts_available():
+    bind = db.session.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return False
+    key = str(bind.url)
+    state = _fts_ready.get(key)
+    if state is True:
+        return True
+    if state is not None and time.monotonic() < state:
+        return False
+    ready = db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'product_fts'")
+    ).first() is not None
+    _fts_ready[key] = True if ready else time.monotonic() + FTS_RECHECK_INTERVAL
+    return ready
+
+
+def _load_in_order(product_ids):
+    if not product_ids:
+        return []
+    products = (
+        Product.query.options(joinedload(Product.category), joinedload(Product.brand))
+        .filter(Product.ProductID.in_(product_ids))
+        .all()
+    )
+    by_id = {p.ProductID: p for p in products}
+    return [by_id[pid] for pid in product_ids if pid in by_id]
+
+
+def search_products(query, category_id=None, page=1, per_page=12):
+    """Tìm sản phẩm, trả về (products theo thứ tự liên quan, tổng số kết quả)"""
+    match = build_match(query)
+    if not match:
+        return [], 0
+    offset = (max(page, 1) - 1) * per_page
+
+    if not fts_available():
+        base = Product.query.filter(Product.Name.contains(query.strip()))
+        if category_id:
+            base = base.filter(Product.CategoryID == category_id)
+        total = base.count()
+        products = (
+            base.options(joinedload(Product.category), joinedload(Product.brand))
+            .order_by(Product.Name)
+            .offset(offset)
+            .limit(per_page)
+            .all()
+        )
+        return products, total
+
+    join = ''
+    where = 'product_fts MATCH :match'
+    params = {'match': match}
+    if category_id:
+        join = 'JOIN product ON product.ProductID = product_fts.rowid'
+        where += ' AND product.CategoryID = :category_id'
+        params['category_id'] = category_id
+
+    total = db.session.execute(
+        text(f"SELECT count(*) FROM product_fts {join} WHERE {where}"), params
+    ).scalar()
+    if not total:
+        return [], 0
+
+    rows = db.session.execute(
+        text(
+            f"SELECT product_fts.rowid FROM product_fts {join} WHERE {where} "
+            f"ORDER BY bm25(product_fts, {RANK_WEIGHTS}) LIMIT :limit OFFSET :offset"
+        ),
+        dict(params, limit=per_page, offset=offset),
+    ).all()
+    return _load_in_order([row[0] for row in rows]), total
+
+
+def filter_query(query, search):
+    """Áp dụng tìm kiếm full-text lên một Product query có sẵn (trang admin)"""
+    match = build_match(search)
+    if not match:
+        return query
+    if not fts_available():
+        return query.filter(Product.Name.contains(search))
+    matching_ids = (
+        text("SELECT rowid FROM product_fts WHERE product_fts MATCH :match")
+        .bindparams(match=match)
+        .columns(column('rowid', Integer))
+    )
+    return query.filter(Product.ProductID.in_(matching_ids))
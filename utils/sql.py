@@ -0,0 +1,27 @@
+"""
+SQL helpers dùng chung cho các upsert (product_sales, order_daily_stats,
+idempotency_key, image_blob)
+"""
+from sqlalchemy import select, true
+
+from config.database import db
+
+
+def dialect_insert(bind=None):
+    """insert() của dialect đang dùng (SQLite/PostgreSQL), có on_conflict_do_*.
+
+    bind: engine/connection đang chạy câu lệnh; mặc định bind của db.session.
+    """
+    if (bind or db.session.get_bind()).dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def upsert_source(*columns):
+    """SELECT nguồn cho INSERT ... SELECT ... ON CONFLICT.
+
+    WHERE bắt buộc để SQLite không hiểu nhầm ON CONFLICT là JOIN ... ON.
+    """
+    return select(*columns).where(true())
@@ -0,0 +1,261 @@
+"""
+Stock reservation
+
+Product.Stock là số lượng còn có thể bán (chưa bị giữ chỗ). Mọi thay đổi tồn
+kho đi qua một câu UPDATE có điều kiện cho cả đơn/giỏ:
+
+    UPDATE product SET Stock = Stock - CASE ProductID WHEN ? THEN ? ... END
+    WHERE ProductID IN (...) AND Stock >= CASE ProductID WHEN ? THEN ? ... END
+
+nên không có read-modify-write trong Python và không thể bán quá số lượng
+kể cả khi nhiều request chạy song song. Số dòng bị cập nhật ít hơn số sản
+phẩm nghĩa là thiếu hàng; transaction khi đó phải rollback.
+
+Thêm vào giỏ sẽ giữ chỗ hàng (CartDetail.ReservedQuantity) trong
+CART_RESERVATION_TTL; thread nền trả lại hàng của các giỏ hết hạn. Khi đặt
+hàng, phần đã giữ chỗ được dùng luôn, phần còn thiếu được trừ thêm trong cùng
+câu UPDATE.
+"""
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import case, delete, func, select, update
+
+from config.database import db
+from models.tables import CartDetail, OrderDetail, Product
+from utils.cache import invalidate_on_commit
+from utils.sales_counter import CANCELLED_STATUS
+
+stock_cli = AppGroup('stock', help='Quản lý tồn kho và giữ chỗ giỏ hàng')
+
+
+class InsufficientStock(Exception):
+    """Không đủ hàng cho một hoặc nhiều sản phẩm"""
+
+    def __init__(self, product_ids):
+        self.product_ids = list(product_ids)
+        super().__init__(f"Không đủ hàng cho sản phẩm {self.product_ids}")
+
+
+def _totals(lines):
+    totals = defaultdict(int)
+    for product_id, quantity in lines:
+        if quantity:
+            totals[product_id] += quantity
+    return {pid: qty for pid, qty in totals.items() if qty > 0}
+
+
+def _adjust(totals, sign):
+    quantity = case(totals, value=Product.ProductID)
+    statement = update(Product).where(Product.ProductID.in_(list(totals)))
+    if sign < 0:
+        statement = statement.where(Product.Stock >= quantity)
+    result = db.session.execute(
+        statement.values(Stock=Product.Stock + sign * quantity),
+        execution_options={'synchronize_session': False},
+    )
+    invalidate_on_commit(db.session, *(f'product:{pid}' for pid in totals))
+    return result.rowcount
+
+
+def reserve(lines):
+    """Trừ kho cho các cặp (ProductID, Quantity) bằng một câu lệnh.
+
+    Raise InsufficientStock nếu có sản phẩm không đủ hàng; khi đó các sản phẩm
+    khác có thể đã bị trừ nên nơi gọi phải rollback transaction.
+    """
+    totals = _totals(lines)
+    if not totals:
+        return
+    if _adjust(totals, -1) != len(totals):
+        available = dict(
+            db.session.query(Product.ProductID, Product.Stock).filter(
+                Product.ProductID.in_(list(totals))
+            )
+        )
+        raise InsufficientStock(
+            pid for pid, qty in totals.items() if (available.get(pid) or 0) < qty
+        )
+
+
+def reserve_cart(cart_id, product_ids):
+    """Trừ kho cho toàn bộ giỏ (phần chưa giữ chỗ) bằng một câu UPDATE với
+    subquery trên cartdetail, câu lệnh không phụ thuộc số dòng giỏ.
+
+    product_ids: các sản phẩm trong giỏ (để kiểm tra số dòng được cập nhật).
+    Raise InsufficientStock như reserve().
+    """
+    needed = (
+        select(func.sum(CartDetail.Quantity - CartDetail.ReservedQuantity))
+        .where(CartDetail.CartID == cart_id, CartDetail.ProductID == Product.ProductID)
+        .scalar_subquery()
+    )
+    result = db.session.execute(
+        update(Product)
+        .where(
+            Product.ProductID.in_(
+                select(CartDetail.ProductID).where(CartDetail.CartID == cart_id)
+            ),
+            Product.Stock >= needed,
+        )
+        .values(Stock=Product.Stock - needed),
+        execution_options={'synchronize_session': False},
+    )
+    invalidate_on_commit(db.session, *(f'product:{pid}' for pid in product_ids))
+    if result.rowcount != len(product_ids):
+        short = (
+            db.session.query(Product.ProductID)
+            .filter(Product.ProductID.in_(product_ids), Product.Stock < needed)
+            .all()
+        )
+        raise InsufficientStock(pid for (pid,) in short)
+
+
+def release(lines):
+    """Cộng trả kho cho các cặp (ProductID, Quantity)"""
+    totals = _totals(lines)
+    if totals:
+        _adjust(totals, 1)
+
+
+def reservation_expiry():
+    ttl = current_app.config.get('CART_RESERVATION_TTL', timedelta(minutes=30))
+    return datetime.utcnow() + ttl
+
+
+def reserve_cart_line(cart_detail, quantity):
+    """Giữ thêm `quantity` sản phẩm cho một dòng giỏ hàng (đã hoặc chưa flush)"""
+    reserve([(cart_detail.ProductID, quantity)])
+    if cart_detail.CartDetailID is None:
+        cart_detail.ReservedQuantity = quantity
+    else:
+        # Biểu thức SQL để không ghi đè thay đổi của thread dọn giỏ hết hạn
+        cart_detail.ReservedQuantity = CartDetail.ReservedQuantity + quantity
+    cart_detail.ReservedUntil = reservation_expiry()
+    reservations.ensure_worker()
+
+
+def release_cart_line(cart_detail, quantity):
+    """Trả lại tối đa `quantity` sản phẩm đã giữ cho dòng giỏ hàng"""
+    result = db.session.execute(
+        update(CartDetail)
+        .where(
+            CartDetail.CartDetailID == cart_detail.CartDetailID,
+            CartDetail.ReservedQuantity >= quantity,
+        )
+        .values(ReservedQuantity=CartDetail.ReservedQuantity - quantity),
+        execution_options={'synchronize_session': False},
+    )
+    if result.rowcount:
+        release([(cart_detail.ProductID, quantity)])
+    db.session.expire(cart_detail, ['ReservedQuantity'])
+
+
+def remove_cart_line(cart_detail):
+    """Xóa dòng giỏ hàng và trả lại phần hàng đang giữ"""
+    row = db.session.execute(
+        delete(CartDetail)
+        .where(CartDetail.CartDetailID == cart_detail.CartDetailID)
+        .returning(CartDetail.ProductID, CartDetail.ReservedQuantity)
+    ).first()
+    if row:
+        release([(row.ProductID, row.ReservedQuantity)])
+
+
+def apply_status_change(order, old_status, new_status):
+    """Trả hàng về kho khi đơn bị hủy, trừ lại khi bỏ hủy"""
+    was_cancelled = old_status == CANCELLED_STATUS
+    is_cancelled = new_status == CANCELLED_STATUS
+    if was_cancelled == is_cancelled:
+        return
+
+    lines = (
+        db.session.query(OrderDetail.ProductID, OrderDetail.Quantity)
+        .filter(OrderDetail.OrderID == order.OrderID)
+        .all()
+    )
+    if is_cancelled:
+        release(lines)
+    else:
+        reserve(lines)
+
+
+def release_expired(now=None):
+    """Trả lại hàng của các dòng giỏ đã hết hạn giữ chỗ, trả về số dòng"""
+    now = now or datetime.utcnow()
+    expired = (
+        db.session.query(
+            CartDetail.CartDetailID, CartDetail.ProductID, CartDetail.ReservedQuantity
+        )
+        .filter(CartDetail.ReservedQuantity > 0, CartDetail.ReservedUntil < now)
+        .all()
+    )
+    released = []
+    for detail_id, product_id, quantity in expired:
+        # Chỉ trả hàng nếu dòng chưa bị đổi kể từ lúc đọc
+        result = db.session.execute(
+            update(CartDetail)
+            .where(
+                CartDetail.CartDetailID == detail_id,
+                CartDetail.ReservedQuantity == quantity,
+                CartDetail.ReservedUntil < now,
+            )
+            .values(ReservedQuantity=0),
+            execution_options={'synchronize_session': False},
+        )
+        if result.rowcount:
+            released.append((product_id, quantity))
+    release(released)
+    db.session.commit()
+    return len(released)
+
+
+class ReservationSweeper:
+    """Thread nền trả lại hàng của giỏ hết hạn mỗi STOCK_SWEEP_INTERVAL giây"""
+
+    def __init__(self):
+        self.app = None
+        self.interval = 60
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get('STOCK_SWEEP_INTERVAL', 60)
+        app.cli.add_command(stock_cli)
+
+    def ensure_worker(self):
+        if self.app is None or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='stock-reservations', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        stop = threading.Event()
+        while not stop.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    release_expired()
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.error(f"Lỗi khi trả hàng giỏ hết hạn: {e}")
+                finally:
+                    db.session.remove()
+
+
+@stock_cli.command('release-expired')
+def release_expired_command():
+    """Trả lại hàng đang giữ của các giỏ đã hết hạn"""
+    count = release_expired()
+    click.echo(f"Đã trả lại hàng cho {count} dòng giỏ hàng")
+
+
+reservations = ReservationSweeper()
@@ -0,0 +1,152 @@
+"""
+Typeahead suggestion index
+
+Chỉ mục mảng đã sắp xếp (sorted array + bisect) trên tên sản phẩm, hãng,
+danh mục và tag. Mỗi tên được đánh chỉ mục ở mọi vị trí đầu từ và ở dạng đã
+bỏ dấu, nên "ban phim", "bàn phím" hay "phim" đều khớp "Bàn phím cơ". Chỉ mục
+được dựng lại (lazy) sau khi có commit thay đổi các bảng trên, nên mỗi lần
+gõ phím không cần truy vấn DB. Commit đó cũng tăng version tag cache
+'suggest_index' để các worker khác dựng lại (backend redis), và chỉ mục luôn
+được dựng lại sau SUGGEST_INDEX_TTL giây.
+"""
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config.database import db
+from models.tables import Brand, Category, Product, ProductSales, Tag
+from utils.cache import cache
+
+KINDS = ('products', 'brands', 'categories', 'tags')
+WATCHED_MODELS = (Product, Brand, Category, Tag)
+VERSION_TAG = 'suggest_index'
+
+# Số entry tối đa duyệt cho một tiền tố trước khi xếp hạng
+SCAN_LIMIT = 2000
+
+
+def normalize(value):
+    """Chữ thường, bỏ dấu tiếng Việt (kể cả đ -> d), gộp khoảng trắng"""
+    value = (value or '').lower().replace('đ', 'd')
+    value = unicodedata.normalize('NFD', value)
+    value = ''.join(ch for ch in value if unicodedata.category(ch) != 'Mn')
+    return ' '.join(value.split())
+
+
+def _keys_for(name):
+    words = normalize(name).split(' ')
+    return {' '.join(words[i:]) for i in range(len(words)) if words[i]}
+
+
+class SuggestIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = None  # danh sách key đã sắp xếp
+        self._entries = []  # entry tương ứng với từng key
+        self._version = None
+        self._built_at = 0
+        self.ttl = 60
+
+    def init_app(self, app):
+        self.ttl = app.config.get('SUGGEST_INDEX_TTL', 60)
+        event.listen(Session, 'after_flush', _track_changes)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_rollback', _clear_changes)
+
+    def _is_stale(self):
+        return (
+            self._keys is None
+            or time.monotonic() - self._built_at > self.ttl
+            or cache.versions(VERSION_TAG) != self._version
+        )
+
+    def rebuild(self):
+        # Đọc version trước khi đọc dữ liệu: commit xen giữa sẽ gây dựng lại lần sau
+        version = cache.versions(VERSION_TAG)
+        sold = dict(db.session.query(ProductSales.ProductID, ProductSales.QuantitySold))
+        items = []
+        for pid, name, is_pc in db.session.query(Product.ProductID, Product.Name, Product.IsPC):
+            items.append(('products', pid, name, sold.get(pid, 0), {'is_pc': bool(is_pc)}))
+        for bid, name in db.session.query(Brand.BrandID, Brand.Name):
+            items.append(('brands', bid, name, 0, None))
+        for cid, name in db.session.query(Category.CategoryID, Category.Name):
+            items.append(('categories', cid, name, 0, None))
+        for tid, name in db.session.query(Tag.TagID, Tag.Name):
+            items.append(('tags', tid, name, 0, None))
+
+        pairs = []
+        for kind, item_id, name, weight, extra in items:
+            entry = (kind, item_id, name, weight, extra, normalize(name))
+            for key in _keys_for(name):
+                pairs.append((key, entry))
+        pairs.sort(key=lambda pair: pair[0])
+
+        with self._lock:
+            self._keys = [key for key, _ in pairs]
+            self._entries = [entry for _, entry in pairs]
+            self._version = version
+            self._built_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._keys = None
+
+    def suggest(self, query, limit=5):
+        """Trả về tối đa `limit` gợi ý cho mỗi loại, ưu tiên sản phẩm bán chạy"""
+        prefix = normalize(query)
+        results = {kind: [] for kind in KINDS}
+        if not prefix:
+            return results
+
+        if self._is_stale():
+            self.rebuild()
+        with self._lock:
+            keys, entries = self._keys, self._entries
+
+        candidates = {}
+        position = bisect_left(keys, prefix)
+        end = min(len(keys), position + SCAN_LIMIT)
+        while position < end and keys[position].startswith(prefix):
+            kind, item_id, name, weight, extra, normalized = entries[position]
+            # Khớp từ đầu tên được ưu tiên hơn khớp giữa tên
+            score = (normalized.startswith(prefix), weight)
+            current = candidates.get((kind, item_id))
+            if current is None or score > current[0]:
+                candidates[(kind, item_id)] = (score, name, extra)
+            position += 1
+
+        ranked = sorted(
+            candidates.items(),
+            key=lambda kv: (not kv[1][0][0], -kv[1][0][1], kv[1][1]),
+        )
+        for (kind, item_id), (_, name, extra) in ranked:
+            if len(results[kind]) >= limit:
+                continue
+            item = {'id': item_id, 'name': name}
+            if extra:
+                item.update(extra)
+            results[kind].append(item)
+        return results
+
+    def _after_commit(self, session):
+        if session.info.pop('suggest_index_stale', False):
+            self.invalidate()
+            cache.invalidate_tags(VERSION_TAG)
+
+
+def _track_changes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, WATCHED_MODELS):
+            session.info['suggest_index_stale'] = True
+            return
+
+
+def _clear_changes(session):
+    session.info.pop('suggest_index_stale', None)
+
+
+suggest_index = SuggestIndex()
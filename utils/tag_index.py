@@ -0,0 +1,197 @@
+"""
+Inverted tag index cho trang tư vấn PC
+
+Ánh xạ tên tag -> tập ProductID của các PC gắn tag đó, cùng thông tin hiển thị
+của từng PC. Chỉ mục được dựng một lần (lazy) rồi cập nhật tăng dần khi các
+route gắn/bỏ/đổi tên tag commit, nên /advisor/suggest không cần truy vấn DB.
+
+Commit thay đổi Product/Tag/ProductTag tăng version tag cache 'tag_index'.
+Process vừa commit nhận version mới sau khi tự cập nhật chỉ mục; process khác
+thấy version đổi thì dựng lại. Version chỉ dùng chung giữa các worker với
+backend redis; với backend LRU, worker khác dựng lại sau tối đa TAG_INDEX_TTL
+giây.
+"""
+import math
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config.database import db
+from models.tables import Product, ProductTag, Tag
+from utils.cache import cache
+
+VERSION_TAG = 'tag_index'
+
+
+class TagIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = None  # tag name -> set(ProductID)
+        self._pcs = {}  # ProductID -> dict thông tin PC
+        self._version = None
+        self._pending_version = None  # version sau commit của process này, chờ cập nhật tăng dần
+        self._built_at = 0
+        self.ttl = 60
+
+    def init_app(self, app):
+        self.ttl = app.config.get('TAG_INDEX_TTL', 60)
+        # Thay đổi trên Product (thêm/sửa/xóa PC) làm chỉ mục phải dựng lại
+        event.listen(Session, 'after_flush', _track_product_changes)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_rollback', _clear_product_changes)
+
+    def _is_stale(self):
+        return (
+            self._postings is None
+            or cache.versions(VERSION_TAG) != self._version
+            or (not cache.shared and time.monotonic() - self._built_at > self.ttl)
+        )
+
+    def _ensure_built(self):
+        if self._is_stale():
+            self.rebuild()
+
+    def rebuild(self):
+        """Dựng lại toàn bộ chỉ mục (3 truy vấn)"""
+        # Đọc version trước khi đọc dữ liệu: commit xen giữa sẽ gây dựng lại lần sau
+        version = cache.versions(VERSION_TAG)
+        pcs = {
+            p.ProductID: {
+                'id': p.ProductID,
+                'name': p.Name,
+                'price': p.Price,
+                'image': p.ImageURL,
+            }
+            for p in db.session.query(
+                Product.ProductID, Product.Name, Product.Price, Product.ImageURL
+            ).filter(Product.IsPC == 1)
+        }
+        postings = {name: set() for (name,) in db.session.query(Tag.Name)}
+        links = (
+            db.session.query(ProductTag.ProductID, Tag.Name)
+            .join(Tag, Tag.TagID == ProductTag.TagID)
+            .filter(ProductTag.ProductID.in_(pcs.keys()) if pcs else db.false())
+        )
+        for product_id, name in links:
+            postings.setdefault(name, set()).add(product_id)
+
+        with self._lock:
+            self._pcs = pcs
+            self._postings = postings
+            self._version = version
+            self._pending_version = None
+            self._built_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._postings = None
+
+    def _applied(self):
+        # Chỉ mục đã có thay đổi của commit vừa rồi: nhận version sau commit đó
+        # (None nếu có commit khác xen vào, khi đó lần suggest sau sẽ dựng lại)
+        if self._pending_version is not None:
+            self._version, self._pending_version = self._pending_version, None
+
+    def add_link(self, product_id, tag_name):
+        with self._lock:
+            if self._postings is None:
+                return
+            if product_id in self._pcs:
+                self._postings.setdefault(tag_name, set()).add(product_id)
+            self._applied()
+
+    def remove_tag(self, tag_name):
+        with self._lock:
+            if self._postings is not None:
+                self._postings.pop(tag_name, None)
+                self._applied()
+
+    def rename_tag(self, old_name, new_name):
+        with self._lock:
+            if self._postings is None:
+                return
+            if old_name != new_name:
+                self._postings[new_name] = (
+                    self._postings.pop(old_name, set()) | self._postings.get(new_name, set())
+                )
+            self._applied()
+
+    def suggest(self, selected_tags):
+        """Chấm điểm PC theo số tag khớp và phân nhóm type1/type2/type3.
+
+        type1: khớp >= 80% tiêu chí, type2: [40%, 80%), type3: < 40%.
+        """
+        with self._lock:
+            self._ensure_built()
+            counts = Counter()
+            for name in selected_tags:
+                counts.update(self._postings.get(name, ()))
+            pcs = self._pcs
+
+        n_selected = len(selected_tags)
+        high_threshold = math.ceil(0.8 * n_selected)
+        mid_threshold = max(1, math.ceil(0.4 * n_selected))
+
+        buckets = {'type1': [], 'type2': [], 'type3': []}
+        for product_id, match_count in counts.items():
+            pc = pcs.get(product_id)
+            if not pc:
+                continue
+            item = dict(
+                pc,
+                match_count=match_count,
+                total_selected=n_selected,
+                match_ratio=(match_count / n_selected) if n_selected else 0.0,
+            )
+            if match_count >= high_threshold:
+                buckets['type1'].append(item)
+            elif match_count >= mid_threshold:
+                buckets['type2'].append(item)
+            else:
+                buckets['type3'].append(item)
+
+        # Sắp xếp mỗi nhóm theo số match giảm dần, rồi theo giá tăng dần
+        for items in buckets.values():
+            items.sort(key=lambda it: (-it['match_count'], it['price'] or 0))
+
+        buckets['thresholds'] = {
+            'high_min': high_threshold,
+            'mid_min': mid_threshold,
+            'selected_count': n_selected,
+        }
+        return buckets
+
+    def _after_commit(self, session):
+        if session.info.pop('tag_index_stale', False):
+            self.invalidate()
+        if session.info.pop('tag_index_changed', False):
+            # Báo cho các worker khác; các route tự cập nhật chỉ mục của process
+            # này rồi nhận version mới, trừ khi có bump khác ngoài commit này
+            with self._lock:
+                before = cache.versions(VERSION_TAG)
+                cache.invalidate_tags(VERSION_TAG)
+                after = cache.versions(VERSION_TAG)
+                expected = {tag: version + 1 for tag, version in before.items()}
+                current = self._postings is not None and before == self._version
+                self._pending_version = after if current and after == expected else None
+
+
+def _track_product_changes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Product):
+            session.info['tag_index_stale'] = True
+            session.info['tag_index_changed'] = True
+            return
+        if isinstance(obj, (Tag, ProductTag)):
+            session.info['tag_index_changed'] = True
+
+
+def _clear_product_changes(session):
+    session.info.pop('tag_index_stale', None)
+    session.info.pop('tag_index_changed', None)
+
+
+tag_index = TagIndex()
@@ -1,5 +1,18 @@
 import json
 
+from flask import url_for
+from markupsafe import Markup, escape
+
+from utils.image_pipeline import image_pipeline
+
+# Bề rộng hiển thị của ảnh trong các lưới sản phẩm (container Bootstrap 3 rộng
+# tối đa 1170px, breakpoint col-md: 992px, col-lg: 1200px)
+IMAGE_SIZES = {
+    'grid-3': '(min-width: 1200px) 360px, (min-width: 992px) 30vw, 50vw',  # col-md-4 col-xs-6
+    'grid-4': '(min-width: 1200px) 270px, (min-width: 992px) 23vw, 50vw',  # col-md-3 col-xs-6
+}
+
+
 def from_json(value):
     """Convert JSON string to Python object"""
     try:
@@ -7,6 +20,37 @@ def from_json(value):
     except (json.JSONDecodeError, TypeError):
         return None
 
+
+def img_attrs(source, variant='card', sizes='grid-4', lazy=True):
+    """Thuộc tính src/srcset/sizes/width/height/loading cho thẻ <img>.
+
+    srcset liệt kê các bản WebP của image pipeline theo bề rộng để trình duyệt
+    chọn bản nhỏ nhất đủ nét; width/height lấy từ variant `variant` để giữ chỗ
+    (không nhảy layout). Ảnh chưa xử lý chỉ có src là ảnh gốc. Dùng:
+    <img {{ product.ImageURL|img_attrs('card', 'grid-3', lazy=loop.index > 6) }} alt="...">
+    """
+    if not source:
+        return Markup('')
+    variants = image_pipeline.variants(source) or {}
+    entry = variants.get(variant)
+    attrs = {'src': image_pipeline.url(source, variant)}
+    if entry:
+        candidates = {}
+        for item in sorted(variants.values(), key=lambda item: item['width']):
+            candidates.setdefault(item['width'], item['webp'])
+        if len(candidates) > 1:
+            attrs['srcset'] = ', '.join(
+                f"{url_for('static', filename=path)} {width}w" for width, path in candidates.items()
+            )
+            attrs['sizes'] = IMAGE_SIZES.get(sizes, sizes)
+        attrs['width'], attrs['height'] = entry['width'], entry['height']
+    if lazy:
+        attrs['loading'] = 'lazy'
+    attrs['decoding'] = 'async'
+    return Markup(' '.join(f'{name}="{escape(value)}"' for name, value in attrs.items()))
+
+
 def register_filters(app):
     """Register custom template filters"""
-    app.jinja_env.filters['from_json'] = from_json
\ No newline at end of file
+    app.jinja_env.filters['from_json'] = from_json
+    app.jinja_env.filters['img_attrs'] = img_attrs